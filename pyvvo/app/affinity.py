@@ -0,0 +1,124 @@
+'''
+Module for pinning GridLAB-D processes to CPU cores.
+
+With many simulations running at once, the OS scheduler migrates them
+between cores (and on multi-socket machines, between NUMA nodes), which
+thrashes caches. Instead, each model thread (worker slot) of a population
+gets its own set of cores, handed out round-robin across NUMA nodes so the
+load is spread evenly, and every simulation run by that thread is pinned to
+them. See gld.runModel.
+
+Since a pinned process allocates memory on its own node by default (first
+touch), that is usually enough to keep memory local. If numactl is
+installed, memory can be bound to the node as well.
+
+Only Linux is supported. Elsewhere, coreSets returns None and nothing is
+pinned.
+
+Created on Oct 18, 2026
+'''
+import os
+import re
+import glob
+import shutil
+
+# Where Linux describes NUMA nodes.
+NODE_DIR = '/sys/devices/system/node'
+
+def parseCpuList(s):
+    """Parse a Linux cpu list (e.g. '0-3,8,10-11') into a list of ints."""
+    out = []
+    for part in s.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            a, b = part.split('-')
+            out.extend(range(int(a), int(b) + 1))
+        else:
+            out.append(int(part))
+
+    return out
+
+def available():
+    """True if processes can be pinned on this platform."""
+    return hasattr(os, 'sched_setaffinity')
+
+def numaNodes(nodeDir=NODE_DIR):
+    """Get the cores this process may use, grouped by NUMA node.
+
+    OUTPUT: dict of {node number: sorted list of cores}. If NUMA
+        information isn't available, everything is put in node 0.
+    """
+    allowed = os.sched_getaffinity(0)
+    nodes = {}
+    for path in glob.glob(os.path.join(nodeDir, 'node*', 'cpulist')):
+        m = re.search(r'node(\d+)', path)
+        with open(path) as f:
+            cores = [c for c in parseCpuList(f.read()) if c in allowed]
+        if cores:
+            nodes[int(m.group(1))] = cores
+
+    if not nodes:
+        nodes = {0: sorted(allowed)}
+
+    return nodes
+
+def coreSets(numSlots, coresPerSlot=1, nodes=None, membind=False):
+    """Assign cores to worker slots. Slots are handed out to NUMA nodes
+    round-robin, and each gets coresPerSlot cores from its node. If there are
+    more slots than cores, cores are shared.
+
+    INPUTS:
+        numSlots: number of worker slots (e.g. a population's
+            numModelThreads)
+        coresPerSlot: cores for each slot, e.g. GridLAB-D's thread_count. A
+            slot never spans nodes, so this is capped at the node size.
+        nodes: output from numaNodes. Looked up if not given.
+        membind: True to also bind memory to the slot's node (see
+            numactlPrefix).
+
+    OUTPUT: list with a dict for each slot with fields 'cores' (set of
+        cores), 'node' (NUMA node), and 'membind'. None if pinning isn't
+        available. Pass a slot to gld.runModel as the affinity input.
+    """
+    if nodes is None:
+        if not available():
+            return None
+        nodes = numaNodes()
+
+    nodeList = sorted(nodes)
+    # Track the next core to hand out for each node.
+    nxt = {n: 0 for n in nodeList}
+    slots = []
+    for k in range(numSlots):
+        n = nodeList[k % len(nodeList)]
+        cores = nodes[n]
+        num = min(coresPerSlot, len(cores))
+        slot = set()
+        for _ in range(num):
+            slot.add(cores[nxt[n] % len(cores)])
+            nxt[n] += 1
+        slots.append({'cores': slot, 'node': n, 'membind': membind})
+
+    return slots
+
+def numactlPrefix(node):
+    """Command prefix which binds a process's memory to a NUMA node, or an
+    empty list if numactl isn't installed.
+    """
+    if (node is None) or (shutil.which('numactl') is None):
+        return []
+
+    return ['numactl', '--membind={}'.format(node)]
+
+def pin(pid, cores):
+    """Pin a process to a set of cores. Does nothing if the process is
+    already done or pinning isn't available.
+    """
+    if (not cores) or (not available()):
+        return
+
+    try:
+        os.sched_setaffinity(pid, cores)
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,471 @@
+'''
+Module for benchmarking the parts of pyvvo where speed matters.
+
+Run from the command line to find the best split between GridLAB-D threads
+per simulation and simulations run at once on this machine, and save it to
+config.json:
+    python benchmark.py autotune path/to/individual_model.glm
+The model should be a representative individual's model, e.g. one written
+by a population to its output directory. The best split depends heavily on
+the feeder, so rerun this when changing feeders.
+
+To compare throughput with and without pinning simulations to cores (see
+affinity.py), using the GA and AFFINITY settings in config.json:
+    python benchmark.py affinity path/to/individual_model.glm
+
+To compare how fast GridLAB-D inserts recorder rows into tables of
+different storage engines (see db.setEngine), using the GLD-DB settings in
+config.json:
+    python benchmark.py engines path/to/individual_model.glm [ENGINE ...]
+The model's mysql recorder tables are dropped and recreated for each run.
+Engines default to ENGINES.
+
+To compare cold runs with runs on a pool of warm GridLAB-D servers (see
+gldServer), using the GA and GLD-SERVER settings in config.json:
+    python benchmark.py servers path/to/server_model.glm
+The model should be one written for a server slot (see
+population.startServerPool). All copies record to the same tables.
+
+Created on Oct 18, 2026
+'''
+import os
+import re
+import sys
+import time
+import json
+import shutil
+import tempfile
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+import modGLM
+import gld
+import affinity
+import db
+import glmParser
+import gldServer
+
+# Path to pyvvo's configuration file.
+CONFIGFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'config.json')
+
+# Recorder object types, which are removed from models for autotuning.
+RECORDER_TYPES = ['recorder', 'group_recorder', 'mysql.recorder',
+                  'mysql.group_recorder']
+
+# Storage engines to compare for recorder tables.
+ENGINES = ['InnoDB', 'MEMORY']
+
+# Tables of mysql recorders in a model.
+TABLE_REGEX = re.compile(r'\btable\s+"?([^"\s;]+)')
+
+def tuneCombos(cpus=None):
+    """Get (threads per simulation, concurrent simulations) combinations to
+    try: threads per simulation is a power of two, and concurrent
+    simulations fill the remaining cores.
+    """
+    if cpus is None:
+        cpus = os.cpu_count()
+        
+    combos = []
+    t = 1
+    while t <= cpus:
+        combos.append((t, max(1, cpus // t)))
+        t *= 2
+        
+    return combos
+
+def slotCopies(modelPath, n, d):
+    """Copy a model into n slot directories (slot_0, slot_1, ...) in
+    directory d. Returns the list of paths to the copies.
+    """
+    paths = []
+    for k in range(n):
+        slotDir = os.path.join(d, 'slot_{}'.format(k))
+        os.mkdir(slotDir)
+        path = os.path.join(slotDir, os.path.basename(modelPath))
+        shutil.copyfile(modelPath, path)
+        paths.append(path)
+        
+    return paths
+
+def runConcurrent(modelPath, sims, numSims, gldInstall=None,
+                  runLimits=None, cmd=None, slots=None):
+    """Run a model numSims times, sims at a time.
+    
+    Each worker slot gets its own copy of the model, in its own directory
+    (in a temporary directory next to the model), and runs there. Output
+    files the model writes (voltdumps, tape recorders, collectors, profiler
+    output, ...) therefore don't collide between simulations running at
+    the same time.
+    
+    INPUTS:
+        modelPath, gldInstall, runLimits, cmd: see autotune.
+        sims: number of simulations to run at once.
+        numSims: total number of simulations.
+        slots: optional list of sims worker slots from affinity.coreSets.
+            Each simulation is pinned to the slot of the worker running it.
+            
+    OUTPUT: (seconds, list of gld.modelRun objects)
+    """
+    if gldInstall is None:
+        gldInstall = {}
+    if runLimits is None:
+        runLimits = {}
+        
+    # Set up the environment once for all runs.
+    r = gld.runner(cmd=cmd, **gldInstall)
+    
+    # Workers take a free slot for each run, like a population's model
+    # threads, which each have their own: (model path, core set).
+    free = Queue()
+    
+    def run(_):
+        path, slot = free.get()
+        try:
+            return r.run(modelPath=path,
+                         timeout=runLimits.get('TIMEOUT'),
+                         cpuTime=runLimits.get('CPU-TIME'),
+                         memory=runLimits.get('MEMORY'), affinity=slot)
+        finally:
+            free.put((path, slot))
+    
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(
+            os.path.abspath(modelPath))) as d:
+        for k, path in enumerate(slotCopies(modelPath, sims, d)):
+            free.put((path, slots[k] if slots else None))
+            
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sims) as pool:
+            out = list(pool.map(run, range(numSims)))
+        t = time.perf_counter() - t0
+        
+    return t, out
+
+def autotune(modelPath, combos=None, numSims=None, gldInstall=None,
+             runLimits=None, keepRecorders=False, cmd=None, log=None):
+    """Find the throughput-optimal split between GridLAB-D threads per
+    simulation ('thread_count') and simulations run in parallel (a
+    population's numModelThreads).
+    
+    INPUTS:
+        modelPath: path to a representative model. Copies are written to a
+            temporary directory next to it, with a subdirectory for each
+            simulation slot (see runConcurrent). Simulations run in their
+            slot's directory, so relative paths to input files (e.g. player
+            files) should be made absolute.
+        combos: list of (threads per simulation, concurrent simulations)
+            tuples to try. Defaults to tuneCombos().
+        numSims: number of simulations to run for each combination. Defaults
+            to the largest number of concurrent simulations in combos.
+        gldInstall: see gld.runModel (DIR and LD_LIBRARY_PATH)
+        runLimits: dict with optional 'TIMEOUT', 'CPU-TIME', and 'MEMORY'
+            fields. See gld.runModel.
+        keepRecorders: by default, recorders are removed from the model so
+            copies don't write to the same tables. Set to True to keep them
+            (the database must be able to take the duplicate rows).
+        cmd: command to run instead of gridlabd, see gld.runModel.
+        log: function for reporting progress, e.g. print.
+        
+    OUTPUT: (best, results). results has a dict for each combination with
+        'threads', 'sims', 'time' (seconds), 'throughput' (simulations per
+        second), and 'ok' (True if all runs succeeded). best is the result
+        with the highest throughput of those which are ok, or None.
+    """
+    if combos is None:
+        combos = tuneCombos()
+    if numSims is None:
+        numSims = max(c for _, c in combos)
+        
+    base = modGLM.modGLM(pathModelIn=modelPath)
+    if not keepRecorders:
+        base.removeObjectsByType(typeList=RECORDER_TYPES)
+        
+    results = []
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(
+            os.path.abspath(modelPath))) as d:
+        for threads, sims in combos:
+            # Write the model with this thread count.
+            path = os.path.join(d, 'autotune_{}.glm'.format(threads))
+            obj = modGLM.modGLM(strModel=base.strModel, pathModelOut=path)
+            obj.setThreadCount(threads)
+            obj.writeModel()
+            
+            t, out = runConcurrent(modelPath=path, sims=sims,
+                                   numSims=numSims, gldInstall=gldInstall,
+                                   runLimits=runLimits, cmd=cmd)
+            
+            r = {'threads': threads, 'sims': sims, 'time': t,
+                 'throughput': numSims / t,
+                 'ok': all(o.status == gld.RUN_OK for o in out)}
+            results.append(r)
+            if log is not None:
+                log(('{threads} threads/sim, {sims} sims at once: '
+                     '{throughput:.3f} sims/s ({time:.1f} s), ok: {ok}'
+                     ).format(**r))
+                
+    ok = [r for r in results if r['ok']]
+    best = max(ok, key=lambda r: r['throughput']) if ok else None
+    return best, results
+
+def writeTuning(best, configFile=CONFIGFILE):
+    """Write autotune results to the GA section of the configuration file:
+    'THREADS' (simulations at once) and 'GLD-THREADS' (threads per
+    simulation).
+    """
+    with open(configFile) as f:
+        config = json.load(f)
+        
+    config['GA']['THREADS'] = best['sims']
+    config['GA']['GLD-THREADS'] = best['threads']
+    
+    with open(configFile + '.tmp', 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(configFile + '.tmp', configFile)
+
+def benchAffinity(modelPath, sims, numSims=None, threads=1,
+                  gldInstall=None, runLimits=None, keepRecorders=False,
+                  membind=False, cmd=None):
+    """Compare throughput with and without pinning simulations to cores
+    (see affinity.coreSets). See autotune for inputs.
+    
+    OUTPUT: dict with 'unpinned' and 'pinned' throughput in simulations per
+        second, or None for 'pinned' if pinning isn't available.
+    """
+    if numSims is None:
+        numSims = 2 * sims
+        
+    slots = affinity.coreSets(numSlots=sims, coresPerSlot=threads,
+                              membind=membind)
+    
+    base = modGLM.modGLM(pathModelIn=modelPath)
+    if not keepRecorders:
+        base.removeObjectsByType(typeList=RECORDER_TYPES)
+    base.setThreadCount(threads)
+    
+    out = {'pinned': None}
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(
+            os.path.abspath(modelPath))) as d:
+        path = os.path.join(d, 'affinity.glm')
+        base.pathModelOut = path
+        base.writeModel()
+        
+        for name, s in (('unpinned', None), ('pinned', slots)):
+            if (name == 'pinned') and (slots is None):
+                continue
+            t, _ = runConcurrent(modelPath=path, sims=sims, numSims=numSims,
+                                 gldInstall=gldInstall, runLimits=runLimits,
+                                 cmd=cmd, slots=s)
+            out[name] = numSims / t
+            
+    return out
+
+def benchServers(modelPath, sims, spare=None, numSims=None, gldInstall=None,
+                 runLimits=None, cmd=None, serverCmd=None,
+                 basePort=gldServer.BASE_PORT, readyTimeout=120):
+    """Compare cold runs (a new process per run, see runConcurrent) with
+    runs on a pool of warm servers (see gldServer.serverPool), which still
+    restarts a server per run, but in the background.
+    
+    INPUTS:
+        modelPath: path to a model with a clock (start and stop times).
+            Copies are written to a temporary directory next to it.
+        sims: number of simulations to run at once.
+        spare: number of pool slots beyond sims, which are re-warmed while
+            the others run. Defaults to sims.
+        numSims: total number of simulations. Defaults to 4 * sims.
+        gldInstall, runLimits, cmd: see autotune.
+        serverCmd: command to start a server, see gldServer.gldServer.
+        basePort, readyTimeout: see gldServer.serverPool.
+        
+    OUTPUT: dict with 'cold' and 'warm' throughput in simulations per
+        second, and 'ok' (True if all runs succeeded). The pool's first
+        startup isn't timed, since a population pays it once.
+    """
+    if spare is None:
+        spare = sims
+    if numSims is None:
+        numSims = 4 * sims
+    if runLimits is None:
+        runLimits = {}
+        
+    clock = glmParser.parseFile(modelPath).findFirst(kind='clock')
+    if (clock is None) or ('stoptime' not in clock.props):
+        raise UserWarning('{} has no clock stoptime.'.format(modelPath))
+    start = gldServer.parseTime(clock.props['starttime'])
+    stop = gldServer.parseTime(clock.props['stoptime'])
+    
+    t, out = runConcurrent(modelPath=modelPath, sims=sims, numSims=numSims,
+                           gldInstall=gldInstall, runLimits=runLimits,
+                           cmd=cmd)
+    result = {'cold': numSims / t,
+              'ok': all(o.status == gld.RUN_OK for o in out)}
+    
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(
+            os.path.abspath(modelPath))) as d:
+        slots = [{'model': p} for p in slotCopies(modelPath, sims + spare, d)]
+        pool = gldServer.serverPool(slots=slots, starttime=start,
+                                    gldInstall=gldInstall, basePort=basePort,
+                                    cmd=serverCmd, readyTimeout=readyTimeout,
+                                    retries=0)
+        
+        def run(_):
+            slot = pool.acquire()
+            try:
+                pool.run(slot=slot, commands=[], stoptime=stop,
+                         timeout=runLimits.get('TIMEOUT'))
+            finally:
+                pool.release(slot)
+                
+        try:
+            pool.wait()
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=sims) as workers:
+                list(workers.map(run, range(numSims)))
+            result['warm'] = numSims / (time.perf_counter() - t0)
+        except gldServer.Error:
+            result['warm'] = None
+            result['ok'] = False
+        finally:
+            pool.close()
+            
+    return result
+
+def countRows(dbObj, tables):
+    """Total number of rows in the given tables."""
+    cnxn, cursor = dbObj.getCnxnAndCursor()
+    total = 0
+    try:
+        for t in tables:
+            cursor.execute('SELECT COUNT(*) FROM {}'.format(t))
+            total += cursor.fetchone()[0]
+    finally:
+        dbObj.closeCnxnAndCursor(cnxn, cursor)
+        
+    return total
+
+def benchEngines(modelPath, dbObj, engines=None, repeat=3, gldInstall=None,
+                 runLimits=None, cmd=None):
+    """Compare GridLAB-D's insert throughput into recorder tables of
+    different storage engines. Before each run, the model's mysql recorder
+    tables are dropped, so GridLAB-D creates them with the engine (set when
+    it connects, see db.engineScript).
+    
+    INPUTS:
+        modelPath: path to a model with mysql recorders, e.g. an
+            individual's model. Copies are written to a temporary directory
+            next to it.
+        dbObj: db.db object for the model's database.
+        engines: list of storage engines to compare. Defaults to ENGINES.
+        repeat: number of runs for each engine. The fastest counts.
+        gldInstall, runLimits, cmd: see autotune.
+        
+    OUTPUT: dict mapping each engine to a dict with 'time' (seconds),
+        'rows' (rows inserted), 'throughput' (rows per second), and 'ok'
+        (True if all runs succeeded).
+    """
+    if engines is None:
+        engines = ENGINES
+    if runLimits is None:
+        runLimits = {}
+        
+    base = modGLM.modGLM(pathModelIn=modelPath)
+    tables = sorted(set(TABLE_REGEX.findall(base.strModel)))
+    if not tables:
+        raise UserWarning('{} has no mysql recorders.'.format(modelPath))
+        
+    r = gld.runner(cmd=cmd, **(gldInstall or {}))
+    
+    out = {}
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(
+            os.path.abspath(modelPath))) as d:
+        for engine in engines:
+            # The script is run from the model's directory.
+            with open(os.path.join(d, 'engine.sql'), 'w') as f:
+                f.write(dbObj.engineScript(engine))
+            path = os.path.join(d, 'engine.glm')
+            obj = modGLM.modGLM(strModel=base.strModel, pathModelOut=path)
+            obj.updateDatabase({'on_init': '"engine.sql"'})
+            obj.writeModel()
+            
+            best = float('inf')
+            ok = True
+            for _ in range(repeat):
+                for t in tables:
+                    dbObj.dropTable(t, ifExists=True)
+                    
+                t0 = time.perf_counter()
+                run = r.run(modelPath=path, timeout=runLimits.get('TIMEOUT'),
+                            cpuTime=runLimits.get('CPU-TIME'),
+                            memory=runLimits.get('MEMORY'))
+                best = min(best, time.perf_counter() - t0)
+                ok = ok and (run.status == gld.RUN_OK)
+                
+            rows = countRows(dbObj, tables) if ok else 0
+            out[engine] = {'time': best, 'rows': rows,
+                           'throughput': rows / best, 'ok': ok}
+            
+        for t in tables:
+            dbObj.dropTable(t, ifExists=True)
+            
+    return out
+
+if __name__ == '__main__':
+    if (len(sys.argv) > 2) and (sys.argv[1] == 'autotune'):
+        with open(CONFIGFILE) as f:
+            config = json.load(f)
+        best, _ = autotune(sys.argv[2], gldInstall=config['GLD-INSTALLATION'],
+                           runLimits=config['GLD-RUN'], log=print)
+        if best is None:
+            sys.exit('All autotune runs failed.')
+        writeTuning(best)
+        print('Best: {threads} threads/sim, {sims} sims at once. Saved to '
+              .format(**best) + CONFIGFILE)
+        sys.exit()
+        
+    if (len(sys.argv) > 2) and (sys.argv[1] == 'affinity'):
+        with open(CONFIGFILE) as f:
+            config = json.load(f)
+        r = benchAffinity(sys.argv[2], sims=config['GA']['THREADS'],
+                          threads=config['GA']['GLD-THREADS'] or 1,
+                          gldInstall=config['GLD-INSTALLATION'],
+                          runLimits=config['GLD-RUN'],
+                          membind=config['AFFINITY']['MEMBIND'])
+        print('Simulations per second:')
+        for k, v in r.items():
+            print('  {}: {}'.format(k, 'n/a' if v is None
+                                    else '{:.3f}'.format(v)))
+        sys.exit()
+        
+    if (len(sys.argv) > 2) and (sys.argv[1] == 'engines'):
+        with open(CONFIGFILE) as f:
+            config = json.load(f)
+        dbObj = db.db(**config['GLD-DB'], pool_size=1)
+        r = benchEngines(sys.argv[2], dbObj=dbObj,
+                         engines=(sys.argv[3:] or None),
+                         gldInstall=config['GLD-INSTALLATION'],
+                         runLimits=config['GLD-RUN'])
+        print('Rows inserted per second:')
+        for k, v in r.items():
+            print(('  {}: {:.1f} ({} rows in {:.2f} s), ok: {}'
+                   ).format(k, v['throughput'], v['rows'], v['time'],
+                            v['ok']))
+        sys.exit()
+        
+    if (len(sys.argv) > 2) and (sys.argv[1] == 'servers'):
+        with open(CONFIGFILE) as f:
+            config = json.load(f)
+        sims = config['GA']['THREADS']
+        r = benchServers(sys.argv[2], sims=sims,
+                         spare=max(0, config['GLD-SERVER']['SERVERS'] - sims),
+                         gldInstall=config['GLD-INSTALLATION'],
+                         runLimits=config['GLD-RUN'],
+                         basePort=config['GLD-SERVER']['BASE-PORT'],
+                         readyTimeout=config['GLD-SERVER']['READY-TIMEOUT'])
+        print('Simulations per second:')
+        for k in ('cold', 'warm'):
+            print('  {}: {}'.format(k, 'n/a' if r[k] is None
+                                    else '{:.3f}'.format(r[k])))
+        print('  ok: {}'.format(r['ok']))
+        sys.exit()
+        
+    sys.exit(__doc__)
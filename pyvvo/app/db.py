@@ -8,18 +8,319 @@ Created on Aug 29, 2017
 @author: thay838
 '''
 import mysql.connector
-import mysql.connector.pooling as pooling
 from mysql.connector import errorcode
+import numpy as np
 import helper
-from helper import strRepDict
 import constants
 import time
 import datetime
+import threading
+import collections
+import logging
 
 # Define how we handle time bounds.
 LEFT_BOUND = '>='
 RIGHT_BOUND = '<='
 
+# With shared tables (see db.createSharedTables), rows are tagged with the
+# individual's uid in this column, which is set from this session variable.
+UID_COL = 'uid'
+UID_VAR = '@pyvvo_uid'
+
+# Name of the (time, name) index of tables created by pyvvo.
+T_NAME_INDEX = 'ix_t_name'
+
+# Connections for threads other than the population's model threads: the
+# main thread (e.g. batch evaluation) and the cleanup thread. See
+# db.autoPoolSize.
+EXTRA_CONNECTIONS = 2
+
+# Number of rows fetchArray fetches at a time.
+FETCH_BATCH = 10000
+
+# InnoDB flushes its log this often with relaxed durability (see setEngine):
+# 2 means write at each commit, but only flush to disk about once a second.
+RELAXED_FLUSH = 2
+
+# Number of prepared statements kept for each pooled connection, see
+# connectionPool.statement.
+STATEMENT_CACHE_SIZE = 64
+
+class preparedStatement:
+    """Server-side prepared statement: a prepared cursor and its query.
+    Values (e.g. times) are passed to execute, and the query is only
+    parsed the first time. It acts like the cursor otherwise.
+    
+    NOTE: mysql.connector's prepared cursors prepare again if they're
+        given a different query object (even an equal string), which is why
+        the query is kept here.
+    """
+    
+    def __init__(self, cursor, query):
+        self.cursor = cursor
+        self.query = query
+        
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+    
+    def __iter__(self):
+        return iter(self.cursor)
+    
+    def execute(self, params=()):
+        """Execute the statement with the given values for its '?'
+        placeholders. Returns the statement, for fetching.
+        """
+        self.cursor.execute(self.query, tuple(params))
+        return self
+    
+    def exhaust(self):
+        """Read any rows left, so the statement can be executed again."""
+        if getattr(self.cursor, 'with_rows', True):
+            for _ in self.cursor:
+                pass
+            
+class pooledConnection:
+    """Connection checked out of a connectionPool. It acts like the
+    connection, but closing it returns the connection to the pool.
+    """
+    
+    def __init__(self, pool, entry):
+        """
+        INPUTS:
+            pool: the connectionPool.
+            entry: the connection's entry in the pool, see
+                connectionPool.acquire.
+        """
+        self._pool = pool
+        self._entry = entry
+        self._cnxn = entry['cnxn']
+        
+    def __getattr__(self, name):
+        return getattr(self._cnxn, name)
+    
+    def close(self):
+        """Return the connection to the pool. Only the first call does
+        anything.
+        """
+        entry, self._entry, self._cnxn = self._entry, None, None
+        if entry is not None:
+            self._pool.release(entry)
+            
+    def statement(self, query):
+        """Get this connection's prepared statement for query, see
+        connectionPool.statement.
+        """
+        return self._pool.statement(self._entry, query)
+            
+class connectionPool:
+    """Threadsafe pool of database connections. When all the connections
+    are in use, threads wait in line: connections are handed to waiting
+    threads first come, first served, and a thread which waits longer than
+    the timeout gets a PoolError. Connections are made as they're needed,
+    up to the pool's size.
+    
+    Each connection keeps the statements it has prepared, see statement.
+    
+    Metrics are kept for tuning the pool's size, see stats.
+    """
+    
+    def __init__(self, connect, size, timeout=None,
+                 statements=STATEMENT_CACHE_SIZE):
+        """
+        INPUTS:
+            connect: function which makes a new connection.
+            size: maximum number of connections.
+            timeout: default seconds to wait for a connection (see
+                acquire). None to wait forever.
+            statements: number of prepared statements to keep for each
+                connection.
+        """
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        
+        # Number of prepared statements to keep for each connection.
+        self.maxStatements = statements
+        
+        # Connections are kept in entries: dicts with the connection
+        # ('cnxn') and its prepared statements ('statements', an
+        # OrderedDict of preparedStatements by query, least recently used
+        # first). Statements go wherever their connection goes, and go
+        # away with it.
+        
+        # Idle entries, and threads waiting for one. A waiter is a
+        # [threading.Event, entry] list: the entry is filled in before the
+        # event is set.
+        self.idle = collections.deque()
+        self.waiters = collections.deque()
+        self.created = 0
+        
+        # Checkout times of entries in use, by id.
+        self.checkedOut = {}
+        
+        # Metrics, see stats.
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.waitTime = 0.0
+        self.maxWait = 0.0
+        self.heldTime = 0.0
+        self.maxHeld = 0.0
+        self.maxInUse = 0
+        self.prepares = 0
+        self.statementHits = 0
+        
+    def acquire(self, timeout=None):
+        """Get a connection. Close it (see pooledConnection) to return it.
+        
+        INPUTS:
+            timeout: seconds to wait if all connections are in use. Defaults
+                to the pool's timeout.
+        """
+        if timeout is None:
+            timeout = self.timeout
+            
+        t0 = time.perf_counter()
+        entry = None
+        waiter = None
+        new = False
+        with self.lock:
+            # Don't jump the line.
+            if self.idle and not self.waiters:
+                entry = self.idle.popleft()
+            elif self.created < self.size:
+                self.created += 1
+                new = True
+            else:
+                waiter = [threading.Event(), None]
+                self.waiters.append(waiter)
+                self.waits += 1
+                
+        if new:
+            try:
+                entry = {'cnxn': self.connect(),
+                         'statements': collections.OrderedDict()}
+            except:
+                with self.lock:
+                    self.created -= 1
+                raise
+        elif waiter is not None:
+            waiter[0].wait(timeout)
+            with self.lock:
+                if waiter[1] is None:
+                    # Timed out, and nobody handed us a connection since.
+                    self.waiters.remove(waiter)
+                    self.timeouts += 1
+                    raise mysql.connector.errors.PoolError(
+                        ('No connection available after {} s. All {} are '
+                         + 'in use.').format(timeout, self.size))
+            entry = waiter[1]
+            
+        t1 = time.perf_counter()
+        with self.lock:
+            self.checkedOut[id(entry)] = t1
+            self.checkouts += 1
+            self.waitTime += t1 - t0
+            self.maxWait = max(self.maxWait, t1 - t0)
+            self.maxInUse = max(self.maxInUse, len(self.checkedOut))
+            
+        # Connections can go away while idle.
+        try:
+            if not entry['cnxn'].is_connected():
+                # Statements are prepared per session.
+                entry['statements'].clear()
+                entry['cnxn'].reconnect()
+        except:
+            # Put it back for the next thread to try.
+            self.release(entry)
+            raise
+            
+        return pooledConnection(self, entry)
+    
+    def release(self, entry):
+        """Return a connection's entry from acquire. The transaction is
+        rolled back, so the next user doesn't see a stale snapshot. If
+        threads are waiting, the first one gets it.
+        """
+        try:
+            entry['cnxn'].rollback()
+        except mysql.connector.Error:
+            # It'll be reconnected by acquire.
+            pass
+            
+        t = time.perf_counter()
+        with self.lock:
+            held = t - self.checkedOut.pop(id(entry))
+            self.heldTime += held
+            self.maxHeld = max(self.maxHeld, held)
+            
+            if self.waiters:
+                waiter = self.waiters.popleft()
+                waiter[1] = entry
+                waiter[0].set()
+            else:
+                self.idle.append(entry)
+                
+    def statement(self, entry, query):
+        """Get a prepared statement (see preparedStatement) for query on a
+        checked out connection. Statements are kept for each connection, so
+        a query is only prepared once per connection. When a connection has
+        too many, the least recently used one is closed (which deallocates
+        it on the server).
+        
+        Since the connection is checked out, only one thread uses its
+        statements at a time.
+        
+        INPUTS:
+            entry: the checked out connection's entry (see acquire).
+            query: query with '?' placeholders for values.
+        """
+        cache = entry['statements']
+        try:
+            stmt = cache[query]
+        except KeyError:
+            stmt = preparedStatement(entry['cnxn'].cursor(prepared=True),
+                                     query)
+            cache[query] = stmt
+            if len(cache) > self.maxStatements:
+                _, old = cache.popitem(last=False)
+                old.cursor.close()
+            with self.lock:
+                self.prepares += 1
+        else:
+            cache.move_to_end(query)
+            with self.lock:
+                self.statementHits += 1
+                
+        return stmt
+                
+    def stats(self):
+        """Get the pool's metrics as a dict:
+            size: maximum number of connections.
+            checkouts: number of connections handed out.
+            waits: number of times all connections were in use (the pool
+                was exhausted), so a thread had to wait.
+            timeouts: number of waits which timed out.
+            meanWait, maxWait: seconds from asking for a connection to
+                getting it (including making new ones).
+            meanHeld, maxHeld: seconds connections were checked out.
+            maxInUse: most connections in use at once.
+            prepares: number of statements prepared (see statement).
+            statementHits: number of times a prepared statement was
+                reused.
+        """
+        with self.lock:
+            n = max(self.checkouts, 1)
+            returned = max(self.checkouts - len(self.checkedOut), 1)
+            return {'size': self.size, 'checkouts': self.checkouts,
+                    'waits': self.waits, 'timeouts': self.timeouts,
+                    'meanWait': self.waitTime / n, 'maxWait': self.maxWait,
+                    'meanHeld': self.heldTime / returned,
+                    'maxHeld': self.maxHeld, 'maxInUse': self.maxInUse,
+                    'prepares': self.prepares,
+                    'statementHits': self.statementHits}
+    
 class db:
     """Class to handle database operations in a threadsafe manner. The
     constructor opens up a connection pool.
@@ -35,6 +336,9 @@ class db:
         
     The reason the query is prepared first is to ensure only 1 connection is
     ever used at a time.
+    
+    Hot queries instead use getCnxnAndStatement/closeCnxnAndStatement, with
+    getTimeAndIDParams, so the server only parses them once.
         
     NOTE: When forming MySQL queries, the parameter bindings work ONLY for
         column values. https://stackoverflow.com/questions/10077046/prevent-mysql-python-from-inserting-quotes-around-database-name-parameter
@@ -42,8 +346,17 @@ class db:
     
     def __init__(self, user='gridlabd', password='gridlabd',
                  host='localhost', database='gridlabd',
-                 pool_size=1, **kwargs):
+                 pool_size=1, workers=None, pool_timeout=60, **kwargs):
         """Initializing the db class creates a pool of database connections.
+        
+        INPUTS:
+            user, password, host, database: MySQL settings.
+            pool_size: number of connections in the pool. If None, it's
+                sized from workers, see autoPoolSize.
+            workers: number of threads running models (a population's
+                numModelThreads). Only used if pool_size is None.
+            pool_timeout: seconds to wait for a connection when they're all
+                in use before raising a PoolError. None to wait forever.
         """
         # Set attributes
         self.user=user
@@ -66,15 +379,11 @@ class db:
         # Columns are 'Variable_name' and 'Value.' We just care about value
         serverMax = int(result[0][1])
         
-        # Change pooling variable if necessary.
-        if (pool_size <= serverMax) and (pool_size > pooling.CNX_POOL_MAXSIZE):
-            # Notify we're changing the default.
-            print(('Increasing mysql.connector.pooling.CNX_POOL_MAXSIZE '
-                   + 'from {} to {}'.format(pooling.CNX_POOL_MAXSIZE,
-                                            pool_size)))
-            # Change it.
-            pooling.CNX_POOL_MAXSIZE = pool_size
-        elif (pool_size > serverMax):
+        if pool_size is None:
+            pool_size = self.autoPoolSize(workers=workers,
+                                          serverMax=serverMax)
+        
+        if (pool_size > serverMax):
             # Case of the requested pool_size being too large.
             errStr = ("The requested pool_size, {}, ".format(pool_size)
                       + "is larger than the server's 'max_connections' "
@@ -90,34 +399,65 @@ class db:
             
         # Set the pool_size
         self.pool_size=pool_size
+        self.pool_timeout = pool_timeout
+        
+        # Names of shared tables, see createSharedTables.
+        self.sharedTables = None
+        
+        # Tables individuals record to, by table suffix. See registerTable.
+        self.tableRegistry = {}
+        self.registryLock = threading.Lock()
+        
+        # Set typedTables to True to create individuals' tables before
+        # GridLAB-D does (see createRecorderTables). Track the tables which
+        # have been created, and whether GridLAB-D has been seen to use
+        # them (see verifyRecorderTables).
+        self.typedTables = False
+        self.createdTables = set()
+        self.typedVerified = False
+        
+        # Storage engine for individuals' recorder tables, see setEngine.
+        # None means the server's default.
+        self.engine = None
+        # innodb_flush_log_at_trx_commit before setEngine relaxed it, to be
+        # restored (see restoreDurability). None if it wasn't relaxed.
+        self.flushSetting = None
         
         # Connect to database
         self.cnxnPool = self.connectPool() 
         
+    @staticmethod
+    def autoPoolSize(workers, serverMax):
+        """Size a pool for a population: a connection for each model
+        thread, plus EXTRA_CONNECTIONS. Each model thread's GridLAB-D also
+        connects while it runs, so the pool is kept small enough to leave
+        those connections free within the server's max_connections.
+        """
+        if workers is None:
+            raise ValueError('workers is required to size the pool.')
+        
+        size = min(workers + EXTRA_CONNECTIONS, serverMax - workers)
+        if size < 1:
+            raise ValueError(("The server's 'max_connections' ({}) is too "
+                              + 'small for {} model threads and their '
+                              + 'GridLAB-D connections.'
+                              ).format(serverMax, workers))
+        return size
+        
     def connectPool(self):
-        """Method to create and return mysql connection pool. This is threadsafe.
+        """Method to create and return the connection pool (see
+        connectionPool). This is threadsafe.
         
-        NOTE: This pooling technique doesn't allow the 'use_pure' option. For
-            GridLAB-D we already have to install the MySQL Connector C library,
-            so if it's thread-safe we could use the 'faster' option, but have 
-            to repeadetly open and close connections..
+        Unlike mysql.connector's pool, connections are made with connect,
+        so they can use the C extension.
         
         INPUTS:
             Initialized db object. See __init__
         """
-        try:
-            cnxn = pooling.MySQLConnectionPool(user=self.user,
-                                               password=self.password,
-                                               host=self.host,
-                                               database=self.database,
-                                               pool_size=self.pool_size)
-        except mysql.connector.Error as err:
-            self._printError(err)
-            raise err
-        else:
-            return cnxn
+        return connectionPool(connect=self.connect, size=self.pool_size,
+                              timeout=self.pool_timeout)
         
-    def getCnxnAndCursor(self, cursorOptions={}, attempts=10, delay=0.1):
+    def getCnxnAndCursor(self, cursorOptions={}, timeout=None):
         """Method to get a connection from the pool, and a cursor from it. Each
         method which forms and executes a query should use this method.
         
@@ -125,35 +465,21 @@ class db:
             self: initialized db object
             cursorOptions: dictionary of cursor options to pass to cursor
                 constructor. Check out https://dev.mysql.com/doc/connector-python/en/connector-python-api-mysqlcursor.html
-            attempts: number of times the method will try to get a connection.
-            delay: delay between attempts.
+            timeout: seconds to wait for a connection. Defaults to the
+                pool's timeout.
         OUTPUTS:
             database connection, connection cursor
             
-        NOTE: If a connection is not available, a PoolError is raised. We'll
-            try 10 times before erroring out.
+        NOTE: If all connections are in use, we wait our turn (first come,
+            first served). If the wait times out, a PoolError is raised.
         """
-        itCount = 1
-        while True:
-            try:
-                cnxn = self.cnxnPool.get_connection()
-            except mysql.connector.errors.PoolError as err:
-                # No connections are available. 
-                
-                # Raise the exception if we've exceeded the iteration count.
-                if itCount >= attempts:
-                    print(('Failed to obtain connection from pool after '
-                           + '{} attempts.').format(itCount))
-                    raise err
-                
-                # Increment iteration count and sleep to try again.
-                itCount += 1
-                time.sleep(delay)
-            else:
-                # Leave the loop.
-                break
+        cnxn = self.cnxnPool.acquire(timeout=timeout)
         
-        cursor = cnxn.cursor(**cursorOptions)
+        try:
+            cursor = cnxn.cursor(**cursorOptions)
+        except:
+            cnxn.close()
+            raise
         
         return cnxn, cursor
     
@@ -170,6 +496,35 @@ class db:
         cursor.close()
         cnxn.close()
         
+    def getCnxnAndStatement(self, query, timeout=None):
+        """Like getCnxnAndCursor, but get the connection's prepared
+        statement for query (see connectionPool.statement). Use for queries
+        which are run over and over, with their values (e.g. times) as '?'
+        placeholders.
+        
+        OUTPUTS:
+            database connection, preparedStatement
+        """
+        cnxn = self.cnxnPool.acquire(timeout=timeout)
+        
+        try:
+            stmt = cnxn.statement(query)
+        except:
+            cnxn.close()
+            raise
+        
+        return cnxn, stmt
+    
+    @staticmethod
+    def closeCnxnAndStatement(cnxn, stmt):
+        """Return a connection from getCnxnAndStatement to the pool. The
+        statement is kept open, to be used again.
+        """
+        try:
+            stmt.exhaust()
+        finally:
+            cnxn.close()
+        
     def connect(self, use_pure=False):
         """Method to create and return a single database connection. This
             implementation allows us to use the C connector, while the pool
@@ -216,7 +571,7 @@ class db:
             # Clean up.
             self.closeCnxnAndCursor(cnxn, cursor)
  
-    def dropTable(self, table):
+    def dropTable(self, table, ifExists=False):
         """ Simple method to drop a table from the database.
         """
         # Get connection and cursor.
@@ -224,7 +579,8 @@ class db:
         
         try:
             # Drop the table. Parameter bindings don't work here.
-            cursor.execute('DROP TABLE {}'.format(table))
+            cursor.execute('DROP TABLE {}{}'.format(
+                ('IF EXISTS ' if ifExists else ''), table))
         finally:
             # Clean up.
             self.closeCnxnAndCursor(cnxn, cursor)
@@ -242,67 +598,427 @@ class db:
         cnxn, cursor = self.getCnxnAndCursor()
         
         try:
-            q = ("SELECT table_name "
-                 "FROM information_schema.tables "
-                 "WHERE table_schema = '{}'").format(self.database)
-            
+            # Use the registry if we know the suffix's tables.
             if tableSuffix:
-                q += " AND table_name LIKE '%{}'".format(tableSuffix)
+                rows = [(t,) for t in (self.registeredTables(tableSuffix)
+                                       or [])]
+            else:
+                rows = None
                 
-            # Get the names of all tables in database.
-            cursor.execute(q)
-            # Assume there aren't so many tables that we blow up memory with 
-            # a fetch all.
-            rows = cursor.fetchall()
+            if not rows:
+                q = ("SELECT table_name "
+                     "FROM information_schema.tables "
+                     "WHERE table_schema = '{}'").format(self.database)
+                
+                if tableSuffix:
+                    q += " AND table_name LIKE '%{}'".format(tableSuffix)
+                    
+                # Get the names of all tables in database.
+                cursor.execute(q)
+                # Assume there aren't so many tables that we blow up memory
+                # with a fetch all.
+                rows = cursor.fetchall()
         finally:
             # Clean up.
             self.closeCnxnAndCursor(cnxn, cursor)  
             
         # Loop through and drop all tables.
         for row in rows:
-            self.dropTable(row[0])
+            self.dropTable(row[0], ifExists=True)
+            
+        # Forget the dropped tables.
+        with self.registryLock:
+            if tableSuffix:
+                self.tableRegistry.pop(tableSuffix, None)
+            else:
+                self.tableRegistry.clear()
+            self.createdTables.difference_update(row[0] for row in rows)
             
         return len(rows)
     
     def truncateTableBySuffix(self, suffix):
         """Function to truncate all tables with a given suffix.
         
+        With shared tables (see createSharedTables), the partitions of the
+        individual with uid given by the suffix are truncated instead.
+        
         TODO and NOTE: This is HARD-CODED to work with the current
         implementation of the mysql group recorder in GridLAB-D, which creates
         additional tables for group recorders.
         """
+        if self.sharedTables:
+            self.truncatePartitions(uid=int(suffix.lstrip('_')))
+            return
+        
+        # Skip the search if we know the tables.
+        tables = self.registeredTables(suffix)
+        
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        try:
+            if tables is None:
+                # HARD-CODE the table suffixes.
+                suff1 = r"%" + suffix.replace("_", r"\_") # escape underscore
+                suff2 = suff1 + r"\__" # tables increment from 0 upward
+                suff3 = suff1 + r"\_index" # there's an index table.
+                
+                # Form query to get tables.
+                q = ("SELECT table_name FROM INFORMATION_SCHEMA.TABLES "
+                     + "WHERE table_schema = '{db}' AND "
+                     + "(table_name LIKE '{suff1}' OR table_name LIKE "
+                     + "'{suff2}' OR table_name LIKE '{suff3}')"
+                    ).format(db=self.database, suff1=suff1, suff2=suff2,
+                             suff3=suff3)
+                
+                # Execute the query.
+                cursor.execute(q)
+                # Fetch all the rows. If the tables returned cause a memory
+                # issue, I should quite my job.
+                # NOTE: we could loop over each row and use a seperate
+                # connection to drop the table, but I'd rather do it this way
+                # to avoid taking up another connection.
+                tables = [r[0] for r in cursor.fetchall()]
+            
+            # Loop over the tables, and trucate them.
+            for t in tables:
+                try:
+                    cursor.execute('TRUNCATE TABLE {}'.format(t))
+                except mysql.connector.Error as err:
+                    # GridLAB-D creates a registered table when the model
+                    # is run, which may not have happened.
+                    if err.errno != errorcode.ER_NO_SUCH_TABLE:
+                        raise err
+            
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+        
+    def registerTable(self, suffix, table, scan=False):
+        """Record that an individual records to a table, so cleaning it up
+        (truncateTableBySuffix, dropAllTables) doesn't need to search
+        INFORMATION_SCHEMA. This is threadsafe.
+        
+        INPUTS:
+            suffix: the individual's table suffix, see
+                individual.tableSuffix.
+            table: table name, including the suffix.
+            scan: True if GridLAB-D creates more tables than the one named
+                (like the mysql group_recorder). Cleanup then searches for
+                the suffix's tables.
+        """
+        with self.registryLock:
+            if scan:
+                self.tableRegistry[suffix] = None
+            elif self.tableRegistry.get(suffix, ()) is not None:
+                self.tableRegistry.setdefault(suffix, set()).add(table)
+                
+    def registeredTables(self, suffix):
+        """Get a sorted list of the tables registered for a suffix (see
+        registerTable), or None if they have to be searched for.
+        """
+        with self.registryLock:
+            tables = self.tableRegistry.get(suffix)
+            if tables is None:
+                return None
+            return sorted(tables)
+        
+    def setEngine(self, engine=None, relaxed=False, log=None):
+        """Set the storage engine for individuals' recorder tables. Their
+        rows are scratch data, read once to evaluate the individual and
+        then truncated, so there's no need to pay for durability. Tables
+        from createRecorderTables and createSharedTables use the engine,
+        and GridLAB-D uses it for tables it creates, since individuals set
+        the session's default engine when connecting (see engineScript).
+        
+        INPUTS:
+            engine: 'MEMORY', 'InnoDB', etc. None for the server's default.
+                MEMORY tables can't be partitioned, hold TEXT or BLOB
+                columns, or grow beyond max_heap_table_size.
+            relaxed: True to have InnoDB flush its log to disk about once a
+                second rather than at every commit. MySQL only has this
+                setting server-wide (innodb_flush_log_at_trx_commit), so it
+                affects every database on the server until it's put back
+                with restoreDurability. It needs the SYSTEM_VARIABLES_ADMIN
+                (or SUPER) privilege: without it, a warning is logged and
+                durability is left alone.
+            log: logging.Logger instance for warnings. If None, the root
+                logger is used.
+        """
+        if log is None:
+            log = logging.getLogger()
+            
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        
+        try:
+            if engine is not None:
+                cursor.execute('SHOW ENGINES')
+                # Columns are Engine, Support, ... Support is YES, NO,
+                # DEFAULT, or DISABLED.
+                engines = {r[0].upper(): r[0] for r in cursor.fetchall()
+                           if r[1] in ('YES', 'DEFAULT')}
+                try:
+                    engine = engines[engine.upper()]
+                except KeyError:
+                    raise UserWarning(('The storage engine {} is not '
+                                       + 'supported by the server. Supported '
+                                       + 'engines: {}'
+                                       ).format(engine,
+                                                sorted(engines.values())))
+                    
+            if relaxed and (self.flushSetting is None):
+                # Keep the server's setting, to put it back when done.
+                cursor.execute('SELECT @@GLOBAL.innodb_flush_log_at_trx_commit')
+                setting = int(cursor.fetchone()[0])
+                try:
+                    cursor.execute(('SET GLOBAL innodb_flush_log_at_trx_commit '
+                                    + '= {:d}').format(RELAXED_FLUSH))
+                except mysql.connector.Error as err:
+                    if err.errno not in (errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR,
+                                         errorcode.ER_ACCESS_DENIED_ERROR):
+                        raise
+                    log.warning(('Durability not relaxed, since the user '
+                                 + 'lacks the privilege to set '
+                                 + 'innodb_flush_log_at_trx_commit: {}'
+                                 ).format(err))
+                else:
+                    self.flushSetting = setting
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+        
+        self.engine = engine
+        
+    def restoreDurability(self):
+        """Put back the server's innodb_flush_log_at_trx_commit setting
+        from before setEngine relaxed it. Does nothing if it wasn't
+        relaxed.
+        """
+        if self.flushSetting is None:
+            return
+        
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        
+        try:
+            cursor.execute(('SET GLOBAL innodb_flush_log_at_trx_commit = '
+                            + '{:d}').format(self.flushSetting))
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+            
+        self.flushSetting = None
+        
+    @staticmethod
+    def engineScript(engine):
+        """SQL for a model to run when connecting (see
+        modGLM.updateDatabase), so tables GridLAB-D creates use the given
+        storage engine.
+        """
+        return 'SET SESSION default_storage_engine = {};\n'.format(engine)
+        
+    def createSharedTables(self, tables, uids, idCol='id', tCol='t',
+                           nameCol='name'):
+        """Create a table for each kind of recorder, shared by all
+        individuals, rather than letting GridLAB-D create tables for each
+        individual. Tables are partitioned by the individual's uid, so
+        cleaning up an individual truncates its partitions (see
+        truncatePartitions), and queries read one partition (see
+        partitionTable). Existing tables with the same names are dropped.
+        
+        GridLAB-D's mysql recorder can't write a uid, so each table has a
+        trigger which sets the uid from a session variable. Models set it
+        when connecting, with a script from uidScript.
+        
+        INPUTS:
+            tables: dict mapping table names to lists of (column, SQL type)
+                tuples for recorded properties, e.g. from
+                gld.recorderColumns.
+            uids: all the uids individuals may have. Each gets a partition.
+            idCol, tCol, nameCol: names of GridLAB-D's id, time, and name
+                columns.
+        """
+        # MySQL only partitions InnoDB tables.
+        if (self.engine is not None) and (self.engine.upper() != 'INNODB'):
+            raise UserWarning(("Shared tables are partitioned, so they can't "
+                               + 'use the {} storage engine.'
+                               ).format(self.engine))
+            
+        partitions = ['PARTITION {} VALUES IN ({:d})'.format(
+            self.partitionName(u), u) for u in uids]
+        
+        queries = []
+        for table, cols in tables.items():
+            queries.append('DROP TABLE IF EXISTS {}'.format(table))
+            queries.append(self.recorderTableSQL(table=table, cols=cols,
+                                                 idCol=idCol, tCol=tCol,
+                                                 nameCol=nameCol,
+                                                 partitions=partitions,
+                                                 engine=self.engine))
+            queries.append(('CREATE TRIGGER {table}_{uid} BEFORE INSERT ON '
+                            + '{table} FOR EACH ROW SET NEW.{uid} = {var}'
+                            ).format(table=table, uid=UID_COL, var=UID_VAR))
+            
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        
+        try:
+            for q in queries:
+                cursor.execute(q)
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+            
+        self.sharedTables = list(tables)
+        
+    def createRecorderTables(self, tables, idCol='id', tCol='t',
+                             nameCol='name'):
+        """Create tables for GridLAB-D's mysql recorders before the model
+        is run, rather than letting GridLAB-D create them. Values are
+        stored in numeric columns (no strings to parse), and there's an
+        index on (time, name) for filtering by time. GridLAB-D appends to
+        existing tables, as long as the recorder doesn't have the PURGE
+        option; check with verifyRecorderTables.
+        
+        Tables which have already been created are skipped, since
+        individuals' tables are truncated rather than dropped (see
+        truncateTableBySuffix).
+        
+        INPUTS:
+            tables: dict mapping table names to lists of (column, SQL type)
+                tuples for recorded properties (see gld.sqlColumns).
+            idCol, tCol, nameCol: names of GridLAB-D's id, time, and name
+                columns.
+        """
+        with self.registryLock:
+            new = [t for t in tables if t not in self.createdTables]
+            
+        if not new:
+            return
+        
         # Get connection and cursor.
         cnxn, cursor = self.getCnxnAndCursor()
+        
         try:
-            # HARD-CODE the table suffixes.
-            suff1 = r"%" + suffix.replace("_", r"\_") # escape underscore
-            suff2 = suff1 + r"\__" # tables increment from 0 upward
-            suff3 = suff1 + r"\_index" # there's an index table.
+            for t in new:
+                cursor.execute(self.recorderTableSQL(table=t, cols=tables[t],
+                                                     idCol=idCol, tCol=tCol,
+                                                     nameCol=nameCol,
+                                                     engine=self.engine))
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
             
-            # Form query to get tables.
-            q = ("SELECT table_name FROM INFORMATION_SCHEMA.TABLES "
-                 + "WHERE table_schema = '{db}' AND "
-                 + "(table_name LIKE '{suff1}' OR table_name LIKE '{suff2}' "
-                 + "OR table_name LIKE '{suff3}')"
-                ).format(db=self.database, suff1=suff1, suff2=suff2,
-                         suff3=suff3)
+        with self.registryLock:
+            self.createdTables.update(new)
             
-            # Execute the query.
+    def verifyRecorderTables(self, tables):
+        """Check GridLAB-D wrote to tables from createRecorderTables rather
+        than replacing them: they should still have the (time, name) index.
+        Raises a UserWarning if not.
+        """
+        q = ("SELECT DISTINCT table_name FROM information_schema.statistics "
+             + "WHERE table_schema = '{}' AND index_name = '{}' AND "
+             + "table_name IN ({})").format(self.database, T_NAME_INDEX,
+                                            ', '.join("'{}'".format(t)
+                                                      for t in tables))
+        
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        
+        try:
             cursor.execute(q)
-            # Fetch all the rows. If the tables returned cause a memory
-            # issue, I should quite my job.
-            # NOTE: we could loop over each row and use a seperate connection
-            # to drop the table, but I'd rather do it this way to avoid 
-            # taking up another connection.
-            rows = cursor.fetchall()
+            found = {r[0] for r in cursor.fetchall()}
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
             
-            # Loop over the rows, and trucate the tables.
-            for r in rows:
-                cursor.execute('TRUNCATE TABLE {}'.format(r[0]))
+        missing = set(tables) - found
+        if missing:
+            raise UserWarning(('GridLAB-D replaced the tables {}, so they '
+                               + "aren't typed and indexed. Make sure "
+                               + "recorders don't use the PURGE option."
+                               ).format(sorted(missing)))
             
+        self.typedVerified = True
+        
+    @staticmethod
+    def recorderTableSQL(table, cols, idCol='id', tCol='t', nameCol='name',
+                         partitions=None, engine=None):
+        """Build the statement to create a table for a mysql recorder, with
+        typed columns, an index on (time, name), and a compact row format
+        (except for MEMORY tables, whose rows are always fixed length).
+        
+        INPUTS:
+            table: table name.
+            cols: list of (column, SQL type) tuples for recorded properties.
+            idCol, tCol, nameCol: names of GridLAB-D's id, time, and name
+                columns.
+            partitions: list of partition definitions for a shared table
+                (see createSharedTables), which also gets a uid column.
+            engine: storage engine, see setEngine. None for the server's
+                default.
+        """
+        colStr = ''.join('{} {}, '.format(c, t) for c, t in cols)
+        if partitions is None:
+            key = idCol
+            tail = ''
+        else:
+            colStr += '{} INT NOT NULL, '.format(UID_COL)
+            key = '{}, {}'.format(idCol, UID_COL)
+            tail = ' PARTITION BY LIST ({}) ({})'.format(UID_COL,
+                                                         ', '.join(partitions))
+            
+        opts = '' if engine is None else ' ENGINE={}'.format(engine)
+        if (engine is not None) and (engine.upper() == 'MEMORY'):
+            # MEMORY indexes are hashes by default, which can't be used
+            # for ranges of times.
+            using = ' USING BTREE'
+        else:
+            using = ''
+            opts += ' ROW_FORMAT=COMPACT'
+            
+        return ('CREATE TABLE IF NOT EXISTS {table} ({idCol} BIGINT NOT NULL '
+                + 'AUTO_INCREMENT, {tCol} DATETIME NOT NULL, {nameCol} '
+                + 'VARCHAR(64), {cols}PRIMARY KEY ({key}), INDEX {index}'
+                + '{using} ({tCol}, {nameCol})){opts}{tail}'
+                ).format(table=table, idCol=idCol, tCol=tCol, nameCol=nameCol,
+                         cols=colStr, key=key, index=T_NAME_INDEX,
+                         using=using, opts=opts, tail=tail)
+        
+    def truncatePartitions(self, uid):
+        """Truncate an individual's partitions of the shared tables."""
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        
+        try:
+            for table in self.sharedTables:
+                cursor.execute('ALTER TABLE {} TRUNCATE PARTITION {}'.format(
+                    table, self.partitionName(uid)))
         finally:
             # Clean up.
             self.closeCnxnAndCursor(cnxn, cursor)
+            
+    @staticmethod
+    def partitionName(uid):
+        """Name of an individual's partition of the shared tables."""
+        return 'p{:d}'.format(uid)
+    
+    @staticmethod
+    def partitionTable(table, uid):
+        """Table to query for an individual's rows in a shared table, e.g.
+        'power PARTITION (p12)'. Use it anywhere a table name goes in a
+        SELECT.
+        """
+        return '{} PARTITION ({})'.format(table, db.partitionName(uid))
+    
+    @staticmethod
+    def uidScript(uid):
+        """SQL for a model to run when connecting (see
+        modGLM.updateDatabase), so the rows it writes to shared tables are
+        tagged with its uid.
+        """
+        return 'SET {} = {:d};\n'.format(UID_VAR, uid)
         
     def sumComplexPower(self, cols, table, idCol='id', tCol='t',
                         nameCol='name', starttime=None, stoptime=None):
@@ -320,45 +1036,22 @@ class db:
         
         OUTPUT: Dictionary with 'rowSums' and 'unit' fields. 'rowSums' is a list
         """
-        # Prepare query.
-        q = "SELECT {} FROM {}".format(','.join(cols), table)
-        # Add time filter, and ID filter if applicable
-        q += self.getTimeAndIDFilter(starttime=starttime,
-                                     stoptime=stoptime, table=table, 
-                                     idCol=idCol, tCol=tCol,
-                                     nameCol=nameCol)
-            
-        # Get connection and cursor.
-        cnxn, cursor = self.getCnxnAndCursor()
-        
-        try:    
-            # Execute the query.
-            cursor.execute(q)
-            
-            # Fetch the first row.
-            row = cursor.fetchone()
-            
-            # Initialize rows
-            rowSum = [] 
-            # Loop over the rows and sum.
-            while row:
-                # Three phase power is simply the complex sum of the individual
-                # phases.
-                rowSum.append(0+0j)
-                for ind in range(len(cols)):
-                    # Get the complex value and its unit
-                    v, u = helper.getComplex(row[ind]) 
-                    # Add the value to the total.
-                    rowSum[-1] += v
-        
-                # Advance the cursor.    
-                row = cursor.fetchone()
-        finally:   
-            # Clean up.
-            self.closeCnxnAndCursor(cnxn, cursor)
+        # Values are strings like '+12.34-1.2j VA'.
+        a = self.fetchArray(table=table, cols=cols, idCol=idCol, tCol=tCol,
+                            nameCol=nameCol, starttime=starttime,
+                            stoptime=stoptime, dtype=object)
+        
+        # Parse each column's strings in bulk.
+        u = None
+        rowSum = np.zeros(len(a), dtype=complex)
+        for col in cols:
+            n, units = helper.getComplexArray(a[col])
+            if len(a):
+                u = units[0] or None
+            rowSum += n
         
         # Assign return. NOTE: All units assumed to be the same.
-        out = {'rowSums': rowSum, 'unit': u}
+        out = {'rowSums': rowSum.tolist(), 'unit': u}
         return out
     
     def getComplexFromParts(self, table, cols, idCol='id', tCol='t',
@@ -370,6 +1063,8 @@ class db:
         
         NOTE: For now, assume only two columns (cols). This could easily be
         adapted for more in the future.
+        
+        OUTPUT: numpy array of complex numbers, one for each row.
         """
         # Ensure there are only two elements in cols
         if len(cols) != 2:
@@ -386,37 +1081,12 @@ class db:
         except ValueError:
             raise UserWarning('Columns provided lack _real and/or _reactive')
         
-        # Prepare query.
-        q = "SELECT {} FROM {}".format(','.join(cols), table)
-        # Add time filter, and ID filter if applicable
-        q += self.getTimeAndIDFilter(starttime=starttime,
-                                     stoptime=stoptime, table=table, 
-                                     idCol=idCol, tCol=tCol,
-                                     nameCol=nameCol)
-            
-        # Get connection and cursor.
-        cnxn, cursor = self.getCnxnAndCursor()
-        
-        # Initialize return
-        out = []
-        try:    
-            # Execute the query.
-            cursor.execute(q)
-            
-            # Fetch the first row.
-            row = cursor.fetchone()
-            # Loop over the rows and sum.
-            while row:
-                # Convert values to complex
-                out.append(complex(row[realInd], row[reactiveInd]))
-                # Advance the cursor.
-                row = cursor.fetchone()
-        finally:   
-            # Clean up.
-            self.closeCnxnAndCursor(cnxn, cursor)
+        a = self.fetchArray(table=table, cols=cols, idCol=idCol, tCol=tCol,
+                            nameCol=nameCol, starttime=starttime,
+                            stoptime=stoptime)
         
         # Done.
-        return out
+        return a[cols[realInd]] + 1j * a[cols[reactiveInd]]
         
     
     def sumMatrix(self, table, cols, nameCol='name', idCol='id', tCol='t',
@@ -439,20 +1109,20 @@ class db:
         s = ' + '.join(cols)
         q = "SELECT SUM({}) FROM {}".format(s, table)
         # Add time filter, and ID filter if applicable
-        q += self.getTimeAndIDFilter(starttime=starttime,
-                                     stoptime=stoptime, table=table, 
-                                     idCol=idCol, tCol=tCol,
-                                     nameCol=nameCol)
-        # Get connection and cursor.
-        cnxn, cursor = self.getCnxnAndCursor()
+        where, params = self.getTimeAndIDParams(starttime=starttime,
+                                                stoptime=stoptime,
+                                                table=table, idCol=idCol,
+                                                tCol=tCol, nameCol=nameCol)
+        q += where
+        # Get connection and prepared statement.
+        cnxn, stmt = self.getCnxnAndStatement(q)
         
         try:
             # Execute query, return
-            cursor.execute(q)
-            r = cursor.fetchone()
+            r = stmt.execute(params).fetchone()
         finally:
             # Clean up.
-            self.closeCnxnAndCursor(cnxn, cursor)
+            self.closeCnxnAndStatement(cnxn, stmt)
         
         return r[0]
     
@@ -476,26 +1146,79 @@ class db:
         # Create query
         q = "SELECT {} FROM {}".format(colStr, table)
         # Add time filter, and ID filter if applicable
-        q += self.getTimeAndIDFilter(starttime=starttime,
-                                     stoptime=stoptime, table=table, 
-                                     idCol=idCol, tCol=tCol,
-                                     nameCol=nameCol)
+        where, params = self.getTimeAndIDParams(starttime=starttime,
+                                                stoptime=stoptime,
+                                                table=table, idCol=idCol,
+                                                tCol=tCol, nameCol=nameCol)
+        q += where
             
-        # Get connection and cursor.
-        cnxn, cursor = self.getCnxnAndCursor()
+        # Get connection and prepared statement.
+        cnxn, stmt = self.getCnxnAndStatement(q)
         
         try:
-            # Execute the query
-            cursor.execute(q)
-            
-            # Fetch all
-            rows = cursor.fetchall()
+            # Execute the query, and fetch all
+            rows = stmt.execute(params).fetchall()
         
         finally:
             # Clean up.
-            self.closeCnxnAndCursor(cnxn, cursor)
+            self.closeCnxnAndStatement(cnxn, stmt)
         return rows
     
+    def fetchArray(self, table, cols, idCol='id', tCol='t', nameCol='name',
+                   starttime=None, stoptime=None, dtype=float,
+                   batchSize=FETCH_BATCH):
+        """Read a table into a NumPy structured array. Like fetchAll, but
+        rows are fetched in batches (cursor.fetchmany) and each batch is
+        converted to an array at once, so there's no Python work per row
+        afterwards, and no list of every row is kept.
+        
+        INPUTS:
+            table, cols, idCol, tCol, nameCol, starttime, stoptime: see
+                fetchAll.
+            dtype: numpy type for all the columns, or a list with one for
+                each column. NULL values are nan in float columns.
+            batchSize: number of rows to fetch at a time.
+            
+        OUTPUT: structured numpy array with a field named after each
+            column, e.g. a['measured_real_power'].
+        """
+        if isinstance(dtype, (list, tuple)):
+            dt = np.dtype(list(zip(cols, dtype)))
+        else:
+            dt = np.dtype([(c, dtype) for c in cols])
+            
+        # Create query
+        q = "SELECT {} FROM {}".format(','.join(cols), table)
+        # Add time filter, and ID filter if applicable
+        where, params = self.getTimeAndIDParams(starttime=starttime,
+                                                stoptime=stoptime,
+                                                table=table, idCol=idCol,
+                                                tCol=tCol, nameCol=nameCol)
+        q += where
+            
+        # Get connection and prepared statement.
+        cnxn, stmt = self.getCnxnAndStatement(q)
+        
+        out = []
+        try:
+            # Execute the query
+            stmt.execute(params)
+            
+            while True:
+                rows = stmt.fetchmany(batchSize)
+                if not rows:
+                    break
+                # Rows are tuples, which numpy takes as records.
+                out.append(np.array(rows, dtype=dt))
+        finally:
+            # Clean up.
+            self.closeCnxnAndStatement(cnxn, stmt)
+            
+        if not out:
+            return np.empty(0, dtype=dt)
+        
+        return np.concatenate(out)
+    
     def voltViolationsFromRecorder(self, table, lowerBound,
                                     upperBound, voltageCols, idCol='id',
                                     nameCol='name',  tCol='t',
@@ -511,61 +1234,207 @@ class db:
         add more detail, but it would also make sense to just look up the data
         in the database for more detail...
         """
-        # Create the base of the query.
-        qBase = 'SELECT COUNT({idCol}) FROM {table}'.format(idCol=idCol,
-                                                            table=table)
+        # Count low and high voltages in one pass. A column out of bounds
+        # makes its row a violation.
+        low = ' OR '.join('{} < ?'.format(c) for c in voltageCols)
+        high = ' OR '.join('{} > ?'.format(c) for c in voltageCols)
+        q = ('SELECT COUNT(CASE WHEN ({low}) THEN {idCol} END), '
+             + 'COUNT(CASE WHEN ({high}) THEN {idCol} END) FROM {table}'
+             ).format(low=low, high=high, idCol=idCol, table=table)
         
         # Add time filter, and ID filter if applicable
-        qBase += self.getTimeAndIDFilter(starttime=starttime,
-                                         stoptime=stoptime, table=table, 
-                                         idCol=idCol, tCol=tCol,
-                                         nameCol=nameCol)
+        where, params = self.getTimeAndIDParams(starttime=starttime,
+                                                stoptime=stoptime,
+                                                table=table, idCol=idCol,
+                                                tCol=tCol, nameCol=nameCol)
+        q += where
         
-        '''
-        qBase = ('SELECT {tCol}, {nameCol}, {voltageCols} FROM {table} '
-                 + 'WHERE ').format(tCol=tCol, nameCol=nameCol,
-                                    voltageCols=', '.join(voltageCols),
-                                    table=table)
-        '''
-                 
-        # String for comparison
-        compStr = '{col} {operator} {value}'
+        # Bounds are values too, so they're bound rather than put in the
+        # query.
+        params = ([lowerBound] * len(voltageCols)
+                  + [upperBound] * len(voltageCols) + params)
+        
+        # Get connection and prepared statement.
+        cnxn, stmt = self.getCnxnAndStatement(q)
+        
+        try:
+            row = stmt.execute(params).fetchone()
+        finally:
+            # Clean up.
+            self.closeCnxnAndStatement(cnxn, stmt)
+            
+        out = {'low': row[0], 'high': row[1]}
+        return out
+    
+    def costAggregates(self, energyTable, powerTable, triplexTable,
+                       lowerBound, upperBound, leadLimit, lagLimit,
+                       idCol='id', nameCol='name', tCol='t', starttime=None,
+                       stoptime=None):
+        """Get everything needed to compute an individual's costs in a
+        single query. Rather than streaming the power table back, power
+        factor shortfalls are computed and summed by the server. See
+        gld.costInputs and gld.computeCosts for the inputs.
         
-        # Only partly format the string (put in col, but nothing else)
-        qBase += ' AND (' + compStr.format_map(strRepDict(col=voltageCols[0]))
+        INPUTS:
+            energyTable: dict with 'table' and 'columns'. The energy is
+                read at the stoptime.
+            powerTable: dict with 'table' and 'columns', which must be a
+                real and a reactive power column (see getComplexFromParts).
+            triplexTable: dict with 'table' and 'columns' - voltage columns
+                for counting violations (see voltViolationsFromRecorder).
+            lowerBound, upperBound: voltage limits (exclusive).
+            leadLimit, lagLimit: minimum leading and lagging power factors.
+            starttime, stoptime: aware datetime objects, inclusive.
+            
+        OUTPUT: dict with the following fields:
+            energy: energy at the stoptime.
+            energyRows: number of energy rows at the stoptime. Should be 1.
+            powerFactorLead: sum of leading power factor shortfalls below
+                leadLimit, over all rows.
+            powerFactorLag: "..." lagging "..." lagLimit "..."
+            violations: dict with 'high' and 'low' voltage violation counts.
+        """
+        filters = self.costFilters(energyTable=energyTable,
+                                   powerTable=powerTable,
+                                   triplexTable=triplexTable, idCol=idCol,
+                                   nameCol=nameCol, tCol=tCol,
+                                   starttime=starttime, stoptime=stoptime)
+        q = self.costQuery(energyTable=energyTable, powerTable=powerTable,
+                           triplexTable=triplexTable, lowerBound=lowerBound,
+                           upperBound=upperBound, leadLimit=leadLimit,
+                           lagLimit=lagLimit, filters=filters)
+        
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
         
-        # Loop over the remaining voltage columns
-        for vCol in voltageCols[1:]:
-            qBase += ' OR ' + compStr.format_map(strRepDict(col=vCol))
+        try:
+            # Execute the query. There's exactly one row.
+            cursor.execute(q)
+            row = cursor.fetchone()
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
             
-        # Close the parentheses
-        qBase += ')'
+        return self.costRow(row)
+    
+    def batchCostAggregates(self, tables, lowerBound, upperBound,
+                            leadLimit, lagLimit, idCol='id', nameCol='name',
+                            tCol='t', starttime=None, stoptime=None):
+        """costAggregates for many individuals (e.g. a whole generation) in
+        a single query: the query for each is combined with UNION ALL.
         
-        # Create queries for high and low voltage
-        qLow = qBase.format(operator='<', value=lowerBound)
-        qHigh = qBase.format(operator='>', value=upperBound)
-        queries = {'low': qLow, 'high': qHigh}
+        INPUTS:
+            tables: dict mapping each individual's uid to a dict with its
+                'energyTable', 'powerTable', and 'triplexTable'.
+            See costAggregates for the rest.
+            
+        OUTPUT: dict mapping uids to the output of costAggregates.
+        """
+        parts = []
+        for uid, t in tables.items():
+            filters = self.costFilters(idCol=idCol, nameCol=nameCol,
+                                       tCol=tCol, starttime=starttime,
+                                       stoptime=stoptime, **t)
+            q = self.costQuery(lowerBound=lowerBound, upperBound=upperBound,
+                               leadLimit=leadLimit, lagLimit=lagLimit,
+                               filters=filters, **t)
+            parts.append('SELECT {:d} AS uid, c.* FROM ({}) AS c'.format(uid,
+                                                                        q))
+            
+        if not parts:
+            return {}
         
-        # Initialize return
-        out = {}
+        q = ' UNION ALL '.join(parts)
         
         # Get connection and cursor.
         cnxn, cursor = self.getCnxnAndCursor()
         
         try:
-            # Get the violations
-            for key, query in queries.items():
-                # Execute the query
-                cursor.execute(query)
-                violations = cursor.fetchall()
-                # Assign output (it comes in a single-valued list which
-                # contains a single-valued tuple)
-                out[key] = violations[0][0]
+            # Execute the query. There's a row for each individual.
+            cursor.execute(q)
+            rows = cursor.fetchall()
         finally:
             # Clean up.
             self.closeCnxnAndCursor(cnxn, cursor)
             
-        return out
+        return {row[0]: self.costRow(row[1:]) for row in rows}
+    
+    def costFilters(self, energyTable, powerTable, triplexTable, idCol='id',
+                    nameCol='name', tCol='t', starttime=None, stoptime=None):
+        """Get the filters for costQuery (see getTimeAndIDFilter). Energy
+        is read at the stoptime.
+        """
+        filters = {}
+        for key, t, start in (('energy', energyTable, stoptime),
+                              ('power', powerTable, starttime),
+                              ('triplex', triplexTable, starttime)):
+            filters[key] = self.getTimeAndIDFilter(starttime=start,
+                                                   stoptime=stoptime,
+                                                   table=t['table'],
+                                                   idCol=idCol, tCol=tCol,
+                                                   nameCol=nameCol)
+            
+        return filters
+    
+    @staticmethod
+    def costQuery(energyTable, powerTable, triplexTable, lowerBound,
+                  upperBound, leadLimit, lagLimit, filters):
+        """Build the query for costAggregates. filters is a dict of WHERE
+        clauses (see getTimeAndIDFilter) for the 'energy', 'power', and
+        'triplex' tables. The query returns a single row of energy,
+        energyRows, powerFactorLead, powerFactorLag, low, and high.
+        """
+        # Find the real and reactive columns, like getComplexFromParts.
+        cols = powerTable['columns']
+        try:
+            p = [c for c in cols if '_real' in c.lower()][0]
+            q = [c for c in cols if '_reactive' in c.lower()][0]
+        except IndexError:
+            raise UserWarning('Columns provided lack _real and/or _reactive')
+        
+        # Power factor of a row. Rows with zero power have no power factor
+        # (like helper.powerFactors), and are skipped.
+        pf = 'ABS({p})/SQRT({p}*{p}+{q}*{q})'.format(p=p, q=q)
+        devStr = ('COALESCE(SUM(CASE WHEN {cond} AND ({p}<>0 OR {q}<>0) '
+                  + 'AND {pf}<{limit} THEN {limit}-{pf} ELSE 0 END), 0)')
+        # Negative reactive power is leading.
+        lead = devStr.format(cond='{}<0'.format(q), p=p, q=q, pf=pf,
+                             limit=leadLimit)
+        lag = devStr.format(cond='{}>=0'.format(q), p=p, q=q, pf=pf,
+                            limit=lagLimit)
+        
+        # Count rows with any voltage out of bounds, like
+        # voltViolationsFromRecorder.
+        vStr = 'COALESCE(SUM(CASE WHEN ({}) THEN 1 ELSE 0 END), 0)'
+        low = vStr.format(' OR '.join('{}<{}'.format(c, lowerBound)
+                                      for c in triplexTable['columns']))
+        high = vStr.format(' OR '.join('{}>{}'.format(c, upperBound)
+                                       for c in triplexTable['columns']))
+        
+        # Each table is aggregated to one row, so cross joining them gives
+        # a single row.
+        q = ('SELECT e.energy, e.energyRows, p.pfLead, p.pfLag, v.vLow, '
+             + 'v.vHigh FROM '
+             + '(SELECT MAX({}) AS energy, COUNT(*) AS energyRows FROM {}{}) '
+             + 'AS e CROSS JOIN '
+             + '(SELECT {} AS pfLead, {} AS pfLag FROM {}{}) AS p CROSS JOIN '
+             + '(SELECT {} AS vLow, {} AS vHigh FROM {}{}) AS v'
+             ).format(energyTable['columns'][0], energyTable['table'],
+                      filters['energy'],
+                      lead, lag, powerTable['table'], filters['power'],
+                      low, high, triplexTable['table'], filters['triplex'])
+             
+        return q
+    
+    @staticmethod
+    def costRow(row):
+        """Convert the row returned by a costQuery to the output of
+        costAggregates. Note MySQL sums integers as decimals.
+        """
+        return {'energy': row[0], 'energyRows': int(row[1]),
+                'powerFactorLead': float(row[2]),
+                'powerFactorLag': float(row[3]),
+                'violations': {'low': int(row[4]), 'high': int(row[5])}}
     
     # Not using the following functions anymore, but it helps to keep it 
     # around.
@@ -773,13 +1642,13 @@ class db:
         q = "SELECT {}, {} FROM {}".format(nameCol, ','.join(phaseCols),
                                            table)
         # Add time filter, and ID filter if applicable
-        q += self.getTimeAndIDFilter(starttime=t,
-                                     stoptime=t, table=table, 
-                                     idCol=idCol, tCol=tCol,
-                                     nameCol=nameCol)
+        where, params = self.getTimeAndIDParams(starttime=t, stoptime=t,
+                                                table=table, idCol=idCol,
+                                                tCol=tCol, nameCol=nameCol)
+        q += where
             
-        # Get connection and cursor.
-        cnxn, cursor = self.getCnxnAndCursor()
+        # Get connection and prepared statement.
+        cnxn, stmt = self.getCnxnAndStatement(q)
         
         try:
             # Based on the dictType, determine what to strip from the phaseCols
@@ -790,10 +1659,10 @@ class db:
                 s = 'switch'
             
             # Query the database.
-            cursor.execute(q)
+            stmt.execute(params)
             
             # Iterate through the rows
-            for row in cursor:
+            for row in stmt:
                 # Extract the name, which will always be the first element.
                 n = row[0]
                 # Loop through the rest of the row.
@@ -810,7 +1679,7 @@ class db:
                 
         finally:
             # Clean up.
-            self.closeCnxnAndCursor(cnxn, cursor)
+            self.closeCnxnAndStatement(cnxn, stmt)
         
         # Done. 
         return inDict
@@ -839,15 +1708,42 @@ class db:
         f = tFilter + idFilter
         return f
             
+    def getTimeAndIDParams(self, starttime, stoptime, table, idCol='id',
+                           tCol='t', nameCol='name'):
+        """Like getTimeAndIDFilter, but the times are '?' placeholders, for
+        prepared statements (see getCnxnAndStatement). The ID filter, which
+        is only needed for ambiguous times, has its values in the clause.
+        
+        OUTPUTS: WHERE clause, list of values for its placeholders
+        """
+        tFilter, params = self.timeParams(starttime=starttime,
+                                          stoptime=stoptime, tCol=tCol)
+        
+        # If the times are ambiguous, get the ID filter.
+        ambiguous = any((helper.isAmbiguous(starttime),
+                         helper.isAmbiguous(stoptime)))
+        
+        if ambiguous:
+            tFilter += self.idFilter(tFilter=self.timeWhere(
+                                        starttime=starttime,
+                                        stoptime=stoptime, tCol=tCol),
+                                     table=table, starttime=starttime,
+                                     stoptime=stoptime, idCol=idCol,
+                                     tCol=tCol, nameCol=nameCol)
+            
+        return tFilter, params
+            
     @staticmethod
-    def timeWhere(starttime, stoptime, tCol):
-        """Helper function to get WHERE clause for time-based query. Both times 
+    def timeBounds(starttime, stoptime):
+        """Helper function to get the time strings to filter by. Both times
             are considered inclusive.
         
         INPUTS:
             starttime: aware datetime object
             stoptime: aware datetime object
-            tCol: name of the 'time' column
+            
+        OUTPUT: None for no time filtering, (time,) for equal times, or
+            (starttime, stoptime) for a range.
         """
         if starttime and stoptime:
             # Convert starttime to a string. 
@@ -866,28 +1762,65 @@ class db:
                     stopTemp = stoptime + datetime.timedelta(seconds=3600)
                     stop_str = stopTemp.strftime(constants.DATE_FMT)
                     
-                # Create time range.
-                tFilter = (" WHERE ({tCol}{LEFT_BOUND}'{starttime}' AND "
-                           "{tCol}{RIGHT_BOUND}'{stoptime}')").format(tCol=tCol,
-                                                                      LEFT_BOUND=LEFT_BOUND,
-                                                                      RIGHT_BOUND=RIGHT_BOUND,
-                                                                      starttime=start_str,
-                                                                      stoptime=stop_str)
+                return (start_str, stop_str)
             else:
-                # Times are equal, use equality.
-                tFilter = " WHERE ({tCol}='{starttime}')".format(tCol=tCol,
-                                                                 starttime=start_str)
+                # Times are equal.
+                return (start_str,)
 
         elif (starttime or stoptime):
             raise ValueError(('If time information is given, it must be given for '
                               + 'both the starttime and stoptime.'))
         else:
             # Dates are None or 0, do no time filtering.
+            return None
+            
+    @classmethod
+    def timeWhere(cls, starttime, stoptime, tCol):
+        """Helper function to get WHERE clause for time-based query. Both times 
+            are considered inclusive.
+        
+        INPUTS:
+            starttime: aware datetime object
+            stoptime: aware datetime object
+            tCol: name of the 'time' column
+        """
+        bounds = cls.timeBounds(starttime=starttime, stoptime=stoptime)
+        
+        if bounds is None:
             tFilter = ''
+        elif len(bounds) == 2:
+            # Create time range.
+            tFilter = (" WHERE ({tCol}{LEFT_BOUND}'{starttime}' AND "
+                       "{tCol}{RIGHT_BOUND}'{stoptime}')").format(tCol=tCol,
+                                                                  LEFT_BOUND=LEFT_BOUND,
+                                                                  RIGHT_BOUND=RIGHT_BOUND,
+                                                                  starttime=bounds[0],
+                                                                  stoptime=bounds[1])
+        else:
+            # Times are equal, use equality.
+            tFilter = " WHERE ({tCol}='{starttime}')".format(tCol=tCol,
+                                                             starttime=bounds[0])
     
         # Return the time filtering string.            
         return tFilter
     
+    @classmethod
+    def timeParams(cls, starttime, stoptime, tCol):
+        """Like timeWhere, but with '?' placeholders for the times.
+        
+        OUTPUTS: WHERE clause, list of times for its placeholders
+        """
+        bounds = cls.timeBounds(starttime=starttime, stoptime=stoptime)
+        
+        if bounds is None:
+            return '', []
+        elif len(bounds) == 2:
+            return ((" WHERE ({tCol}{LEFT_BOUND}? AND {tCol}{RIGHT_BOUND}?)"
+                     ).format(tCol=tCol, LEFT_BOUND=LEFT_BOUND,
+                              RIGHT_BOUND=RIGHT_BOUND), list(bounds))
+        else:
+            return " WHERE ({tCol}=?)".format(tCol=tCol), list(bounds)
+    
     def idFilter(self, tFilter, table, starttime, stoptime, idCol,
                  tCol, nameCol):
         """Function to get an ID filter if dates are ambiguous.
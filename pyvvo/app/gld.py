@@ -70,8 +70,26 @@ Created on Aug 29, 2017
 @author: thay838
 """
 import subprocess
+import signal
 import os
+import shutil
+import types
+import numpy as np
 import helper
+import affinity as aff
+
+# resource isn't available on Windows, where resource limits are ignored.
+try:
+    import resource
+except ImportError:
+    resource = None
+    
+# Seconds of CPU time past the soft limit (SIGXCPU) before the hard limit
+# (SIGKILL). See setLimits.
+CPU_HARD_MARGIN = 5
+# The kernel checks CPU limits against sampled CPU time, so a run killed at
+# the hard limit can measure slightly under it (seconds).
+CPU_SLACK = 0.5
 
 # definitions for regulator and capacitor properties
 REG_CHANGE_PROPS = ['tap_A_change_count', 'tap_B_change_count',
@@ -82,11 +100,22 @@ CAP_CHANGE_PROPS = ['cap_A_switch_count', 'cap_B_switch_count',
                     'cap_C_switch_count']
 CAP_STATE_PROPS = ['switchA', 'switchB', 'switchC']
 CAP_PROPS = CAP_CHANGE_PROPS + CAP_STATE_PROPS
+# SQL types of recorded properties which aren't doubles.
+SQL_TYPES = dict([(c, 'INT') for c in REG_PROPS + CAP_CHANGE_PROPS]
+                 + [(c, 'VARCHAR(32)') for c in CAP_STATE_PROPS])
 MEASURED_POWER = ['measured_power_A', 'measured_power_B', 'measured_power_C']
 MEASURED_ENERGY = ['measured_real_energy']
 TRIPLEX_VOLTAGE = ['measured_voltage_12']
 
-def runModel(modelPath, DIR=None, LD_LIBRARY_PATH=None):
+# Possible statuses of a model run (see runModel).
+RUN_OK = 'ok'
+RUN_FAILED = 'failed'
+RUN_TIMEOUT = 'timeout'
+RUN_CPU = 'cputime'
+
+def runModel(modelPath, DIR=None, LD_LIBRARY_PATH=None, timeout=None,
+             cpuTime=None, memory=None, logPrefix=None, cmd=None,
+             affinity=None):
     #, gldPath=r'C:/gridlab-d/develop'):
     """Function to run GridLAB-D model.
     
@@ -99,21 +128,210 @@ def runModel(modelPath, DIR=None, LD_LIBRARY_PATH=None):
         PATH must contain gridlab-d/develop/bin
         GLPATH must contain gridlab-d/develop/lib/gridlabd and gridlab-d/develop/share/gridlabd
         CXXFLAGS must be set to include gridlab-d/develop/share/gridlabd
+        
+    Limits, so a hung simulation (e.g. non-converging powerflow) can't hang
+    its caller forever:
+        timeout: wall clock seconds before the run is killed.
+        cpuTime: CPU seconds before the run is killed. Ignored on Windows.
+        memory: maximum memory (address space) of the run in MB. Ignored on
+            Windows.
+            
+    logPrefix: if given, stdout and stderr are streamed to logPrefix + '.out'
+        and logPrefix + '.err' rather than being held in memory.
+    cmd: command list to run instead of ['gridlabd']. The model is appended.
+    affinity: optional worker slot from affinity.coreSets. The run is pinned
+        to the slot's cores, and if the slot's 'membind' is True its memory
+        is bound to the slot's NUMA node (requires numactl).
+    
+    OUTPUT: modelRun object. Note this does NOT raise an exception if the
+        run fails - check the status.
+        
+    NOTE: This sets up a new runner for every call. To run many models,
+        create a runner once and use its run method.
+    """
+    r = runner(DIR=DIR, LD_LIBRARY_PATH=LD_LIBRARY_PATH, cmd=cmd)
+    return r.run(modelPath=modelPath, timeout=timeout, cpuTime=cpuTime,
+                 memory=memory, logPrefix=logPrefix, affinity=affinity)
+
+class _rusagePopen(subprocess.Popen):
+    """Popen which keeps the resource usage of the child when it's reaped
+    (see os.wait4), in the rusage attribute. POSIX only.
+    """
+    rusage = None
+    
+    def _try_wait(self, wait_flags):
+        try:
+            pid, sts, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            # See subprocess.Popen._try_wait: the status is lost.
+            return (self.pid, 0)
+        
+        if pid == self.pid:
+            self.rusage = rusage
+        return (pid, sts)
+    
+class runner:
+    """Class for running GridLAB-D models. The environment and the gridlabd
+    executable are set up once, so starting a run doesn't modify os.environ
+    (which threads share) or search the PATH. A runner can be shared by any
+    number of threads.
     """
-    cwd, model = os.path.split(modelPath)
+    
+    def __init__(self, DIR=None, LD_LIBRARY_PATH=None, cmd=None):
+        """See runModel for inputs."""
+        env = buildEnv(DIR=DIR, LD_LIBRARY_PATH=LD_LIBRARY_PATH)
+        # Read-only view, so the environment can't change under a run.
+        self.env = types.MappingProxyType(env) if env is not None else None
+        
+        # Resolve gridlabd on the PATH it'll be run with.
+        if cmd is None:
+            exe = shutil.which('gridlabd',
+                               path=(env['PATH'] if env is not None
+                                     else None))
+            cmd = [exe if exe is not None else 'gridlabd']
+        self.cmd = tuple(cmd)
+        
+    def run(self, modelPath, timeout=None, cpuTime=None, memory=None,
+            logPrefix=None, affinity=None):
+        """Run a model. See runModel for inputs and output."""
+        cwd, model = os.path.split(modelPath)
+        
+        # NOTE: it's best practice to pass args as a list. If args is a list,
+        # using shell=True creates differences across platforms. Just don't
+        # do it.
+        args = list(self.cmd) + [model]
+        if (affinity is not None) and affinity['membind']:
+            args = aff.numactlPrefix(affinity['node']) + args
+        
+        # Output to files or pipes. Log files are handed to the child as
+        # its stdout and stderr descriptors; every other descriptor is
+        # closed in the child (close_fds), so a run can't hold on to files
+        # or sockets of other runs.
+        flags = (os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                 | getattr(os, 'O_BINARY', 0))
+        if logPrefix is not None:
+            logs = (logPrefix + '.out', logPrefix + '.err')
+            out = os.open(logs[0], flags)
+            try:
+                err = os.open(logs[1], flags)
+            except OSError:
+                os.close(out)
+                raise
+        else:
+            logs = None
+            out = err = subprocess.PIPE
+            
+        # Keep the child's CPU time where limits are supported, to tell a
+        # run killed for its CPU time from one killed for other reasons.
+        popen = _rusagePopen if resource is not None else subprocess.Popen
+        try:
+            proc = popen(args, stdout=out, stderr=err, cwd=(cwd or None),
+                         env=self.env)
+        finally:
+            # The child has its own descriptors now.
+            if logs is not None:
+                os.close(out)
+                os.close(err)
+            
+        # Limits and affinity are set after starting the process rather than
+        # in a preexec_fn, which isn't safe when there are threads (and there
+        # always are). The process has barely started at this point.
+        setLimits(pid=proc.pid, cpuTime=cpuTime, memory=memory)
+        if affinity is not None:
+            aff.pin(pid=proc.pid, cores=affinity['cores'])
+        
+        status = None
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            status = RUN_TIMEOUT
+            
+        if status is None:
+            if proc.returncode == 0:
+                status = RUN_OK
+            elif ((cpuTime is not None) and (resource is not None)
+                  and cpuLimited(returncode=proc.returncode,
+                                 rusage=proc.rusage, cpuTime=cpuTime)):
+                status = RUN_CPU
+            else:
+                status = RUN_FAILED
+        
+        return modelRun(args=args, returncode=proc.returncode, stdout=stdout,
+                        stderr=stderr, status=status, logs=logs)
 
+def cpuLimited(returncode, rusage, cpuTime):
+    """True if a run ended because of its CPU time limit (see setLimits):
+    it got SIGXCPU from the soft limit, or SIGKILL after its CPU time
+    reached the hard limit. A SIGKILL from anything else (e.g. the OOM
+    killer) doesn't count.
+    
+    INPUTS:
+        returncode: the run's return code.
+        rusage: resource usage of the run, from os.wait4, or None.
+        cpuTime: the run's CPU time limit, see setLimits.
+    """
+    if returncode == -signal.SIGXCPU:
+        return True
+    
+    if (returncode == -signal.SIGKILL) and (rusage is not None):
+        used = rusage.ru_utime + rusage.ru_stime
+        return used >= int(cpuTime) + CPU_HARD_MARGIN - CPU_SLACK
+    
+    return False
+    
+def setLimits(pid, cpuTime=None, memory=None):
+    """Set CPU time (seconds) and memory (MB) resource limits for a running
+    process. Does nothing on platforms without the resource module.
+    """
+    if resource is None:
+        return
+    
+    try:
+        if cpuTime is not None:
+            # The soft limit sends SIGXCPU, the hard limit SIGKILL in case
+            # that's ignored.
+            cpuTime = int(cpuTime)
+            resource.prlimit(pid, resource.RLIMIT_CPU,
+                             (cpuTime, cpuTime + CPU_HARD_MARGIN))
+        
+        if memory is not None:
+            m = int(memory * 1024 * 1024)
+            resource.prlimit(pid, resource.RLIMIT_AS, (m, m))
+    except ProcessLookupError:
+        # Already done.
+        pass
+        
+class modelRun(subprocess.CompletedProcess):
+    """Result of runModel. In addition to the subprocess.CompletedProcess
+    fields, has:
+        status: one of RUN_OK, RUN_FAILED, RUN_TIMEOUT, or RUN_CPU
+        logs: None, or tuple of paths to stdout and stderr logs.
+    """
+    def __init__(self, args, returncode, stdout, stderr, status, logs=None):
+        super().__init__(args=args, returncode=returncode, stdout=stdout,
+                         stderr=stderr)
+        self.status = status
+        self.logs = logs
+        
+def buildEnv(DIR=None, LD_LIBRARY_PATH=None):
+    """Function to set up the environment for running GridLAB-D. See runModel
+    for inputs.
+    
+    OUTPUT: new environment dictionary for subprocess (os.environ is NOT
+        modified), or None if DIR is None.
+    """
     # Setup environment if necessary
     if DIR:
         # We'll use forward slashes here since GLD can have problems with 
         # backslashes... Ugh.
         DIR = DIR.replace('\\', '/')
-        env = os.environ
+        env = dict(os.environ)
         binStr = "{}/bin".format(DIR)
-        # We can form a kind of memory leak where we grow the environment
-        # variables if we add these elements repeatedly, so check before 
-        # adding or changing.
-        if binStr not in env['PATH']:
-            env['PATH'] = binStr + os.pathsep + env['PATH']
+        path = env.get('PATH', '')
+        if binStr not in path.split(os.pathsep):
+            env['PATH'] = binStr + os.pathsep + path if path else binStr
 
         env['GLPATH'] = ("{}/lib/gridlabd".format(DIR) + os.pathsep
                          + "{}/share/gridlabd".format(DIR))
@@ -127,26 +345,15 @@ def runModel(modelPath, DIR=None, LD_LIBRARY_PATH=None):
     # sense to have the ld_library_path variable depend on whether or not 
     # gridlabd is on the path.
     if (env is not None) and LD_LIBRARY_PATH is not None:
-        # Need to set the LD_LIBRARY_PATH so MySQL will work.
-        try:
-            env['LD_LIBRARY_PATH']
-        except KeyError:
-            # Not set, simpley set it.
+        # Need to set the LD_LIBRARY_PATH so MySQL will work. Add it if it's
+        # not already there.
+        ld = env.get('LD_LIBRARY_PATH')
+        if not ld:
             env['LD_LIBRARY_PATH'] = LD_LIBRARY_PATH
-        else:
-            # Concatenate.
-            env['LD_LIBRARY_PATH'] = (env['LD_LIBRARY_PATH'] + os.pathsep
-                                      + LD_LIBRARY_PATH) 
-    
-    # Run command. Note with check=True exception will be thrown on failure.
-    # With check=True, a CalledProcessError will be raised. This should
-    # be handled in some way, but probably outside of this function.
-    # NOTE: it's best practice to pass args as a list. If args is a list, using
-    # shell=True creates differences across platforms. Just don't do it.
-    output = subprocess.run(['gridlabd', model], stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE, cwd=cwd, env=env,
-                            check=True)
-    return output
+        elif LD_LIBRARY_PATH not in ld.split(os.pathsep):
+            env['LD_LIBRARY_PATH'] = ld + os.pathsep + LD_LIBRARY_PATH
+    
+    return env
 
 def translateTaps(lowerTaps, pos):
     """Method to translate tap integer in range 
@@ -171,8 +378,12 @@ def computeCosts(dbObj, energyTable, powerTable, triplexTable, tapChangeCount,
     cost of energy, capacitor switching, and regulator tap changing. Later this
     should include cost of DER engagement.
     
+    This is a wrapper which reads the cost inputs from the database
+    (costInputs) and computes costs from them (costsFromInputs).
+    
     INPUTS:
-        dbObj: initialized util/db.db class object
+        dbObj: initialized util/db.db class object, or a
+            recorderFiles.fileDB object to read recorder files.
         energyTable: dict with the following fields:
             table: name of table for getting total energy.
             columns: name of the columns corresponding to the swing table.
@@ -212,11 +423,53 @@ def computeCosts(dbObj, energyTable, powerTable, triplexTable, tapChangeCount,
     cost. If desired later, it wouldn't be too taxing to break that cost down
     by piece of equipment.
     """
-    # Initialize dictionary
-    costDict = {}
-    # *************************************************************************
-    # ENERGY COST
+    inputs = costInputs(dbObj=dbObj, energyTable=energyTable,
+                        powerTable=powerTable, triplexTable=triplexTable,
+                        lowerBound=costs['undervoltage']['limit'],
+                        upperBound=costs['overvoltage']['limit'],
+                        leadLimit=costs['powerFactorLead']['limit'],
+                        lagLimit=costs['powerFactorLag']['limit'],
+                        starttime=starttime, stoptime=stoptime,
+                        nameCol=nameCol, tCol=tCol, idCol=idCol)
+    
+    return costsFromInputs(inputs=inputs, tapChangeCount=tapChangeCount,
+                           capSwitchCount=capSwitchCount, costs=costs)
+
+def costInputs(dbObj, energyTable, powerTable, triplexTable, lowerBound,
+               upperBound, starttime, stoptime, nameCol='name', tCol='t',
+               idCol='id', leadLimit=None, lagLimit=None):
+    """Read everything needed to compute costs from the database (or from
+    recorder files, if dbObj is a recorderFiles.fileDB). See computeCosts
+    for a description of the inputs. lowerBound and upperBound
+    are the under and overvoltage limits.
     
+    If the power factor limits (leadLimit and lagLimit) are given and dbObj
+    can do it (see db.costAggregates), everything is read with a single
+    query, and power factor shortfalls are summed by the database rather
+    than reading every power row.
+    
+    OUTPUT: dict with the following fields:
+        energy: total energy (Wh) at the stoptime.
+        power: list of complex powers (VA) for each time in the interval.
+            Only if power factor shortfalls aren't summed by the database.
+        pfDeviation: dict with 'powerFactorLead' and 'powerFactorLag' sums
+            of power factor shortfalls below leadLimit and lagLimit. Only
+            if they're summed by the database.
+        violations: dict with 'high' and 'low' voltage violation counts.
+    """
+    if ((leadLimit is not None) and (lagLimit is not None)
+            and hasattr(dbObj, 'costAggregates')):
+        # One round trip.
+        a = dbObj.costAggregates(energyTable=energyTable,
+                                 powerTable=powerTable,
+                                 triplexTable=triplexTable,
+                                 lowerBound=lowerBound,
+                                 upperBound=upperBound, leadLimit=leadLimit,
+                                 lagLimit=lagLimit, nameCol=nameCol,
+                                 tCol=tCol, idCol=idCol,
+                                 starttime=starttime, stoptime=stoptime)
+        return inputsFromAggregates(a)
+        
     # Read energy database. Note times - this should return a single row only.
     energyRows = dbObj.fetchAll(table=energyTable['table'],
                                 cols=energyTable['columns'],
@@ -227,14 +480,6 @@ def computeCosts(dbObj, energyTable, powerTable, triplexTable, tapChangeCount,
         raise UserWarning(('Something has gone wrong, and there are multiple'
                            ' energy rows for the same time!'))
     
-    # Compute the cost
-    costDict['realEnergy'] = energyRows[0][0] * costs['realEnergy']
-    #**************************************************************************
-    # POWER FACTOR COST
-    # Initialize costs
-    costDict['powerFactorLead'] = 0
-    costDict['powerFactorLag'] = 0
-    
     # Code below may be necessary if recording 3-phase voltage from a
     # 'subastation' object instead of a 'meter' object
     '''
@@ -250,19 +495,64 @@ def computeCosts(dbObj, energyTable, powerTable, triplexTable, tapChangeCount,
                                   cols=powerTable['columns'],
                                   starttime=starttime, stoptime=stoptime)
     
-    # Loop over each row, compute power factor, and assign cost
-    for p in power:
-        pf, direction = helper.powerFactor(p)
-         
-        # Construct the field. Note that the possible returns of direction are
-        # 'lead' and 'lag'
-        field = 'powerFactor' + 'L' + direction[1:]
-        # If the pf is below the limit, add to the relevant cost 
-        if pf < costs[field]['limit']:
-            # Cost represents cost of a 0.01 deviation, so multiply violation
-            # by 100 before multiplying by the cost.
-            costDict[field] += ((costs[field]['limit'] - pf) * 100
-                                * costs[field]['cost'])
+    # Note that the function for determining violations relies heavily on the
+    # operations of GridLAB-D's mysql recorder.
+    v = dbObj.voltViolationsFromRecorder(table=triplexTable['table'],
+                                         lowerBound=lowerBound,
+                                         upperBound=upperBound,
+                                         voltageCols=triplexTable['columns'],
+                                         nameCol=nameCol, idCol=idCol,
+                                         tCol=tCol,
+                                         starttime=starttime,
+                                         stoptime=stoptime)
+    
+    # Plain complex numbers, e.g. for caching as JSON.
+    return {'energy': energyRows[0][0], 'power': np.asarray(power).tolist(),
+            'violations': {'high': v['high'], 'low': v['low']}}
+
+def inputsFromAggregates(aggregates):
+    """Convert the output of db.costAggregates to cost inputs (see
+    costInputs).
+    """
+    # Due to time and ID filtering, we should get exactly one row.
+    if aggregates['energyRows'] != 1:
+        raise UserWarning(('Something has gone wrong, and there are '
+                           'multiple energy rows for the same time!'))
+        
+    return {'energy': aggregates['energy'],
+            'pfDeviation': {'powerFactorLead': aggregates['powerFactorLead'],
+                            'powerFactorLag': aggregates['powerFactorLag']},
+            'violations': aggregates['violations']}
+
+def costsFromInputs(inputs, tapChangeCount, capSwitchCount, costs):
+    """Compute costs from the output of costInputs. See computeCosts for
+    a description of the other inputs.
+    """
+    # Initialize dictionary
+    costDict = {}
+    # *************************************************************************
+    # ENERGY COST
+    costDict['realEnergy'] = inputs['energy'] * costs['realEnergy']
+    
+    #**************************************************************************
+    # POWER FACTOR COST
+    # Use the sums of shortfalls if the database computed them.
+    deviation = inputs.get('pfDeviation')
+    if deviation is None:
+        # Compute power factors for all rows at once.
+        deviation = {}
+        pf, lead = helper.powerFactors(inputs['power'])
+        for field, mask in (('powerFactorLead', lead),
+                            ('powerFactorLag', ~lead)):
+            # Shortfall below the limit. Note nan (zero power) compares
+            # False.
+            d = costs[field]['limit'] - pf[mask]
+            deviation[field] = float(d[d > 0].sum())
+            
+    for field in ('powerFactorLead', 'powerFactorLag'):
+        # Cost represents cost of a 0.01 deviation, so multiply violation
+        # by 100 before multiplying by the cost.
+        costDict[field] = deviation[field] * 100 * costs[field]['cost']
     
     # *************************************************************************
     # TAP CHANGING COST
@@ -278,17 +568,7 @@ def computeCosts(dbObj, energyTable, powerTable, triplexTable, tapChangeCount,
     
     # *************************************************************************
     # TRIPLEX VOLTAGE VIOLATION COSTS
-    
-    # Note that the function for determining violations relies heavily on the
-    # operations of GridLAB-D's mysql recorder.
-    v = dbObj.voltViolationsFromRecorder(table=triplexTable['table'],
-                                         lowerBound=costs['undervoltage']['limit'],
-                                         upperBound=costs['overvoltage']['limit'],
-                                         voltageCols=triplexTable['columns'],
-                                         nameCol=nameCol, idCol=idCol,
-                                         tCol=tCol,
-                                         starttime=starttime,
-                                         stoptime=stoptime)
+    v = inputs['violations']
     costDict['overvoltage'] = v['high'] * costs['overvoltage']['cost']
     costDict['undervoltage'] = v['low'] * costs['undervoltage']['cost']
     
@@ -342,6 +622,30 @@ def getRegOrCapRecordDict(objName, table, objType, timeInterval, limit=-1):
     
     return propDict
 
+def recorderColumns(recorders):
+    """Get the columns of all the tables individuals record to (see
+    individual.buildModel), e.g. for db.createSharedTables.
+    
+    INPUTS:
+        recorders: dictionary of recorder definitions, see
+            individual.__init__
+            
+    OUTPUT: dict mapping table names to lists of (column, SQL type)
+        tuples.
+    """
+    tables = {}
+    props = [r['properties'] for r in recorders.values()]
+    props += [getRegOrCapRecordDict(objName=None, table=t, objType=t,
+                                    timeInterval=None) for t in ('reg', 'cap')]
+    for p in props:
+        tables[p['table']] = sqlColumns(p['propList'])
+        
+    return tables
+
+def sqlColumns(propList):
+    """Get a list of (column, SQL type) tuples for recorded properties."""
+    return [(c, SQL_TYPES.get(c, 'DOUBLE')) for c in propToCol(propList)]
+
 def propToCol(propList):
     """Helper function which translates recorder properties to column
         names for MySQL. This should replicate how GridLAB-D does this
@@ -0,0 +1,228 @@
+'''
+Module for reading GridLAB-D's profiler output.
+
+With '#set profiler=1' (see modGLM.toggleProfile), GridLAB-D prints two
+sections to stdout at the end of a run, which look like:
+
+    Core profiler results
+    ======================
+
+    Total objects               2345 objects
+    Parallelism                    1 thread
+    Total time                   2.0 seconds
+      Core time                  0.3 seconds (15.0%)
+        Compiler                 0.0 seconds (0.0%)
+    ...
+      Model time                 1.7 seconds/thread (85.0%)
+    Passes completed              25 passes
+    ...
+
+    Model profiler results
+    ======================
+
+    Class            Time (s) Time (%) msec/obj
+    ---------------- -------- -------- --------
+    node               0.789     46.4%      0.3
+    recorder           0.200     11.8%      2.0
+    ================ ======== ======== ========
+    Total              1.700    100.0%      0.7
+
+parse() turns this into a dictionary, including time by module (powerflow,
+mysql, tape, ...), and aggregate() summarizes the profiles of many runs,
+e.g. one generation of a population.
+
+Created on Oct 18, 2026
+'''
+import re
+
+# Classes of the modules pyvvo uses. Note that GridLAB-D only prints the first
+# 16 characters of class names. By default pyvvo records with MySQL, so
+# recorder classes are attributed to mysql, not tape (see TAPE_RECORDERS).
+MODULE_CLASSES = {
+    'powerflow': ['node', 'link', 'capacitor', 'fuse', 'meter', 'line',
+                  'line_spacing', 'overhead_line', 'overhead_line_conductor',
+                  'underground_line', 'underground_line_conductor',
+                  'line_configuration', 'transformer_configuration',
+                  'transformer', 'load', 'regulator_configuration',
+                  'regulator', 'triplex_node', 'triplex_meter',
+                  'triplex_line', 'triplex_line_configuration',
+                  'triplex_line_conductor', 'triplex_load', 'switch',
+                  'substation', 'pqload', 'voltdump', 'currdump',
+                  'series_reactor', 'restoration', 'frequency_gen',
+                  'volt_var_control', 'fault_check', 'motor', 'billdump',
+                  'power_metrics', 'recloser', 'sectionalizer', 'emissions',
+                  'load_tracker', 'impedance_dump', 'vfd', 'relay',
+                  'powerflow_library', 'powerflow_object'],
+    'mysql': ['database', 'recorder', 'group_recorder', 'player',
+              'collector'],
+    'tape': ['shaper', 'multi_recorder', 'histogram', 'metrics_collector',
+             'metrics_collector_writer', 'violation_recorder'],
+    'generators': ['inverter', 'solar', 'battery', 'diesel_dg',
+                   'energy_storage', 'windturb_dg'],
+    'residential': ['house', 'waterheater', 'ZIPload', 'lights',
+                    'plugload', 'evcharger_det'],
+    'climate': ['climate', 'weather'],
+}
+
+# Map of class name to module.
+CLASS_MODULE = {c: m for m, classes in MODULE_CLASSES.items()
+                for c in classes}
+
+# classModules for models which record to files (see recorderFiles).
+TAPE_RECORDERS = {'recorder': 'tape', 'group_recorder': 'tape'}
+
+# Lines in the core section: label, number, unit (and maybe a percentage).
+CORE_REGEX = re.compile(r'^(\s*)(\S.*?)\s{2,}(-?[\d.]+)(?:\s+(.*))?$')
+# Rows of the class table: name, seconds, percent, msec/obj
+CLASS_REGEX = re.compile(r'^(\S+)\s+(-?[\d.]+)\s+(-?[\d.]+)%\s+(-?[\d.]+)\s*$')
+
+def classModule(className, classModules=None):
+    """Get the module of a class, given its (possibly truncated) name.
+    Returns 'other' for unknown classes.
+
+    classModules: optional dict of class name to module which overrides
+        CLASS_MODULE.
+    """
+    for d in (classModules, CLASS_MODULE):
+        if not d:
+            continue
+        try:
+            return d[className]
+        except KeyError:
+            pass
+
+        # GridLAB-D truncates names to 16 characters.
+        if len(className) == 16:
+            for c, m in d.items():
+                if c.startswith(className):
+                    return m
+
+    return 'other'
+
+def parse(text, classModules=None):
+    """Parse GridLAB-D's profiler output out of a run's stdout.
+
+    INPUTS:
+        text: stdout as str or bytes. Only the profiler sections are read, so
+            this can include other output.
+        classModules: see classModule.
+
+    OUTPUT: None if there's no profiler output, otherwise a dict with:
+        core: dict of core profiler values by label (e.g. 'Total time',
+            'Model time', 'Passes completed'), as floats in the units
+            GridLAB-D prints.
+        classes: dict by class of dicts with 'time' (seconds), 'percent',
+            'msecPerObj', and 'module'.
+        modules: dict of seconds by module.
+        total: total model time in seconds, from the class table.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', errors='replace')
+
+    core = text.find('Core profiler results')
+    model = text.find('Model profiler results')
+    if (core < 0) and (model < 0):
+        return None
+
+    out = {'core': {}, 'classes': {}, 'modules': {}, 'total': None}
+
+    if core >= 0:
+        end = model if model > core else len(text)
+        for line in text[core:end].splitlines()[2:]:
+            m = CORE_REGEX.match(line)
+            if m:
+                out['core'][m.group(2)] = float(m.group(3))
+
+    if model >= 0:
+        # Class rows come after the '----' line, the total after '===='.
+        section = None
+        for line in text[model:].splitlines()[2:]:
+            if line.startswith('----'):
+                section = 'rows'
+                continue
+            if line.startswith('===='):
+                section = 'total'
+                continue
+            m = CLASS_REGEX.match(line.strip())
+            if (section is None) or (m is None):
+                continue
+            if section == 'total':
+                out['total'] = float(m.group(2))
+                break
+
+            name = m.group(1)
+            module = classModule(name, classModules)
+            out['classes'][name] = {'time': float(m.group(2)),
+                                    'percent': float(m.group(3)),
+                                    'msecPerObj': float(m.group(4)),
+                                    'module': module}
+            out['modules'][module] = (out['modules'].get(module, 0)
+                                      + float(m.group(2)))
+
+    return out
+
+def readTail(path, size=65536):
+    """Read the last size bytes of a file (where the profiler output is).
+    Returns None if the file can't be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            f.seek(max(0, f.tell() - size))
+            return f.read()
+    except OSError:
+        return None
+
+def aggregate(profiles):
+    """Summarize many profiles (from parse), e.g. for one generation.
+    Profiles which are None are ignored.
+
+    OUTPUT: dict with:
+        runs: number of profiles.
+        modules: dict by module of dicts with 'total', 'mean', and 'max'
+            seconds, and 'share': fraction of all model time.
+        classes: dict of total seconds by class.
+        core: dict of mean core values by label.
+        dominant: module with the most time (None if there are no runs).
+    """
+    profiles = [p for p in profiles if p is not None]
+    n = len(profiles)
+    out = {'runs': n, 'modules': {}, 'classes': {}, 'core': {},
+           'dominant': None}
+    if not n:
+        return out
+
+    for p in profiles:
+        for m, t in p['modules'].items():
+            d = out['modules'].setdefault(m, {'total': 0, 'max': 0})
+            d['total'] += t
+            d['max'] = max(d['max'], t)
+        for c, v in p['classes'].items():
+            out['classes'][c] = out['classes'].get(c, 0) + v['time']
+        for k, v in p['core'].items():
+            out['core'][k] = out['core'].get(k, 0) + v
+
+    total = sum(d['total'] for d in out['modules'].values())
+    for d in out['modules'].values():
+        d['mean'] = d['total'] / n
+        d['share'] = d['total'] / total if total else 0
+
+    for k in out['core']:
+        out['core'][k] /= n
+
+    if out['modules']:
+        out['dominant'] = max(out['modules'],
+                              key=lambda m: out['modules'][m]['total'])
+
+    return out
+
+def summaryStr(agg):
+    """One line summary of aggregate output, for logging."""
+    if not agg['runs']:
+        return 'No profiled runs.'
+
+    parts = ['{}: {:.3f} s ({:.0%})'.format(m, d['total'], d['share'])
+             for m, d in sorted(agg['modules'].items(),
+                                key=lambda x: -x[1]['total'])]
+    return '{} runs. Model time by module: {}'.format(agg['runs'],
+                                                      ', '.join(parts))
@@ -0,0 +1,576 @@
+'''
+Module for running GridLAB-D in server mode, so individuals don't pay for
+process startup, module loading, model parsing, and initialization.
+
+GridLAB-D's server mode (gridlabd --server) exposes an HTTP interface. The
+parts we use:
+    /raw/<object>/<property>            get a property
+    /raw/<object>/<property>=<value>    set a property
+    /raw/<global>                       get a global (clock, mainloop_state)
+    /control/pauseat=<time>             pause the simulation at a time
+    /control/resume                     resume the simulation
+    /control/shutdown                   exit
+
+IMPORTANT: GridLAB-D can't rewind a simulation. Once a server has been run
+over an interval, it can't be reused for the same interval, and there's no
+way to reset it to the start time short of reloading the model - which is
+what a new process does. So serverPool keeps every slot 'warm': each slot has
+a server which has already loaded the model and is paused at the start time.
+When an individual is done with a server, it is shut down and the slot is
+re-warmed in the background.
+
+A restart per run is still a saving because the restart is off the critical
+path: an individual only waits for the run itself, while process startup,
+module loading, model parsing, and initialization happen in the background
+for a slot nobody is using. To hide the startup time completely, use more
+slots than model threads. benchmark.benchServers measures this, comparing
+runs on a pool with the same number of cold runs (gld.runModel).
+
+A slot whose server fails to start is re-warmed up to 'retries' times in a
+row before it's given up on. acquire only raises once every slot is dead.
+
+Each slot has its own model (and therefore its own recorder tables), built
+by the population.
+
+For testing without GridLAB-D, this module doubles as a fake gridlabd:
+    python gldServer.py --server -P <port> [-D name=value] model.glm
+starts a fakeServer, which serves the same interface using objects and clock
+parsed from the model. No simulation is done - running simply moves the
+clock. '-D fake_loadtime=<seconds>' delays startup (like loading a model)
+and '-D fake_runtime=<seconds>' delays each run.
+
+Created on Oct 18, 2026
+'''
+import os
+import sys
+import time
+import threading
+import subprocess
+import datetime
+from queue import Queue
+from urllib.request import urlopen
+from urllib.parse import quote, unquote
+from urllib.error import URLError
+import http.client
+import http.server
+import logging
+import gld
+import glmParser
+import constants
+
+# GridLAB-D's default server port.
+BASE_PORT = 6267
+# Polling interval (seconds) while waiting on a server.
+POLL_INTERVAL = 0.02
+# Command to run the fake server.
+FAKE_CMD = [sys.executable, os.path.abspath(__file__)]
+
+def timeStr(t):
+    """Format a datetime (or string) the way GridLAB-D wants it."""
+    if isinstance(t, str):
+        return t
+    return t.strftime(constants.DATE_FMT)
+
+def parseTime(s):
+    """Parse a GridLAB-D time string, ignoring any timezone at the end."""
+    return datetime.datetime.strptime(s.strip().strip("'\"")[0:19],
+                                      constants.DATE_FMT)
+
+def deviceCommands(reg, cap, regConf):
+    """Build the list of property changes needed to put regulators and
+    capacitors in the states given by reg and cap. This mirrors
+    modGLM.commandRegulators and modGLM.commandCapacitors.
+
+    INPUTS:
+        reg: regulator dictionary, see gld module docstring.
+        cap: capacitor dictionary, see gld module docstring.
+        regConf: dict mapping regulator names to their configuration names.
+            See modGLM.regulatorConfigs.
+
+    OUTPUT: list of (object name, property, value) tuples.
+    """
+    out = []
+    for r, d in reg.items():
+        for p, pd in d['phases'].items():
+            # Use newState if it exists, otherwise use prevState
+            state = pd['newState'] if 'newState' in pd else pd['prevState']
+            out.append((r, 'tap_' + p, state))
+            out.append((regConf[r], 'tap_pos_' + p, state))
+
+        if 'Control' in d:
+            out.append((regConf[r], 'Control', d['Control']))
+
+    for c, d in cap.items():
+        for p, pd in d['phases'].items():
+            state = pd['newState'] if 'newState' in pd else pd['prevState']
+            out.append((c, 'switch' + p, state))
+
+        if 'control' in d:
+            out.append((c, 'control', d['control']))
+
+    return out
+
+class gldServer:
+    """Class to start and talk to a single GridLAB-D instance in server mode.
+    """
+
+    def __init__(self, modelPath, port, starttime, gldInstall=None,
+                 host='127.0.0.1', cmd=None, timeout=10):
+        """
+        INPUTS:
+            modelPath: path to model to load.
+            port: port for the server.
+            starttime: datetime (or string). The server pauses here once
+                the model is loaded.
+            gldInstall: dict with 'DIR' and 'LD_LIBRARY_PATH', see
+                gld.runModel
+            host: host the server listens on.
+            cmd: list, command to start GridLAB-D. Defaults to 'gridlabd'.
+                Use FAKE_CMD for the fake server.
+            timeout: timeout (seconds) for each HTTP request.
+        """
+        self.modelPath = modelPath
+        self.port = port
+        self.starttime = timeStr(starttime)
+        self.gldInstall = gldInstall if gldInstall is not None else {}
+        self.host = host
+        self.cmd = cmd if cmd is not None else ['gridlabd']
+        self.timeout = timeout
+        self.proc = None
+
+    def start(self):
+        """Start the server process. Use waitReady to wait for it."""
+        cwd, model = os.path.split(self.modelPath)
+        env = gld.buildEnv(**self.gldInstall)
+        args = self.cmd + ['--server', '-P', str(self.port),
+                           '-D', 'pauseat=' + self.starttime, model]
+        self.proc = subprocess.Popen(args, cwd=(cwd or None), env=env,
+                                     stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.DEVNULL)
+
+    def request(self, path):
+        """Send a request to the server and return the response text.
+        Transport errors (refused or reset connections, timeouts, HTTP
+        errors) are raised as a ServerError.
+        """
+        url = 'http://{}:{}/{}'.format(self.host, self.port,
+                                       quote(path, safe="/=:'"))
+        try:
+            with urlopen(url, timeout=self.timeout) as r:
+                return r.read().decode().strip()
+        except (URLError, OSError, http.client.HTTPException) as e:
+            # URLError covers HTTPError, OSError covers socket.timeout and
+            # ConnectionResetError.
+            raise ServerError(self, 'request {} failed: {}'.format(path, e)
+                              ) from e
+
+    def checkAlive(self):
+        """Raise a ServerError if the process has exited."""
+        if self.proc is None or self.proc.poll() is not None:
+            raise ServerError(self, 'process is not running')
+
+    def waitReady(self, timeout=120):
+        """Wait for the model to load and the server to pause at the start
+        time.
+        """
+        t0 = time.time()
+        while True:
+            self.checkAlive()
+            try:
+                if self.request('raw/mainloop_state') == 'PAUSED':
+                    return
+            except ServerError:
+                # Server isn't listening yet.
+                pass
+
+            if time.time() - t0 > timeout:
+                raise ServerError(self, 'timed out waiting for server')
+
+            time.sleep(POLL_INTERVAL)
+
+    def setProp(self, obj, prop, value):
+        """Set a property of an object."""
+        return self.request('raw/{}/{}={}'.format(obj, prop, value))
+
+    def getProp(self, obj, prop):
+        """Get a property of an object."""
+        return self.request('raw/{}/{}'.format(obj, prop))
+
+    def runUntil(self, stoptime, timeout=None):
+        """Run the simulation until stoptime (datetime or string), and wait
+        for it to get there.
+        """
+        stoptime = timeStr(stoptime)
+        stop = parseTime(stoptime)
+        self.request('control/pauseat=' + stoptime)
+        self.request('control/resume')
+
+        t0 = time.time()
+        while True:
+            self.checkAlive()
+            state = self.request('raw/mainloop_state')
+            if state == 'DONE':
+                return
+
+            # The state may still read PAUSED right after resuming, so check
+            # the clock too.
+            if ((state == 'PAUSED')
+                    and (parseTime(self.request('raw/clock')) >= stop)):
+                return
+
+            if (timeout is not None) and (time.time() - t0 > timeout):
+                raise ServerError(self, 'timed out running to ' + stoptime)
+
+            time.sleep(POLL_INTERVAL)
+
+    def shutdown(self, timeout=10):
+        """Ask the server to exit, and kill it if it doesn't."""
+        if self.proc is None:
+            return
+
+        try:
+            self.request('control/shutdown')
+        except ServerError:
+            pass
+
+        try:
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+class serverPool:
+    """Class to manage a pool of warm GridLAB-D servers. See module
+    docstring.
+    """
+
+    def __init__(self, slots, starttime, gldInstall=None, basePort=BASE_PORT,
+                 cmd=None, readyTimeout=120, onRecycle=None, retries=2,
+                 log=None):
+        """
+        INPUTS:
+            slots: list of dictionaries, one per server. Each needs a 'model'
+                field with the path to the slot's model. Other fields are
+                left alone, so callers can track things like recorder tables.
+            starttime: simulation start time (datetime or string)
+            gldInstall: see gldServer
+            basePort: slot k uses port basePort + k
+            cmd: see gldServer
+            readyTimeout: seconds to wait for a server to load its model.
+            onRecycle: optional function called with a slot after its server
+                has been shut down and before a new one is started. Use this
+                to clear out the slot's recorder tables.
+            retries: number of times in a row a slot's server may fail to
+                start and be re-warmed before the slot is given up on.
+            log: logging.Logger instance or None.
+        """
+        if log is not None:
+            self.log = log
+        else:
+            self.log = logging.getLogger()
+
+        self.slots = slots
+        self.starttime = starttime
+        self.gldInstall = gldInstall
+        self.cmd = cmd
+        self.readyTimeout = readyTimeout
+        self.onRecycle = onRecycle
+        self.retries = retries
+
+        # Queue of slots with a warm server (or an error for acquire).
+        self.ready = Queue()
+
+        # Number of slots which have been given up on.
+        self.dead = 0
+        self.lock = threading.Lock()
+
+        for k, slot in enumerate(self.slots):
+            slot['port'] = basePort + k
+            slot['server'] = None
+            slot['failures'] = 0
+            slot['dead'] = False
+            self._startThread(slot, self._warm)
+
+    @staticmethod
+    def _startThread(slot, target):
+        """Run target(slot) in a new thread, kept in the slot's 'thread'
+        field. A slot gets a new thread only after it's been acquired, i.e.
+        after its last thread has put it in the ready queue, so the slot
+        never has more than one thread to join.
+        """
+        slot['thread'] = threading.Thread(target=target, args=(slot,))
+        slot['thread'].start()
+
+    def _warm(self, slot):
+        """Start a server for a slot, and put the slot in the ready queue
+        once it's loaded. Errors are put in the slot for acquire to raise.
+        """
+        slot['error'] = None
+        try:
+            srv = gldServer(modelPath=slot['model'], port=slot['port'],
+                            starttime=self.starttime,
+                            gldInstall=self.gldInstall, cmd=self.cmd)
+            slot['server'] = srv
+            srv.start()
+            srv.waitReady(timeout=self.readyTimeout)
+            self.log.debug('Server on port {} is ready.'.format(slot['port']))
+        except Exception as e:
+            slot['error'] = e
+            self.log.error('Server on port {} failed: {}'.format(slot['port'],
+                                                                  e))
+
+        self.ready.put(slot)
+
+    def acquire(self, timeout=None):
+        """Get a slot with a warm server. A slot whose server failed to start
+        is re-warmed in the background while another slot is tried, up to
+        'retries' times in a row. Once every slot has been given up on, the
+        last slot's error is raised.
+        
+        Raises queue.Empty if no slot is ready within timeout seconds.
+        """
+        t0 = time.time()
+        while True:
+            if timeout is None:
+                remaining = None
+            else:
+                remaining = max(0, timeout - (time.time() - t0))
+
+            slot = self.ready.get(timeout=remaining)
+            if slot['error'] is None:
+                slot['failures'] = 0
+                return slot
+
+            if slot['dead']:
+                # Every slot is dead. Put the slot back so other callers
+                # see the error too.
+                self.ready.put(slot)
+                raise slot['error']
+
+            slot['failures'] += 1
+            if slot['failures'] <= self.retries:
+                self.log.warning(('Re-warming server on port {} (attempt {} '
+                                  'of {}).').format(slot['port'],
+                                                    slot['failures'],
+                                                    self.retries))
+                self._startThread(slot, self._recycle)
+                continue
+
+            # Give up on the slot. Dead slots stay out of the queue, except
+            # for the last one, which wakes up any callers left waiting.
+            slot['dead'] = True
+            self.log.error('Giving up on server on port {}.'.format(
+                slot['port']))
+            with self.lock:
+                self.dead += 1
+                allDead = (self.dead == len(self.slots))
+
+            if allDead:
+                self.ready.put(slot)
+                raise slot['error']
+
+    def run(self, slot, commands, stoptime, timeout=None):
+        """Apply property changes (see deviceCommands) to a slot's server
+        and run it until stoptime.
+        """
+        srv = slot['server']
+        for obj, prop, value in commands:
+            srv.setProp(obj, prop, value)
+
+        srv.runUntil(stoptime=stoptime, timeout=timeout)
+
+    def release(self, slot):
+        """Done with a slot. Its server is shut down and replaced in the
+        background.
+        """
+        self._startThread(slot, self._recycle)
+
+    def _recycle(self, slot):
+        """Shut down a slot's server and start a new one."""
+        try:
+            if slot['server'] is not None:
+                slot['server'].shutdown()
+            if self.onRecycle is not None:
+                self.onRecycle(slot)
+        except Exception as e:
+            # Hand the error to acquire rather than losing the slot.
+            slot['error'] = e
+            self.log.error('Recycling server on port {} failed: {}'.format(
+                slot['port'], e))
+            self.ready.put(slot)
+            return
+
+        self._warm(slot)
+
+    def wait(self):
+        """Wait until every slot's server has started (or failed to), e.g.
+        before timing runs.
+        """
+        for slot in self.slots:
+            slot['thread'].join()
+
+    def close(self):
+        """Shut down all servers."""
+        for slot in self.slots:
+            slot['thread'].join()
+
+        for slot in self.slots:
+            if slot['server'] is not None:
+                slot['server'].shutdown()
+
+class fakeServer:
+    """Local stand-in for GridLAB-D in server mode. Objects and the clock are
+    read from the model, properties can be read and set, and running just
+    moves the clock (after waiting runTime seconds).
+    """
+
+    def __init__(self, modelPath, port, host='127.0.0.1', defines=None,
+                 runTime=0):
+        tree = glmParser.parseFile(modelPath)
+
+        # Objects, by name.
+        self.objects = {}
+        for n, b in tree.index.items():
+            self.objects[n] = b.props
+
+        # Get clock from the model.
+        clock = tree.findFirst(kind='clock')
+        clockProps = clock.props if clock is not None else {}
+        start = clockProps.get('starttime', "'2000-01-01 00:00:00'")
+        stop = clockProps.get('stoptime')
+
+        self.globals = {'clock': parseTime(start).strftime(constants.DATE_FMT),
+                        'stoptime': stop.strip("'") if stop else None,
+                        'mainloop_state': 'PAUSED', 'pauseat': None}
+        if defines:
+            self.globals.update(defines)
+
+        self.runTime = runTime
+        self.lock = threading.Lock()
+
+        server = self
+
+        class handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    code, body = server.handle(unquote(self.path))
+                except Exception as e:
+                    code, body = 500, str(e)
+
+                self.send_response(code)
+                self.send_header('Content-Type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), handler)
+
+    def handle(self, path):
+        """Handle a request. Returns (HTTP status code, body)"""
+        parts = path.strip('/').split('/', 2)
+
+        with self.lock:
+            if parts[0] == 'control':
+                cmd = parts[1]
+                if cmd.startswith('pauseat='):
+                    self.globals['pauseat'] = cmd.split('=', 1)[1]
+                elif cmd == 'resume':
+                    self.globals['mainloop_state'] = 'RUNNING'
+                    threading.Thread(target=self._run).start()
+                elif cmd == 'shutdown':
+                    threading.Thread(target=self.httpd.shutdown).start()
+                else:
+                    return 404, 'unknown command'
+                return 200, 'OK'
+
+            if parts[0] != 'raw':
+                return 404, 'not found'
+
+            if len(parts) == 2:
+                # Global.
+                v = self.globals.get(parts[1])
+                return (200, str(v)) if v is not None else (404, 'not found')
+
+            obj, prop = parts[1], parts[2]
+            if obj not in self.objects:
+                return 404, 'object not found'
+
+            if '=' in prop:
+                prop, value = prop.split('=', 1)
+                self.objects[obj][prop] = value
+                return 200, value
+
+            if prop not in self.objects[obj]:
+                return 404, 'property not found'
+
+            return 200, self.objects[obj][prop]
+
+    def _run(self):
+        """'Simulate' until pauseat or stoptime."""
+        time.sleep(self.runTime)
+        with self.lock:
+            g = self.globals
+            stops = [parseTime(t) for t in (g['pauseat'], g['stoptime']) if t]
+            if not stops:
+                g['mainloop_state'] = 'DONE'
+                return
+
+            t = min(stops)
+            g['clock'] = t.strftime(constants.DATE_FMT)
+            if g['stoptime'] and (t >= parseTime(g['stoptime'])):
+                g['mainloop_state'] = 'DONE'
+            else:
+                g['mainloop_state'] = 'PAUSED'
+
+    def serve(self):
+        """Serve until shut down."""
+        self.httpd.serve_forever()
+        self.httpd.server_close()
+
+class Error(Exception):
+    """"Base class for exceptions in this module"""
+    pass
+
+class ServerError(Error):
+    """Exception raised if a GridLAB-D server fails.
+
+    Attributes:
+        server: gldServer object
+        message: simple message
+    """
+    def __init__(self, server, msg):
+        self.server = server
+        self.message = 'GridLAB-D server on port {} ({}): {}'.format(
+            server.port, server.modelPath, msg)
+
+    def __str__(self):
+        return(repr(self.message))
+
+def fakeMain(argv):
+    """Run a fakeServer, given gridlabd style command line arguments."""
+    port = BASE_PORT
+    defines = {}
+    model = None
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == '-P':
+            port = int(argv[i+1])
+            i += 1
+        elif a == '-D':
+            n, v = argv[i+1].split('=', 1)
+            defines[n] = v
+            i += 1
+        elif not a.startswith('-'):
+            model = a
+        i += 1
+
+    runTime = float(defines.pop('fake_runtime', 0))
+    time.sleep(float(defines.pop('fake_loadtime', 0)))
+    fakeServer(modelPath=model, port=port, defines=defines,
+               runTime=runTime).serve()
+
+if __name__ == '__main__':
+    fakeMain(sys.argv[1:])
@@ -0,0 +1,568 @@
+'''
+Module for parsing a GridLAB-D model (.glm) into a tree which can be edited
+and written back out.
+
+The tree is lossless: every character of the input (whitespace, comments,
+stray semi-colons, etc.) is kept, so serializing an unmodified tree gives back
+exactly the string which was parsed. Edits to the tree only touch the pieces
+that were changed, and are formatted the same way modGLM.modObjProps formats
+its string edits.
+
+Structure of the tree:
+    glmModel: top level container. Its 'pieces' list holds strings (trivia:
+        whitespace, comments, stray semi-colons), glmDirective, glmStatement,
+        and glmBlock objects.
+    glmDirective: a line starting with '#', e.g. '#set profiler=1'
+    glmStatement: 'name value;' e.g. 'module tape;' or 'bustype SWING;'.
+        Properties of a block are statements.
+    glmBlock: 'header { ... }' e.g. 'object meter { ... };' or 'clock {...}'
+        Its 'pieces' list has the same format as glmModel.pieces, so nested
+        objects are simply blocks within blocks.
+
+Created on Oct 18, 2026
+'''
+import re
+
+# Tokens, in order of precedence. Since the scanner always matches at the
+# current position, a '#' in the middle of a statement stays part of the
+# statement. To keep the number of tokens down, 'text' swallows a run of words,
+# quoted strings, and spaces up to the end of the line or a special character.
+TOKEN_REGEX = re.compile(r'''
+    (?P<comment>//[^\n]*)
+    |(?P<directive>\#[^\n]*)
+    |(?P<lbrace>\{)
+    |(?P<rbrace>\})
+    |(?P<semi>;)
+    |(?P<ws>\s+)
+    |(?P<text>(?:[^\s{};"\'/\#]|/(?!/)|"[^"]*"|\'[^\']*\')
+              (?:[^{};"\'/\n]|/(?!/)|"[^"]*"|\'[^\']*\')*)
+    ''', re.VERBOSE)
+
+# Block 'kinds' which are followed by a type (object <type>, module <type>)
+TYPED_KINDS = ('object', 'module', 'class')
+
+def tokenize(s):
+    """Split a GridLAB-D model string into a list of (kind, text) tuples.
+
+    Joining the text of all tokens gives back the input string.
+    """
+    tokens = []
+    pos = 0
+    n = len(s)
+    while pos < n:
+        m = TOKEN_REGEX.match(s, pos)
+        if m is None:
+            # This can only happen for an unterminated quote. Treat the rest
+            # of the model as text so nothing is lost.
+            tokens.append(('text', s[pos:]))
+            break
+
+        tokens.append((m.lastgroup, m.group()))
+        pos = m.end()
+
+    return tokens
+
+def parse(s):
+    """Parse a GridLAB-D model string into a glmModel."""
+    model = glmModel()
+    p = _parser(tokenize(s))
+    model.pieces = p.parseBody(parent=model, topLevel=True)
+    return model
+
+def parseFile(path):
+    """Parse a GridLAB-D model file into a glmModel."""
+    with open(path, 'r') as f:
+        s = f.read()
+
+    return parse(s)
+
+class _parser:
+    """Recursive descent parser which turns a token list into tree pieces."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def parseBody(self, parent, topLevel=False):
+        """Parse tokens until the closing brace of the current block (or the
+        end of the tokens if topLevel). Returns list of pieces.
+        """
+        pieces = []
+        # Tokens of the statement currently being built.
+        stmt = []
+
+        while self.i < len(self.tokens):
+            kind, text = self.tokens[self.i]
+
+            if kind == 'rbrace':
+                if topLevel:
+                    # Unbalanced brace - keep it as trivia.
+                    self._flushTrivia(stmt, pieces)
+                    pieces.append(text)
+                    self.i += 1
+                    continue
+                # End of this block. Don't consume the brace - the block
+                # parser does that.
+                self._flushTrivia(stmt, pieces)
+                return pieces
+
+            self.i += 1
+
+            if not stmt and kind in ('ws', 'comment'):
+                # Trivia between statements.
+                _appendTrivia(pieces, text)
+            elif not stmt and kind == 'directive':
+                pieces.append(glmDirective(text=text, parent=parent))
+            elif not stmt and kind == 'semi':
+                # Stray semi-colon, e.g. following a block: 'object x {...};'
+                _appendTrivia(pieces, text)
+            elif kind == 'semi':
+                pieces.append(glmStatement.fromTokens(stmt, end=text,
+                                                      parent=parent))
+                stmt = []
+            elif kind == 'lbrace':
+                block = glmBlock.fromTokens(stmt, parent=parent)
+                block.pieces = self.parseBody(parent=block)
+                # Consume closing brace, and a directly following semi-colon.
+                if self.i < len(self.tokens):
+                    block.close = self.tokens[self.i][1]
+                    self.i += 1
+                    if (self.i < len(self.tokens)
+                            and self.tokens[self.i][0] == 'semi'):
+                        block.close += self.tokens[self.i][1]
+                        self.i += 1
+                else:
+                    # Unterminated block.
+                    block.close = ''
+
+                pieces.append(block)
+                stmt = []
+            else:
+                stmt.append((kind, text))
+
+        # Out of tokens. Anything left over is kept verbatim.
+        self._flushTrivia(stmt, pieces)
+        return pieces
+
+    @staticmethod
+    def _flushTrivia(stmt, pieces):
+        """Keep an unterminated statement as raw text."""
+        if stmt:
+            _appendTrivia(pieces, ''.join(t for _, t in stmt))
+            del stmt[:]
+
+def _appendTrivia(pieces, text):
+    """Add trivia text to a list of pieces, merging with preceding trivia."""
+    if pieces and isinstance(pieces[-1], str):
+        pieces[-1] += text
+    else:
+        pieces.append(text)
+
+def _serialize(pieces):
+    """Join a list of pieces into a string."""
+    return ''.join([p if isinstance(p, str) else p.serialize()
+                    for p in pieces])
+
+def _indexPieces(pieces, offset, out):
+    """Helper for glmModel.objectIndex. Adds named objects in pieces to the
+    out dictionary, given the offset of the first piece. Returns the offset
+    just past the last piece.
+    """
+    for p in pieces:
+        if isinstance(p, str):
+            offset += len(p)
+            continue
+
+        s = p.serialize()
+        if isinstance(p, glmBlock):
+            if p.kind == 'object':
+                n = p.name
+                if (n is not None) and (n not in out):
+                    # Only count the closing brace, not a trailing ';'
+                    end = offset + len(s) - len(p.close) + len(p.close[:1])
+                    out[n] = (p.type, offset, end)
+
+            # Nested objects.
+            _indexPieces(p.pieces, offset + len(p.header) + 1, out)
+
+        offset += len(s)
+
+    return offset
+
+class _container:
+    """Shared functionality for things which hold pieces (glmModel and
+    glmBlock).
+    """
+
+    def statements(self):
+        """Generator of the direct glmStatement children."""
+        for p in self.pieces:
+            if isinstance(p, glmStatement):
+                yield p
+
+    def blocks(self):
+        """Generator of the direct glmBlock children."""
+        for p in self.pieces:
+            if isinstance(p, glmBlock):
+                yield p
+
+    def directives(self):
+        """Generator of the direct glmDirective children."""
+        for p in self.pieces:
+            if isinstance(p, glmDirective):
+                yield p
+
+    def walk(self):
+        """Generator of all blocks (depth first, in model order)."""
+        for b in self.blocks():
+            yield b
+            yield from b.walk()
+
+    def insert(self, item, place='end'):
+        """Insert a node or raw text into the pieces list.
+
+        INPUTS:
+            item: glmBlock, glmStatement, glmDirective, or string. Strings are
+                parsed, so 'object meter {...}' becomes a block.
+            place: 'beginning' or 'end'
+
+        OUTPUT: list of pieces which were inserted.
+        """
+        if isinstance(item, str):
+            new = parse(item).pieces
+        else:
+            new = [item]
+
+        for p in new:
+            if not isinstance(p, str):
+                p.parent = self
+
+        if place == 'beginning':
+            self.pieces[0:0] = new
+        elif place == 'end':
+            self.pieces.extend(new)
+        else:
+            assert False, ("'place' inputs must be 'beginning' "
+                           "or 'end.' '{}' was given.".format(place))
+
+        self._changed()
+        return new
+
+    def remove(self, node):
+        """Remove a node from the pieces list."""
+        for ind, p in enumerate(self.pieces):
+            if p is node:
+                del self.pieces[ind]
+                node.parent = None
+                self._changed()
+                return
+
+        raise ValueError('Node is not a child of this container.')
+
+    def _changed(self):
+        """Notify the top level model that the structure changed."""
+        m = self.getModel()
+        if m is not None:
+            m._index = None
+
+class glmModel(_container):
+    """Top level of a parsed GridLAB-D model."""
+
+    def __init__(self):
+        self.pieces = []
+        self.parent = None
+        # Index of named objects, built on demand.
+        self._index = None
+
+    def getModel(self):
+        return self
+
+    def serialize(self):
+        """Return the model as a string."""
+        return _serialize(self.pieces)
+
+    __str__ = serialize
+
+    @property
+    def index(self):
+        """Dictionary mapping object names to their blocks. Blocks without a
+        name aren't included. If names are repeated, the first wins.
+        """
+        if self._index is None:
+            self._index = {}
+            for b in self.walk():
+                n = b.name
+                if n is not None and n not in self._index:
+                    self._index[n] = b
+
+        return self._index
+
+    def objectIndex(self):
+        """Dictionary mapping object names to (type, start, end) where start
+        and end are character offsets into the serialized model. 'end' is
+        just past the closing brace (a following ';' isn't included), which
+        matches the 'end' of modGLM.extractObject. If names are repeated, the
+        first wins.
+        """
+        out = {}
+        _indexPieces(self.pieces, 0, out)
+        return out
+
+    def findByName(self, name, objType=None):
+        """Find object block by name. If objType (string or tuple of strings)
+        is given, the object must also be of that type.
+
+        Returns None if not found.
+        """
+        b = self.index.get(name)
+        if (b is not None) and (objType is not None):
+            if isinstance(objType, str):
+                objType = (objType,)
+
+            if b.type not in objType:
+                return None
+
+        return b
+
+    def find(self, kind=None, objType=None):
+        """Generator of all blocks matching kind and type.
+
+        INPUTS:
+            kind: 'object', 'module', 'clock', 'class', ... None matches any.
+            objType: object/module/class type. Ex: 'triplex_meter'. None
+                matches any. May be a tuple of types.
+        """
+        if isinstance(objType, str):
+            objType = (objType,)
+
+        for b in self.walk():
+            if (kind is not None) and (b.kind != kind):
+                continue
+            if (objType is not None) and (b.type not in objType):
+                continue
+            yield b
+
+    def findFirst(self, kind=None, objType=None):
+        """Return the first block matching kind and type, or None."""
+        for b in self.find(kind=kind, objType=objType):
+            return b
+        return None
+
+    def findDirective(self, keyword, name=None):
+        """Find the first top level directive like '#<keyword> <name>...'.
+        Ex: findDirective('set', 'profiler')
+        """
+        for d in self.directives():
+            if (d.keyword == keyword) and ((name is None) or (d.name == name)):
+                return d
+        return None
+
+    def findStatement(self, name, value=None):
+        """Find first top level statement like 'module tape;'"""
+        for s in self.statements():
+            if (s.name == name) and ((value is None) or (s.prop == value)):
+                return s
+        return None
+
+class glmDirective:
+    """A macro/directive line such as '#set suppress_repeat_messages=1'"""
+
+    def __init__(self, text, parent=None):
+        self.text = text
+        self.parent = parent
+
+    def serialize(self):
+        return self.text
+
+    @property
+    def keyword(self):
+        """'set', 'define', 'include', ..."""
+        m = re.match(r'#\s*(\w+)', self.text)
+        return m.group(1) if m else ''
+
+    @property
+    def name(self):
+        """For '#set x=1' or '#define x=1', returns 'x'."""
+        m = re.match(r'#\s*\w+\s+([^=\s]+)', self.text)
+        return m.group(1) if m else None
+
+    @property
+    def value(self):
+        """For '#set x=1' or '#define x=1', returns '1'."""
+        m = re.match(r'#\s*\w+\s+[^=\s]+\s*=\s*(.*?)\s*$', self.text)
+        return m.group(1) if m else None
+
+    @value.setter
+    def value(self, val):
+        m = re.match(r'(#\s*\w+\s+[^=\s]+\s*=\s*)(.*?)(\s*)$', self.text)
+        if m is None:
+            raise ValueError("Directive '{}' has no value.".format(self.text))
+        self.text = m.group(1) + str(val) + m.group(3)
+
+class glmStatement:
+    """A 'name value;' statement. Properties of an object are statements.
+
+    The text is split up so it can be written back exactly:
+        name + sep + value + tail + end
+    Ex: 'name', ' ', '"node_1"', '', ';'
+    """
+
+    def __init__(self, name, value='', sep=' ', tail='', end=';',
+                 parent=None):
+        self.name = name
+        self.value = value
+        self.sep = sep
+        self.tail = tail
+        self.end = end
+        self.parent = parent
+
+    @classmethod
+    def fromTokens(cls, tokens, end, parent):
+        text = ''.join(t for _, t in tokens)
+        # Split off leading whitespace (shouldn't exist, since whitespace
+        # before a statement is trivia) and name.
+        m = re.match(r'(\S+)(\s*)(.*?)(\s*)$', text, re.DOTALL)
+        return cls(name=m.group(1), sep=m.group(2), value=m.group(3),
+                   tail=m.group(4), end=end, parent=parent)
+
+    def serialize(self):
+        return self.name + self.sep + self.value + self.tail + self.end
+
+    @property
+    def prop(self):
+        """Value with surrounding quotes removed, which matches the 'prop'
+        returned by modGLM.extractProperties.
+        """
+        return self.value.strip().strip('"')
+
+    def set(self, value):
+        """Set the value. Formatting matches modGLM.modObjProps."""
+        self.sep = ' '
+        self.value = str(value)
+        self.tail = ''
+
+class glmBlock(_container):
+    """A block such as 'object meter {...}', 'module powerflow {...}', or
+    'clock {...}'.
+
+    Serialized as: header + '{' + pieces + close
+    where header includes whitespace before the opening brace, and close is
+    '}' or '};'
+    """
+
+    def __init__(self, header, pieces=None, close='}', parent=None):
+        self.header = header
+        self.pieces = pieces if pieces is not None else []
+        self.close = close
+        self.parent = parent
+
+    @classmethod
+    def fromTokens(cls, tokens, parent):
+        return cls(header=''.join(t for _, t in tokens), parent=parent)
+
+    def serialize(self):
+        return self.header + '{' + _serialize(self.pieces) + self.close
+
+    def getModel(self):
+        p = self.parent
+        while (p is not None) and not isinstance(p, glmModel):
+            p = p.parent
+        return p
+
+    @property
+    def kind(self):
+        """First word of the header: 'object', 'module', 'clock', ..."""
+        w = self.header.split()
+        return w[0] if w else ''
+
+    @property
+    def type(self):
+        """For 'object triplex_meter:12 {', returns 'triplex_meter'. For
+        'module powerflow {', returns 'powerflow'. None for other kinds.
+        """
+        w = self.header.split()
+        if (len(w) < 2) or (w[0] not in TYPED_KINDS):
+            return None
+        return w[1].split(':')[0]
+
+    @type.setter
+    def type(self, objType):
+        m = re.match(r'(\s*\S+\s+)([^\s:]+)(.*)$', self.header, re.DOTALL)
+        if m is None:
+            raise ValueError("Block '{}' has no type.".format(self.header))
+        self.header = m.group(1) + objType + m.group(3)
+        self._changed()
+
+    @property
+    def name(self):
+        """Value of the 'name' property, or None."""
+        s = self.getStatement('name')
+        return None if s is None else s.prop
+
+    def getStatement(self, prop):
+        """Get the glmStatement for a property, or None."""
+        for s in self.statements():
+            if s.name == prop:
+                return s
+        return None
+
+    def getProp(self, prop, default=None):
+        """Get a property value (quotes stripped) or default."""
+        s = self.getStatement(prop)
+        return default if s is None else s.prop
+
+    @property
+    def props(self):
+        """Dictionary of all property values (quotes stripped)."""
+        d = {}
+        for s in self.statements():
+            d.setdefault(s.name, s.prop)
+        return d
+
+    def setProp(self, prop, value):
+        """Modify or create a property. Formatting matches
+        modGLM.modObjProps.
+        """
+        s = self.getStatement(prop)
+        if s is not None:
+            s.set(value)
+            if prop == 'name':
+                self._changed()
+        else:
+            self.pieces.append(glmStatement(name=prop, value=str(value),
+                                            sep=' ', tail='', end=';',
+                                            parent=self))
+            # Add the leading indent and trailing newline like modObjProps.
+            self._wrapLast('  ', '\n')
+            if prop == 'name':
+                self._changed()
+
+    def setProps(self, propDict):
+        """Modify or create properties from a dictionary."""
+        for prop, value in propDict.items():
+            self.setProp(prop, value)
+
+    def delProp(self, prop):
+        """Remove a property (and the rest of its line)."""
+        for ind, p in enumerate(self.pieces):
+            if isinstance(p, glmStatement) and p.name == prop:
+                del self.pieces[ind]
+                # Drop indentation before and newline after the statement.
+                if (ind > 0) and isinstance(self.pieces[ind-1], str):
+                    self.pieces[ind-1] = self.pieces[ind-1].rstrip(' \t')
+                if (ind < len(self.pieces)) and isinstance(self.pieces[ind],
+                                                           str):
+                    self.pieces[ind] = re.sub(r'^[ \t]*\n?', '',
+                                              self.pieces[ind], count=1)
+                if prop == 'name':
+                    self._changed()
+                return
+
+        raise KeyError(prop)
+
+    def _wrapLast(self, before, after):
+        """Put trivia text around the last piece."""
+        last = self.pieces.pop()
+        _appendTrivia(self.pieces, before)
+        self.pieces.append(last)
+        _appendTrivia(self.pieces, after)
@@ -11,6 +11,7 @@ import datetime
 import dateutil.tz
 import constants
 import copy
+import numpy as np
 
 # Compile some regular expressions for detection of complex number forms
 RECT_EXP = re.compile(r'[+-]*([0-9])+(\.)*([0-9])*(e[+-]*([0-9])+)*[+-]([0-9])+(\.)*([0-9])*(e[+-]([0-9])+)*j')
@@ -68,6 +69,58 @@ def getComplex(s):
         
     return n, u
 
+def getComplexArray(values):
+    """Vectorized getComplex: convert many strings at once. Rather than
+    parsing each string, they're joined into one, which is edited with
+    str.replace so each number becomes its two terms and its form
+    (0, 1, 2 for j, d, r). Numpy then converts it all.
+    
+    INPUTS:
+        values: iterable of strings, see getComplex. GridLAB-D's format is
+            expected: both terms and exponents have signs.
+            
+    OUTPUTS:
+        numpy complex array, list of units ('' if there's no unit)
+    """
+    values = list(values)
+    n = len(values)
+    
+    # Split off the units. Usually all values have one, or none do.
+    tokens = '\n'.join(values).split()
+    if len(tokens) == 2 * n:
+        nums = tokens[::2]
+        units = tokens[1::2]
+    elif len(tokens) == n:
+        nums = tokens
+        units = [''] * n
+    else:
+        t = [v.split() for v in values]
+        nums = [x[0] if x else '' for x in t]
+        units = [x[1] if len(x) > 1 else '' for x in t]
+    
+    # '+1.5-2e-03d' becomes ' +1.5 -2e-03 1'. Exponent signs are moved out
+    # of the way while the terms are split.
+    text = ('\n'.join(nums).replace('e+', 'E').replace('e-', 'F')
+            .replace('+', ' +').replace('-', ' -')
+            .replace('E', 'e+').replace('F', 'e-')
+            .replace('j', ' 0').replace('d', ' 1').replace('r', ' 2'))
+    try:
+        parts = np.array(text.split(), dtype=float)
+    except ValueError:
+        parts = None
+    if (parts is None) or (len(parts) != 3 * n):
+        raise ValueError(('Inputs to getComplexArray must be complex '
+                          + 'numbers with a sign for both components and '
+                          + 'an optional unit, see getComplex.'))
+    
+    first, second, form = parts.reshape(n, 3).T
+    # Phases in radians, for the polar forms.
+    phase = np.where(form == 1, np.radians(second), second)
+    out = np.where(form == 0, first + 1j * second,
+                   first * np.exp(1j * phase))
+    
+    return out, units
+
 def powerFactor(n):
     """Function to compute power factor given a complex power value
     Will this work if we're exporting power? I think so...
@@ -83,6 +136,22 @@ def powerFactor(n):
     else:
         return (pf, 'lag')
     
+def powerFactors(power):
+    """Vectorized powerFactor for many complex power values.
+    
+    INPUTS:
+        power: list or numpy array of complex powers.
+        
+    OUTPUTS: tuple of numpy arrays (pf, lead). lead is True where the power
+        factor is leading, and False where it's lagging. Zero power gives a
+        power factor of nan.
+    """
+    power = np.asarray(power, dtype=complex)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pf = np.abs(power.real) / np.abs(power)
+        
+    return pf, np.angle(power) < 0
+    
 def binaryWidth(n):
     """Compute length of binary representation of an integer.
     """
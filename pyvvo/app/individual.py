@@ -12,6 +12,12 @@ import helper
 import constants
 import os
 import copy
+import gldServer
+import simCache
+import gldProfile
+import recorderFiles
+import json
+import logging
 
 # Define cap status, to be accessed by binary indices.
 CAPSTATUS = ['OPEN', 'CLOSED']
@@ -33,7 +39,8 @@ class individual:
     
     def __init__(self, uid, starttime, stoptime, timezone, dbObj, recorders,
                  reg=None, regFlag=5, cap=None, capFlag=5, regChrom=None, 
-                 capChrom=None, parents=None, controlFlag=0, gldInstall=None):
+                 capChrom=None, parents=None, controlFlag=0, gldInstall=None,
+                 runLimits=None, runner=None):
         """An individual contains information about Volt/VAR control devices
         
         Individuals can be initialized in two ways: 
@@ -49,7 +56,9 @@ class individual:
             stoptime: "..." end 
             timezone: string representing timezone, as it would appear in 
                 GridLAB-D's tzinfo.txt. Example: 'PST+8PDT'
-            dbObj: Initialized object of util/db.db class
+            dbObj: Initialized object of util/db.db class. To record to files
+                rather than MySQL, use a recorderFiles.fileDB object, or a
+                sqliteDB.sqliteDB object to import the files into SQLite.
             reg: Dictionary as described in the docstring for the gld module.
             
                 Note possible tap positions be in interval [-lower_taps,
@@ -145,6 +154,21 @@ class individual:
                 - 'DIR' should point to GridLAB-D installation to use.
                 - 'LD_LIBRARY_PATH' should be None on Windows, but should point
                     to the necessary lib folder on Linux (/usr/local/mysql/lib)
+                    
+            runLimits: optional dict of limits for running the model (see
+                gld.runModel). Any field can be omitted or None:
+                - 'TIMEOUT': wall clock seconds.
+                - 'CPU-TIME': CPU seconds.
+                - 'MEMORY': maximum memory in MB.
+                - 'LOG': if True, GridLAB-D's stdout and stderr are written to
+                    files next to the model (<model>.out and <model>.err)
+                    rather than held in memory.
+                A run which fails or hits a limit makes the individual
+                infeasible (see setInfeasible).
+                
+            runner: optional gld.runner to run the model with, e.g. one
+                shared by a population. If None, a runner is set up from
+                gldInstall for each run.
         """
         # Ensure flags are compatible.
         if controlFlag:
@@ -162,6 +186,12 @@ class individual:
         # Assign gldInstall
         self.gldInstall = gldInstall
         
+        # Assign run limits
+        self.runLimits = runLimits if runLimits is not None else {}
+        
+        # Assign model runner
+        self.runner = runner
+        
         # set database object
         self.dbObj = dbObj
         
@@ -187,6 +217,12 @@ class individual:
         # Set recorders property
         self.recorders = copy.deepcopy(recorders)
         
+        # Tables of mysql recorders and their columns, see buildModel.
+        self.recorderTables = {}
+        
+        # Tables of tape recorders, see addTapeRecorder.
+        self.fileTables = {}
+        
         # If not given a regChrom or capChrom, generate them.
         if (regChrom is None) and (capChrom is None):
             # Generate regulator chromosome:
@@ -218,11 +254,25 @@ class individual:
         # Full path to output model.
         self.modelPath = None
         
-        # When the model is run, output will be saved.
+        # When the model is run, output will be saved, along with the status
+        # of the run (see gld.runModel).
         self.modelOutput = None
+        self.runStatus = None
+        
+        # If GridLAB-D's profiler is on, the parsed output is saved (see
+        # gldProfile.parse).
+        self.profile = None
 
-        # The evalFitness method assigns costs
+        # The evalFitness method assigns costs, and the inputs used to compute
+        # them (see gld.costInputs)
         self.costs = None
+        self.costInputs = None
+        
+        # With batched evaluation, individuals which have been run wait for
+        # the population to evaluate them (see evalFromAggregates). Track
+        # that, and the simCache key to put their results under.
+        self.pendingEval = False
+        self.evalKey = None
         
         # Update the 'prevState' of the individuals reg and cap dictionaries.
         if reg and cap:
@@ -586,7 +636,7 @@ class individual:
                     
                     self.capSwitchCount += 1
                 
-    def writeModel(self, strModel, inPath, outDir):
+    def writeModel(self, strModel, inPath, outDir, objIndex=None):
         """Create a GridLAB-D .glm file for the given individual by modifying
         setpoints for controllable devices (capacitors, regulators, eventually
         DERs) and adding all requisite recorders. Everything else in the model
@@ -599,10 +649,25 @@ class individual:
             outDir: directory to write new model to. Filename will be inferred
                 from the inPath, and the individuals uid preceded by an
                 underscore will be added
+            objIndex: optional object index for strModel. See
+                modGLM.modGLM.__init__
                 
         OUTPUTS:
             Writes model to file
         """
+        writeObj = self.buildModel(strModel=strModel, inPath=inPath,
+                                   outDir=outDir, objIndex=objIndex)
+        # Write the modified model to file.
+        writeObj.writeModel()
+        
+    def buildModel(self, strModel, inPath, outDir, objIndex=None):
+        """Build the individual's model without writing it. See writeModel
+        for inputs.
+        
+        OUTPUTS:
+            modGLM.modGLM object for the model. Call its writeModel method
+                to write it.
+        """
         # Assign output directory.
         self.outDir = outDir
         
@@ -616,18 +681,11 @@ class individual:
         
         # Instantiate a modGLM object.
         writeObj = modGLM.modGLM(strModel=strModel, pathModelIn=inPath,
-                                pathModelOut=(outDir + '/' + modelPath))
+                                pathModelOut=(outDir + '/' + modelPath),
+                                objIndex=objIndex)
         
         # Set control for regulators and capacitors.
-        regControl, capControl = CONTROL[self.controlFlag]
-        
-        for r in self.reg:
-            # Modify control setting.
-            self.reg[r]['Control'] = regControl
-
-        for c in self.cap:
-            # Modify control setting.
-            self.cap[c]['control'] = capControl
+        self.setControl()
             
         # Change capacitor and regulator statuses/positions and control.
         writeObj.commandRegulators(reg=self.reg)
@@ -640,6 +698,25 @@ class individual:
             # NOTE: this method creates a player file... annoying.
             self.vvoPlayer = writeObj.addVVO(starttime=self.start_str)
             
+        # Track tables of mysql recorders, and their columns (see
+        # addRecorder), and tables of tape recorders.
+        self.recorderTables = {}
+        self.fileTables = {}
+        
+        # Set up GridLAB-D's database session (see sessionScript). The
+        # script is run from the model's directory.
+        sql = self.sessionScript()
+        if sql:
+            script = 'uid' + self.tableSuffix + '.sql'
+            with open(os.path.join(outDir, script), 'w') as f:
+                f.write(sql)
+            writeObj.updateDatabase({'on_init': '"{}"'.format(script)})
+            
+        # Recording to files takes the tape module.
+        if (self.recordsToFiles()
+                and (writeObj.checkForModule(module='tape') is None)):
+            writeObj.addModule(module='tape')
+            
         # Add the power and energy recorders, track their tables.
         self.powerTable = self.addRecorder(recordDict=self.recorders['power'],
                                            writeObj=writeObj)
@@ -694,9 +771,62 @@ class individual:
                 
             # Track the capacitor table
             self.capTable = tc
+            
+        # Create typed tables before GridLAB-D does.
+        if self.recorderTables and getattr(self.dbObj, 'typedTables', False):
+            self.dbObj.createRecorderTables(self.recorderTables)
         
-        # Write the modified model to file.
-        writeObj.writeModel()
+        return writeObj
+        
+    def setControl(self):
+        """Set the control mode of regulators and capacitors according to
+        the controlFlag.
+        """
+        regControl, capControl = CONTROL[self.controlFlag]
+        
+        for r in self.reg:
+            # Modify control setting.
+            self.reg[r]['Control'] = regControl
+
+        for c in self.cap:
+            # Modify control setting.
+            self.cap[c]['control'] = capControl
+            
+    def serverSlot(self):
+        """Get the fields for a gldServer.serverPool slot from an
+        individual which has written its model (see writeModel). The
+        individual should have controlFlag 0, since only its recorder tables
+        are tracked.
+        """
+        return {'model': self.outDir + '/' + self.modelPath,
+                'suffix': self.tableSuffix,
+                'tables': {'powerTable': self.powerTable,
+                           'energyTable': self.energyTable,
+                           'triplexTable': self.triplexTable}}
+        
+    def runServer(self, serverPool, slot, regConf):
+        """Run the individual on a warm GridLAB-D server rather than
+        writing and running its own model. Only individuals with controlFlag
+        0 can do this.
+        
+        INPUTS:
+            serverPool: gldServer.serverPool object
+            slot: slot from serverPool.acquire()
+            regConf: dict mapping regulator names to configuration names.
+        """
+        assert self.controlFlag == 0
+        
+        # Results come from the slot's recorder tables.
+        for k, v in slot['tables'].items():
+            setattr(self, k, v)
+            
+        # Set control, then send device states and run.
+        self.setControl()
+        commands = gldServer.deviceCommands(reg=self.reg, cap=self.cap,
+                                            regConf=regConf)
+        serverPool.run(slot=slot, commands=commands, stoptime=self.stoptime)
+        self.modelOutput = None
+        self.runStatus = gld.RUN_OK
         
     def addRecorder(self, recordDict, writeObj):
         """Helper function to add a recorder object from self.recorders to a
@@ -705,9 +835,26 @@ class individual:
         # Make a copy of the recordDict (otherwise, if the individual is reused
         # we end up continually tacking the tableSuffix)
         rD = copy.deepcopy(recordDict)
-        # Add '_<uid>' to table name.
-        rD['properties']['table'] = (rD['properties']['table']
-                                     + self.tableSuffix)
+        
+        # Shared tables are written as is, and the individual's partition
+        # is read (see db.createSharedTables).
+        if self.recordsToSharedTables():
+            table = self.dbObj.partitionTable(rD['properties']['table'],
+                                              self.uid)
+        else:
+            # Add '_<uid>' to table name.
+            rD['properties']['table'] = (rD['properties']['table']
+                                         + self.tableSuffix)
+            table = rD['properties']['table']
+        
+        # With files, tape recorders are used instead.
+        if self.recordsToFiles():
+            return self.addTapeRecorder(rD=rD, writeObj=writeObj)
+        
+        # Let the database know about the table, for cleanup.
+        if not self.recordsToSharedTables():
+            self.dbObj.registerTable(suffix=self.tableSuffix, table=table,
+                                     scan=(rD['objType'] == 'group_recorder'))
         
         # recorders and group_recorders need handled differently.
         if rD['objType'] == 'recorder':
@@ -716,6 +863,10 @@ class individual:
             # In this case, we can grab the columns directly from the
             # rD.
             cols = gld.propToCol(rD['properties']['propList'])
+            # Track the table's columns in case we create it.
+            if not self.recordsToSharedTables():
+                self.recorderTables[table] = \
+                    gld.sqlColumns(rD['properties']['propList'])
             # At the time of writing, regular mysql recorders cannot specify a
             # complex part.
             complex_part = []
@@ -729,21 +880,140 @@ class individual:
             complex_part = rD['properties']['complex_part']
         
         # Return. 
-        return {'table': rD['properties']['table'],
+        return {'table': table,
                 'columns': cols,
                 'complex_part': complex_part,
                 'type': rD['objType']}
         
-    def runModel(self):
-        """Function to run GridLAB-D model.
+    def recordsToFiles(self):
+        """True if the individual records to files (see recorderFiles)
+        rather than MySQL.
+        """
+        return isinstance(self.dbObj, recorderFiles.fileDB)
+    
+    def recordsToSharedTables(self):
+        """True if the individual records to tables shared by all
+        individuals (see db.createSharedTables).
         """
-        self.modelOutput = gld.runModel(modelPath=(self.outDir + '/'
-                                                        + self.modelPath),
-                                        **self.gldInstall)
-        # TODO: Handle a failed GridLAB-D run (catch a CalledProcessError)
+        return bool(getattr(self.dbObj, 'sharedTables', None))
+    
+    def sessionScript(self):
+        """SQL for GridLAB-D to run when it connects to the database: tag
+        rows in shared tables with our uid, and set the storage engine of
+        tables it creates (see db.setEngine). Returns an empty string if
+        there's nothing to set.
+        """
+        sql = ''
+        if self.recordsToSharedTables():
+            sql += self.dbObj.uidScript(self.uid)
+            
+        engine = getattr(self.dbObj, 'engine', None)
+        if engine is not None:
+            sql += self.dbObj.engineScript(engine)
+            
+        return sql
+    
+    def addTapeRecorder(self, rD, writeObj):
+        """Helper for addRecorder to record to files. Files are put in the
+        individual's directory (see recorderFiles). Returns the same as
+        addRecorder.
+        
+        INPUTS:
+            rD: copy of the recordDict, with the table suffix added.
+            writeObj: modGLM.modGLM object for the model.
+        """
+        p = rD['properties']
+        cols = gld.propToCol(p['propList'])
+        
+        if p.get('group'):
+            # Tape recorders can't record groups, so use a group_recorder for
+            # each property. The complex part follows a period, like
+            # 'measured_voltage_1.mag'.
+            for prop, col in zip(p['propList'], cols):
+                prop, _, part = prop.partition('.')
+                f = self.dbObj.recorderFile(table=p['table'], part=col,
+                                            makeDir=True)
+                writeObj.addTapeGroup_Recorder(group=p['group'], prop=prop,
+                                               interval=p['interval'],
+                                               file=f,
+                                               limit=p.get('limit', -1),
+                                               complex_part=(part.upper()
+                                                             or None))
+        else:
+            f = self.dbObj.recorderFile(table=p['table'], part=p['parent'],
+                                        makeDir=True)
+            writeObj.addTapeRecorder(parent=p['parent'],
+                                     propList=p['propList'],
+                                     interval=p['interval'], file=f,
+                                     limit=p.get('limit', -1))
+            
+        # Track the table, and whether its files have a column per object.
+        self.fileTables[p['table']] = bool(p.get('group'))
+        
+        return {'table': p['table'],
+                'columns': cols,
+                'complex_part': [],
+                'type': rD['objType']}
+        
+    def runModel(self, affinity=None):
+        """Function to run GridLAB-D model. Sets self.runStatus to the
+        status of the run (see gld.runModel).
+        
+        affinity: optional worker slot to pin the run to, see gld.runModel.
+        """
+        # Log output to files named after the model.
+        if self.runLimits.get('LOG'):
+            logPrefix = (self.outDir + '/'
+                         + os.path.splitext(self.modelPath)[0])
+        else:
+            logPrefix = None
+            
+        if self.runner is not None:
+            runner = self.runner
+        else:
+            runner = gld.runner(**self.gldInstall)
+            
+        self.modelOutput = runner.run(modelPath=(self.outDir + '/'
+                                                 + self.modelPath),
+                                      timeout=self.runLimits.get('TIMEOUT'),
+                                      cpuTime=self.runLimits.get('CPU-TIME'),
+                                      memory=self.runLimits.get('MEMORY'),
+                                      logPrefix=logPrefix,
+                                      affinity=affinity)
+        self.runStatus = self.modelOutput.status
+        
+        # Read profiler output, if there is any.
+        if self.modelOutput.logs is not None:
+            out = gldProfile.readTail(self.modelOutput.logs[0])
+        else:
+            out = self.modelOutput.stdout
+        if self.recordsToFiles():
+            classModules = gldProfile.TAPE_RECORDERS
+        else:
+            classModules = None
+        self.profile = (gldProfile.parse(out, classModules=classModules)
+                        if out else None)
+        
         # If a model failed to run, print to the console.
-        if self.modelOutput.returncode:
-            print("FAILURE! Individual {}'s model gave non-zero returncode.".format(self.uid))
+        if self.runStatus != gld.RUN_OK:
+            print("FAILURE! Individual {}'s model run status: {}.".format(
+                self.uid, self.runStatus))
+            
+    def setInfeasible(self, status):
+        """Score the individual as infeasible, e.g. because its model failed
+        or timed out. Its total cost is infinite, so it sorts last and is
+        killed in natural selection.
+        
+        INPUTS:
+            status: reason, see gld.runModel for run statuses.
+        """
+        self.runStatus = status
+        self.costs = {'total': float('inf'), 'status': status}
+        
+    def infeasible(self):
+        """True if the individual was scored as infeasible."""
+        return (self.costs is not None) and (self.costs['total']
+                                             == float('inf'))
         
     def update(self, stoptime=None):
         """Function to update regulator tap operations and positions, and 
@@ -823,20 +1093,70 @@ class individual:
         if stoptime is None:
             stoptime = self.stoptime
 
-        # Compute costs.
-        self.costs = gld.computeCosts(dbObj=self.dbObj,
-                                           energyTable=self.energyTable,
-                                           powerTable=self.powerTable,
-                                           triplexTable=self.triplexTable,
-                                           tapChangeCount=self.tapChangeCount,
-                                           capSwitchCount=self.capSwitchCount,
-                                           costs=costs,
-                                           starttime=starttime,
-                                           stoptime=stoptime,
-                                           tCol=tCol,
-                                           )
+        # Read the cost inputs, and compute costs.
+        self.costInputs = \
+            gld.costInputs(dbObj=self.dbObj, energyTable=self.energyTable,
+                           powerTable=self.powerTable,
+                           triplexTable=self.triplexTable,
+                           lowerBound=costs['undervoltage']['limit'],
+                           upperBound=costs['overvoltage']['limit'],
+                           leadLimit=costs['powerFactorLead']['limit'],
+                           lagLimit=costs['powerFactorLag']['limit'],
+                           starttime=starttime, stoptime=stoptime, tCol=tCol)
+        
+        self.costs = \
+            gld.costsFromInputs(inputs=self.costInputs,
+                                tapChangeCount=self.tapChangeCount,
+                                capSwitchCount=self.capSwitchCount,
+                                costs=costs)
+        
+    def cacheEntry(self):
+        """Get the results of running and evaluating the individual which
+        can be cached (see simCache). Call after evalFitness.
+        """
+        entry = {'inputs': self.costInputs, 'update': None}
+        
+        # With GridLAB-D's control (controlFlag > 0), the counts and states
+        # come out of the run (see update), so they're cached. With manual
+        # control (controlFlag 0), they're known before the model is run.
+        if self.controlFlag > 0:
+            entry['update'] = {'tapChangeCount': self.tapChangeCount,
+                               'capSwitchCount': self.capSwitchCount,
+                               'reg': phaseStates(self.reg),
+                               'cap': phaseStates(self.cap)}
+            
+        return entry
+    
+    def useCacheEntry(self, entry, costs):
+        """Update the individual and evaluate its fitness from a cacheEntry,
+        rather than from a model run.
+        """
+        u = entry['update']
+        if u is not None:
+            # This does the job of update()
+            self.tapChangeCount = u['tapChangeCount']
+            self.capSwitchCount = u['capSwitchCount']
+            for d, states in ((self.reg, u['reg']), (self.cap, u['cap'])):
+                for name, phases in states.items():
+                    for phase, state in phases.items():
+                        d[name]['phases'][phase]['newState'] = state
+                        
+            self.genRegChrom(flag=4)
+            self.genCapChrom(flag=4)
+            
+        self.modelOutput = None
+        self.runStatus = gld.RUN_OK
+        self.costInputs = entry['inputs']
+        self.costs = \
+            gld.costsFromInputs(inputs=self.costInputs,
+                                tapChangeCount=self.tapChangeCount,
+                                capSwitchCount=self.capSwitchCount,
+                                costs=costs)
     
-    def writeRunUpdateEval(self, strModel, inPath, outDir, costs):
+    def writeRunUpdateEval(self, strModel, inPath, outDir, costs,
+                           objIndex=None, serverPool=None, regConf=None,
+                           simCache=None, affinity=None, batchEval=False,
+                           log=None):
         """Function to write and run model, update individual, and evaluate
         the individual's fitness.
         
@@ -845,15 +1165,146 @@ class individual:
             inPath: see writeModel()
             outDir: see writeModel()
             costs: costs for fitness evaluation. See evalFitness
+            objIndex: see writeModel()
+            serverPool: optional gldServer.serverPool. If given, and the
+                controlFlag is 0, the individual is run on a warm server (see
+                runServer) rather than writing and running a model.
+            regConf: see runServer. Required with serverPool.
+            simCache: optional simCache.simCache object. If the same
+                model has already been run, its cached results are used and
+                no model is run. Otherwise, results are added to the cache.
+            affinity: see runModel.
+            batchEval: True to leave evaluating the individual's fitness to
+                the population, which evaluates all the individuals run in
+                a generation at once (see evalFromAggregates). Only models
+                run with a database which supports it (see
+                db.costAggregates) are left; individuals run on servers are
+                always evaluated right away.
+            log: logging.Logger instance for failed server runs, e.g. the
+                population's. If None, the root logger is used.
             
         OUTPUTS:
             list of tables
         """
-        # Write the model.
-        self.writeModel(strModel=strModel, inPath=inPath, outDir=outDir)
-        # Run the model.
-        self.runModel()
-        # Update tap/cap states and change counts if necessary.
-        self.update()
-        # Evaluate costs.
-        self.evalFitness(costs=costs)
\ No newline at end of file
+        # Cached results also depend on the evaluation times, and the voltage
+        # and power factor limits (see gld.costInputs).
+        extra = (self.start_str, self.stop_str,
+                 json.dumps([costs['undervoltage']['limit'],
+                             costs['overvoltage']['limit'],
+                             costs['powerFactorLead']['limit'],
+                             costs['powerFactorLag']['limit']]))
+        key = None
+        
+        if (serverPool is not None) and (self.controlFlag == 0):
+            # The server model is the base model with device commands sent.
+            if simCache is not None:
+                self.setControl()
+                commands = gldServer.deviceCommands(reg=self.reg,
+                                                    cap=self.cap,
+                                                    regConf=regConf)
+                key = simCache.commandKey(strModel, commands, *extra)
+                if self.fromCache(simCache=simCache, key=key, costs=costs):
+                    return
+            
+            # Run on a server. Hold on to it until the costs are evaluated,
+            # since they come from the server's recorder tables. Any failure
+            # makes the individual infeasible: an exception escaping here
+            # would kill the population's model thread, and the population
+            # would wait on its queue forever.
+            slot = None
+            try:
+                slot = serverPool.acquire()
+                self.runServer(serverPool=serverPool, slot=slot,
+                               regConf=regConf)
+                self.update()
+                self.evalFitness(costs=costs)
+            except Exception as e:
+                if log is None:
+                    log = logging.getLogger()
+                log.error("Individual {}'s server run failed: {}".format(
+                    self.uid, e))
+                self.setInfeasible(status=gld.RUN_FAILED)
+                return
+            finally:
+                if slot is not None:
+                    serverPool.release(slot)
+        else:
+            # Build the model.
+            writeObj = self.buildModel(strModel=strModel, inPath=inPath,
+                                       outDir=outDir, objIndex=objIndex)
+            if simCache is not None:
+                key = simCache.key(writeObj.strModel, self.tableSuffix,
+                                   *extra)
+                if self.fromCache(simCache=simCache, key=key, costs=costs):
+                    return
+            
+            # Write the model.
+            writeObj.writeModel()
+            # Run the model.
+            self.runModel(affinity=affinity)
+            
+            # Failed or hung runs are infeasible (and not cached).
+            if self.runStatus != gld.RUN_OK:
+                self.setInfeasible(status=self.runStatus)
+                return
+            
+            # Load recorder files into the database, if it reads them from
+            # there (see sqliteDB).
+            if hasattr(self.dbObj, 'importRecorders'):
+                self.dbObj.importRecorders(self.fileTables)
+            
+            # Make sure GridLAB-D used the typed tables, once.
+            if (getattr(self.dbObj, 'typedTables', False)
+                    and self.recorderTables
+                    and not self.dbObj.typedVerified):
+                self.dbObj.verifyRecorderTables(list(self.recorderTables))
+            
+            # Update tap/cap states and change counts if necessary.
+            self.update()
+            
+            # Leave evaluation to the population if batching.
+            if batchEval and hasattr(self.dbObj, 'costAggregates'):
+                self.pendingEval = True
+                self.evalKey = key
+                return
+            
+            # Evaluate costs.
+            self.evalFitness(costs=costs)
+            
+        if simCache is not None:
+            simCache.put(key, self.cacheEntry())
+            
+    def evalFromAggregates(self, aggregates, costs, simCache=None):
+        """Evaluate the fitness of an individual left pending by
+        writeRunUpdateEval, given the output of db.costAggregates (read for
+        many individuals at once with db.batchCostAggregates). Results are
+        put in the simCache if it's given.
+        """
+        self.pendingEval = False
+        self.costInputs = gld.inputsFromAggregates(aggregates)
+        self.costs = \
+            gld.costsFromInputs(inputs=self.costInputs,
+                                tapChangeCount=self.tapChangeCount,
+                                capSwitchCount=self.capSwitchCount,
+                                costs=costs)
+        
+        if (simCache is not None) and (self.evalKey is not None):
+            simCache.put(self.evalKey, self.cacheEntry())
+            
+    def fromCache(self, simCache, key, costs):
+        """Helper to use results from simCache if they're there. Returns
+        True on a hit.
+        """
+        entry = simCache.get(key)
+        if entry is None:
+            return False
+        
+        self.useCacheEntry(entry=entry, costs=costs)
+        return True
+
+def phaseStates(d):
+    """Helper to pull the 'newState' for each phase out of a reg or cap
+    dictionary (see gld module docstring). Returns {name: {phase: state}}
+    """
+    return {name: {phase: p['newState'] for phase, p in v['phases'].items()}
+            for name, v in d.items()}
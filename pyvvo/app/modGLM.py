@@ -14,7 +14,9 @@ import re
 import os
 import helper
 import csv
-import copy
+import json
+import hashlib
+import glmParser
 
 # Time formatting:
 TIME_FMT = "%Y-%m-%d %H:%M:%S"
@@ -32,12 +34,14 @@ METER_REGEX = re.compile(r'\bobject\b(\s+)\bmeter\b')
 SUBSTATION_REGEX = re.compile(r'\bobject\b(\s+)\bsubstation\b')
 PROFILER_REGEX = re.compile(r'#(\s*)\bset\b(\s+)\bprofiler\b(\s*)=(\s*)[01]')
 SUPPRESS_REGEX = re.compile(r'#(\s*)\bset\b(\s+)\bsuppress_repeat_messages\b(\s*)=(\s*)[01]')
+THREAD_COUNT_REGEX = re.compile(r'#(\s*)\bset\b(\s+)\bthread_count\b(\s*)=(\s*)\d+')
 POWERFLOW_REGEX = re.compile((r'\bmodule\b(\s+)\bpowerflow\b'))
 CONTROL_REGEX = re.compile(r'(?<=(c|C)ontrol(\s))(\s*)(m|M)(a|A)(n|N)(u|U)(a|A)(l|L)(\s*);(\s*)//')
 COMMENT_REGEX = re.compile(r'(\S+);')
 TRIPLEX_LOAD_REGEX = re.compile(r'\bobject\b(\s+)\btriplex_load\b')
 TRIPLEX_METER_REGEX = re.compile(r'\bobject\b(\s+)\btriplex_meter\b')
 TRIPLEX_LOAD_OR_METER = re.compile(r'\bobject\b(\s+)((\btriplex_load\b)|(\btriplex_meter\b))')
+BRACE_REGEX = re.compile(r'[{}]')
 OBJEND_REGEX = re.compile(r'(\s*)}(\s*)(;*)$')
 VOLTDUMP_REGEX = re.compile(r'\bobject\b(\s+)\bvoltdump\b')
 HOUSE_REGEX = re.compile(r'\bobject\b(\s+)\bhouse\b')
@@ -45,15 +49,82 @@ GROUP_RECORDER_REGEX = re.compile(r'\bobject\b(\s+)\bgroup_recorder\b')
 OBJY_BY_NAME = r'\bname\b(\s+)("?){}("?)(\s*);'
 VOLT_VAR_REGEX = re.compile(r'\bobject\b(\s+)\bvolt_var_control\b')
 FROM_REGEX = r'\bfrom\b(\s+)("?){}("?)(\s*);'
+# Powerflow objects which are nodes, i.e. have voltages solved for.
+POWERFLOW_NODE_REGEX = re.compile(r'\bobject\b(\s+)(powerflow\.)?\b(node|meter|load|capacitor|substation|pqload|triplex_node|triplex_meter|triplex_load)\b')
+# Voltage properties for each phase of nodes, and of triplex nodes.
+NODE_VOLTAGES = ('voltage_A', 'voltage_B', 'voltage_C')
+TRIPLEX_VOLTAGES = ('voltage_1', 'voltage_2', 'voltage_N')
 # Expression below doesn't work since it can match multiple objects at once...
 # OBJ_BY_TYPE_NAME = r'\bobject\b(\s+)\b{}\b(.+?)\bname\b(\s+)("?){}("?)(\s*);' # Use with re.DOTALL
 
+# Cache of compiled regular expressions for object types.
+_OBJ_REGEX_CACHE = {}
+
+def getObjRegEx(objType):
+    """Get compiled regular expression to find the start of an object of the
+    given type, e.g. 'object capacitor'
+    """
+    try:
+        return _OBJ_REGEX_CACHE[objType]
+    except KeyError:
+        exp = re.compile(r'\bobject\b(\s+)\b' + re.escape(objType) + r'\b')
+        _OBJ_REGEX_CACHE[objType] = exp
+        return exp
+
+# Files in a setupModel cache directory are named <key>.glm and <key>.json
+SETUP_CACHE_EXT = ('.glm', '.json')
+
+# Hash of this module's source, computed on first use by _sourceHash.
+_SOURCE_HASH = None
+
+def _sourceHash():
+    """Hash of this module's source code. Used in setupModel cache keys so
+    cached models are rebuilt when the setup code changes.
+    """
+    global _SOURCE_HASH
+    if _SOURCE_HASH is None:
+        with open(os.path.abspath(__file__), 'rb') as f:
+            _SOURCE_HASH = hashlib.sha256(f.read()).hexdigest()
+    return _SOURCE_HASH
+
 def readModel(modelIn):
     '''Simple function to read file as string'''
     with open(modelIn, 'r') as f:
         s = f.read()
     return s
 
+def readVoltDump(path):
+    """Read a voltdump file (see modGLM.addVoltDump) written in
+    rectangular mode.
+    
+    OUTPUT: dict mapping node names to a tuple of complex voltages for
+        phases A, B, and C (1, 2, and N for triplex nodes).
+    """
+    out = {}
+    with open(path, 'r') as f:
+        for line in f:
+            # Skip the comment line.
+            if line.startswith('#'):
+                continue
+            
+            parts = line.strip().split(',')
+            
+            # Check the header for the mode.
+            if parts[0] == 'node_name':
+                if 'voltA_real' not in parts:
+                    raise UserWarning(('{} is not in rectangular '
+                                       + 'mode.').format(path))
+                continue
+            
+            if len(parts) < 7:
+                continue
+            
+            v = [float(x) for x in parts[1:7]]
+            out[parts[0]] = (complex(v[0], v[1]), complex(v[2], v[3]),
+                             complex(v[4], v[5]))
+            
+    return out
+
 class modGLM:
     """"Class for reading GridLAB-D model and changing it.
     
@@ -61,7 +132,8 @@ class modGLM:
             mysql connection, swing recorder
     """
     
-    def __init__(self, strModel='', pathModelOut='', pathModelIn=''):
+    def __init__(self, strModel='', pathModelOut='', pathModelIn='',
+                 objIndex=None):
         """"Initialize class with input/output GridLAB-D models
         
         strModel should be a string representing a GridLAB-D model.
@@ -69,7 +141,29 @@ class modGLM:
             It will be modified to send new commands.
             
         pathModelOut is the path to the new output model.
+        
+        NOTE: The model can be held as a string (strModel) or as a parsed
+            tree (tree, see glmParser). Accessing one converts from the
+            other if necessary, so string based and tree based methods can be
+            mixed freely. Conversion costs a full pass over the model, so
+            group tree based edits together when possible.
+
+            The tree is opt-in: nothing in the GA uses it. An individual
+            only edits its regulators and capacitors, which the string
+            methods find with objIndex (see setupModel) without a pass over
+            the model, while the tree costs a full parse and serialize for
+            every individual (about 3x slower on a 20,000 object feeder).
+            Use it for tools which make many edits to one model.
+            
+        objIndex is an optional dictionary mapping object names to
+            (type, start, end) as returned by glmParser.glmModel.objectIndex.
+            It's used to find objects by name without searching strModel. It
+            must match strModel exactly - setupModel produces one when
+            caching. The index is kept up to date by replaceObject and
+            dropped by any other change to the model.
         """
+        # The tree is only created when it's asked for.
+        self._tree = None
 
         # If strModel is defined, simply set it. Otherwise, read the path in.
         if strModel:
@@ -78,9 +172,51 @@ class modGLM:
         else:
             self.strModel = readModel(pathModelIn)
             
+        # The strModel setter clears the index, so set it afterwards. Copy
+        # since replaceObject updates it.
+        if objIndex:
+            self.objIndex = dict(objIndex)
+            
         self.pathModelIn = pathModelIn
         self.pathModelOut = pathModelOut
         
+    @property
+    def strModel(self):
+        """The model as a string. If the model is currently held as a tree,
+        it gets serialized.
+        """
+        if self._tree is not None:
+            self._strModel = self._tree.serialize()
+            self._tree = None
+            # The tree may have been edited.
+            self.objIndex = None
+            
+        return self._strModel
+    
+    @strModel.setter
+    def strModel(self, s):
+        self._strModel = s
+        self._tree = None
+        # Any change to the model invalidates the object index.
+        self.objIndex = None
+        
+    @property
+    def tree(self):
+        """The model as a glmParser.glmModel. If the model is currently held
+        as a string, it gets parsed. Edits to the tree are picked up the next
+        time strModel is accessed.
+        """
+        if self._tree is None:
+            self._tree = glmParser.parse(self._strModel)
+            self._strModel = None
+            
+        return self._tree
+    
+    @property
+    def treeMode(self):
+        """True if the model is currently held as a tree."""
+        return self._tree is not None
+        
     def writeModel(self):
         """"Simple method to write strModel to file"""
         with open(self.pathModelOut, 'w') as f:
@@ -95,14 +231,6 @@ class modGLM:
         """
         # Loop through regulators
         for r in reg:
-            # Find regulator by name.
-            d = self.extractObjectByNameAndType(name=r, objRegEx=REGOBJ_REGEX,
-                                                minLength=\
-                                                    len('object regulator'))
-            
-            # Extract its configuration
-            c = self.extractProperties(d['obj'], ['configuration'])
-            
             # Loop through phases and add to property dictionary.
             regPropDict = {}
             confPropDict = {}
@@ -119,11 +247,11 @@ class modGLM:
                 regPropDict['tap_' + p] = reg[r]['phases'][p][state]
                 confPropDict['tap_pos_' + p] = reg[r]['phases'][p][state]
                 
-            # Modify the object's properties.
-            d['obj'] = self.modObjProps(objStr=d['obj'], propDict=regPropDict)
-            
-            # Splice in the modified object.
-            self.replaceObject(d)
+            # Modify the regulator's properties, and extract its
+            # configuration.
+            c = self.modObjPropsByName(name=r, objType='regulator',
+                                       propDict=regPropDict,
+                                       getProps=['configuration'])
             
             # If we're given a control mode, use it.
             try:
@@ -132,24 +260,39 @@ class modGLM:
                 # If we don't have 'Control', nothing to do.
                 pass
             
-            # Extract the configuration.
-            d2 = self.extractObjectByNameAndType(name=\
-                                                    c['configuration']['prop'],
-                                                 objRegEx=REGCONF_REGEX,
-                                                 minLength=len(
-                                                                ('object '
-                                                                'regulator_'
-                                                                'configuration'
-                                                                )
-                                                               )
-                                                 )
-
-            # Modify its properties.
-            d2['obj'] = self.modObjProps(objStr=d2['obj'],
-                                         propDict=confPropDict)
+            # Modify the configuration's properties.
+            self.modObjPropsByName(name=c['configuration'],
+                                   objType='regulator_configuration',
+                                   propDict=confPropDict)
+        
+    def regulatorConfigs(self, regNames):
+        """Function to get the configuration names for regulators.
+        
+        INPUT: iterable of regulator names
+        
+        OUTPUT: dict mapping regulator names to configuration names.
+        """
+        out = {}
+        for r in regNames:
+            if self.treeMode:
+                obj = self.tree.findByName(r, objType='regulator')
+                if obj is None:
+                    raise ObjNotFoundError(obj=r, model=self.pathModelIn)
+                c = obj.getProp('configuration')
+                if c is None:
+                    raise PropNotInObjError(obj=obj.serialize(),
+                                            prop='configuration',
+                                            model=self.pathModelIn)
+            else:
+                d = self.extractObjectByNameAndType(name=r,
+                                                    objRegEx=REGOBJ_REGEX)
+                c = self.extractProperties(d['obj'],
+                                           ['configuration'])
+                c = c['configuration']['prop']
+            
+            out[r] = c
             
-            # Splice in the modified object.
-            self.replaceObject(d2)
+        return out
         
     def commandCapacitors(self, cap):
         """"Function to change state of capacitors.
@@ -161,11 +304,6 @@ class modGLM:
         
         # Loop through the capacitors
         for c in cap:
-            # Find the object by name
-            d = self.extractObjectByNameAndType(name=c, objRegEx=CAP_REGEX,
-                                                minLength=\
-                                                    len('object capacitor'))
-            
             # Loop through phases and add to property dictionary.
             propDict = {}
             for p in cap[c]['phases']:
@@ -184,10 +322,8 @@ class modGLM:
                 propDict['control'] = cap[c]['control']
                   
             # Modify the object's properties.
-            d['obj'] = self.modObjProps(objStr=d['obj'], propDict=propDict)
-            
-            # Splice in the modified object.
-            self.replaceObject(d)
+            self.modObjPropsByName(name=c, objType='capacitor',
+                                   propDict=propDict)
             
     def updateClock(self, starttime=None, stoptime=None, timezone=None):
         """Function to set model time. If there's no clock object, it will be
@@ -352,6 +488,15 @@ class modGLM:
             
         self.strModel = dbStr + '}\n' + self.strModel
         
+    def updateDatabase(self, propDict):
+        """Modify the properties of the model's database object(s), e.g.
+        {'on_init': '"script.sql"'} to run an SQL script when GridLAB-D
+        connects. Returns the number of database objects modified.
+        """
+        return self.transformObjects(
+            objRegEx=getObjRegEx('database'),
+            func=lambda obj: self.modObjDict(obj, propDict))
+        
     def addClass(self, className, properties):
         """Method to add a custom class to the beginning of a .gld model
         
@@ -484,6 +629,21 @@ class modGLM:
             self.strModel = ('#set profiler={}'.format(val) + '\n'
                              + self.strModel)
         
+    def setThreadCount(self, val=1):
+        """Method to set the number of threads GridLAB-D uses to solve the
+        model (the 'thread_count' global). 0 means use all cores.
+        """
+        line = '#set thread_count={}'.format(val)
+        # See if the model has the thread count set already
+        m = THREAD_COUNT_REGEX.search(self.strModel)
+        if m:
+            # Replace the existing setting.
+            self.strModel = (self.strModel[0:m.start()] + line
+                             + self.strModel[m.end():])
+        else:
+            # Add to beginning of model.
+            self.strModel = line + '\n' + self.strModel
+        
     def findSwing(self):
         """Method to find the name of the swing bus.
         
@@ -616,41 +776,29 @@ class modGLM:
                 names. Only objects with their name in the list will be
                 modified.
         """
-        # Make a copy of the list, since we'll be removing items as we go.
-        nameListC = copy.copy(nameList)
-        
-        # Get the first match.
-        m = objectRegex.search(self.strModel)
+        # Put the names in a set for fast lookups. Names are removed as
+        # they're used, so only the first object with a given name is tagged.
+        if nameList is not None:
+            nameSet = set(nameList)
         
-        # Loop over all the matches
-        while m:
-            # Extract the object
-            obj = self.extractObject(objMatch=m)
-            
+        def addGroup(obj):
             if nameList is not None:
                 # Extract the name
-                n = self.extractProperties(obj['obj'], ['name'])
+                n = self.extractProperties(obj['obj'], ['name'])['name']['prop']
                 
-                try:
-                    # Remove the name from our list.
-                    nameListC.remove(n['name']['prop'])
-                except ValueError:
-                    # Name not in the list. Get the next object match and carry
-                    # on.
-                    m = objectRegex.search(self.strModel, 
-                                           m.span()[0] + len(obj['obj']))
-                    continue
+                if n not in nameSet:
+                    # Name not in the list, leave the object alone.
+                    return None
+                
+                nameSet.remove(n)
             
             # Add a groupid.
             obj['obj'] = self.modObjProps(obj['obj'], {'groupid': groupName})
-            
-            # Replace the previous object with the new one.
-            self.replaceObject(obj)
-            
-            # Get the next match, offsetting by length of new object.
-            m = objectRegex.search(self.strModel,
-                                   m.span()[0] + len(obj['obj']))
-    
+            return obj
+        
+        # Modify all the objects in one pass.
+        self.transformObjects(objRegEx=objectRegex, func=addGroup)
+        
     def recordTriplex(self, suffix, interval=60):
         """Method to add a recorder for each 'triplex_load' object.
         
@@ -769,6 +917,34 @@ class modGLM:
             
         self.strModel = self.strModel + recorder + '}'
         
+    def addTapeRecorder(self, parent, propList, interval, file, limit=-1):
+        """Method to add a recorder object from the tape module. Output is a
+        CSV file with a timestamp column and a column for each property.
+
+        NOTE: The tape module must be in the model (see checkForModule and
+            addModule).
+
+        INPUTS:
+            parent: name of object to record
+            propList: list of properties to record. Ex: ['power_A',
+                'power_B', 'power_C']
+            interval: interval to record (s)
+            file: name of output file
+            limit: Maximum number of rows. Negative means no limit.
+        """
+        recorder = ('\n'
+                    'object tape.recorder {{\n'
+                    '  parent {parent};\n'
+                    '  property {propList};\n'
+                    '  interval {interval};\n'
+                    '  file "{file}";\n'
+                    '  limit {limit};\n'
+                    ).format(parent=parent,
+                             propList=('"' + ','.join(propList) + '"'),
+                             interval=interval, file=file, limit=limit)
+
+        self.strModel += recorder + '}'
+
     def addTapeGroup_Recorder(self, group, prop, interval, file,
                               limit=-1, complex_part=None):
         """Method to add a group_recorder object from the tape module.
@@ -852,8 +1028,40 @@ class modGLM:
             
         OUTPUS: directly modifies self.strModel to replace object with new one
         """
+        # Shift the object index (if we have one) to account for the new
+        # object length.
+        idx = None
+        if self.objIndex:
+            idx = self.shiftIndex(objIndex=self.objIndex,
+                                  start=objDict['start'], end=objDict['end'],
+                                  delta=(len(objDict['obj'])
+                                         - (objDict['end'] - objDict['start']))
+                                  )
+            
         self.strModel = (self.strModel[0:objDict['start']] + objDict['obj']
                          + self.strModel[objDict['end']:])
+        
+        self.objIndex = idx
+        
+    @staticmethod
+    def shiftIndex(objIndex, start, end, delta):
+        """Update an object index after the text between start and end
+        changes length by delta. Objects after the change are moved, objects
+        containing the change are stretched, and objects overlapping the
+        change (e.g. nested objects) are dropped.
+        
+        OUTPUT: new index dictionary.
+        """
+        out = {}
+        for n, (t, s, e) in objIndex.items():
+            if s >= end:
+                out[n] = (t, s + delta, e + delta)
+            elif e <= start:
+                out[n] = (t, s, e)
+            elif (s <= start) and (e >= end):
+                out[n] = (t, s, e + delta)
+        
+        return out
                                 
     @staticmethod
     def modObjProps(objStr, propDict):
@@ -875,6 +1083,57 @@ class modGLM:
         # Return the modified object
         return objStr
     
+    def modObjPropsByName(self, name, objType, propDict, getProps=()):
+        """Function to modify the properties of an object given its name and
+        type. This works on the tree if the model is held as a tree, and on
+        the string otherwise.
+        
+        INPUTS:
+            name: name of the object.
+            objType: type of the object, e.g. 'capacitor'
+            propDict: dictionary of properties to modify/create.
+            getProps: list of properties to extract from the object BEFORE
+                it's modified.
+                
+        OUTPUT: dict mapping each element of getProps to its value
+        """
+        out = {}
+        
+        if self.treeMode:
+            # Look the object up in the tree's index.
+            obj = self.tree.findByName(name, objType=objType)
+            if obj is None:
+                raise ObjNotFoundError(obj=name, model=self.pathModelIn)
+            
+            # Extract the requested properties.
+            for p in getProps:
+                v = obj.getProp(p)
+                if v is None:
+                    raise PropNotInObjError(obj=obj.serialize(), prop=p,
+                                            model=self.pathModelIn)
+                out[p] = v
+            
+            # Modify.
+            obj.setProps(propDict)
+        else:
+            # Find the object in the string.
+            objStr = 'object ' + objType
+            d = self.extractObjectByNameAndType(name=name,
+                                                objRegEx=getObjRegEx(objType),
+                                                minLength=len(objStr))
+            
+            # Extract the requested properties.
+            if getProps:
+                props = self.extractProperties(d['obj'], getProps)
+                for p in props:
+                    out[p] = props[p]['prop']
+            
+            # Modify the object and splice it back in.
+            d['obj'] = self.modObjProps(objStr=d['obj'], propDict=propDict)
+            self.replaceObject(d)
+            
+        return out
+    
     def extractObjectByNameAndType(self, *, name, objRegEx, minLength=1):
         """Function to extract a GridLAB-D object given its name and type.
             Nested objects will be included.
@@ -886,6 +1145,13 @@ class modGLM:
             minLength: minimum possible match length of the objRegEx. This
                 will save a few iterations - not critical.
         """
+        # Try the object index first. Confirm the object type with the
+        # regular expression in case the index is off.
+        if self.objIndex and (name in self.objIndex):
+            _, s, e = self.objIndex[name]
+            if objRegEx.match(self.strModel, s):
+                return {'start': s, 'end': e, 'obj': self.strModel[s:e]}
+            
         # Find the name line.
         m = re.search(OBJY_BY_NAME.format(name), self.strModel)
         
@@ -942,31 +1208,85 @@ class modGLM:
         elif startInd is None:
             assert False, "If objMatch is not provided, startInd must be."
         
-        # Initialize the ending index (to be incremented in loop).
-        endInd = startInd
+        # Grab the model once, since strModel may be a property.
+        strModel = self.strModel
+        
+        # If the braces never balance, the object runs to the end.
+        endInd = len(strModel)
         # Initialize counter for braces (to avoid problems with nested objects)
         braceCount = 0
         
-        for c in self.strModel[startInd:]:
-            # Increment the index
-            endInd += 1
-            
+        # Jump from brace to brace rather than looping over every character.
+        for m in BRACE_REGEX.finditer(strModel, startInd):
             # To avoid troubles with nested objects, keep track of braces
-            if c == '{':
+            if m.group() == '{':
                 braceCount += 1
-            elif c == '}':
+            else:
                 braceCount -= 1
                 
-            # Break loop if c is a closing curly brace. Since the index is
-            # incremented first, we ensure the closing bracket is included.
-            if c == '}' and braceCount == 0:
-                break
+                # Break loop if this closing brace balances the object. Use
+                # the end of the match so the closing bracket is included.
+                if braceCount == 0:
+                    endInd = m.end()
+                    break
             
         # We now know the range of this object. Extract it.
-        objStr = self.strModel[startInd:endInd]
+        objStr = strModel[startInd:endInd]
         out = {'start':startInd, 'end':endInd, 'obj':objStr}
         return out
     
+    def transformObjects(self, objRegEx, func):
+        """Function to modify or remove all objects which match a regular
+        expression in a single pass over the model. The new model string is
+        only built once, rather than once per modified object.
+        
+        INPUTS:
+            objRegEx: compiled regular expression for the start of the
+                objects, e.g. TRIPLEX_METER_REGEX
+            func: function which takes an object dictionary (as returned by
+                extractObject) and returns None to leave the object alone,
+                or the dictionary with 'obj' modified. 'end' may be
+                increased to replace more of the model (e.g. a trailing
+                semi-colon), and an empty 'obj' removes the object.
+                
+        OUTPUT: number of objects modified.
+        
+        NOTE: Objects nested within a matching object are not matched
+            themselves.
+        """
+        # Grab the model once.
+        strModel = self.strModel
+        
+        # Pieces of the new model, and position in the old one.
+        pieces = []
+        pos = 0
+        count = 0
+        
+        # Loop over all the matches
+        m = objRegEx.search(strModel)
+        while m:
+            # Extract the object and run the function on it.
+            obj = self.extractObject(objMatch=m)
+            newObj = func(obj)
+            
+            if newObj is not None:
+                # Keep everything from the last object to this one, and the
+                # new object.
+                pieces.append(strModel[pos:newObj['start']])
+                pieces.append(newObj['obj'])
+                pos = newObj['end']
+                count += 1
+                
+            # Get the next match.
+            m = objRegEx.search(strModel, max(obj['end'], pos))
+            
+        # Only build a new model if something changed.
+        if count:
+            pieces.append(strModel[pos:])
+            self.strModel = ''.join(pieces)
+            
+        return count
+    
     @staticmethod
     def extractProperties(objString, props):
         """"Function to extract properties from a string of an object.
@@ -1025,16 +1345,117 @@ class modGLM:
     def setupModel(self, starttime=None, stoptime=None, timezone=None,
                    vSource=None, playerFile=None, database=None,
                    profiler=0, triplexGroup=None, triplexList=None,
-                   powerflowFlag=False):
+                   powerflowFlag=False, cacheDir=None,
+                   threadCount=None):
         """Function to add the basics to get a running model. Designed with 
         the output from Tom McDermott's CIM exporter in mind.
         
         NOTE: most of these functions tack lines onto the beginning of the
             file. That's why things might feel like they're in reverse order.
             
+        cacheDir: optional directory for caching the result. The cache key
+            is a hash of the input model, the other inputs, and this module's
+            source code. On a hit, strModel and objIndex are loaded from the
+            cache and nothing else is done. On a miss, the model is set up as
+            usual and saved to the cache along with its object index.
+            
+        threadCount: if not None, number of threads GridLAB-D should use for
+            the model. See setThreadCount and benchmark.autotune.
+            
         TODO: Document inputs when this is done. Database inputs are going to
             need to be added.
         """
+        # Collect the inputs which define the output model.
+        setupArgs = {'starttime': starttime, 'stoptime': stoptime,
+                     'timezone': timezone, 'vSource': vSource,
+                     'playerFile': playerFile, 'database': database,
+                     'profiler': profiler, 'triplexGroup': triplexGroup,
+                     'triplexList': triplexList,
+                     'powerflowFlag': powerflowFlag,
+                     'threadCount': threadCount}
+        
+        if not cacheDir:
+            return self._setupModel(**setupArgs)
+        
+        # Check the cache.
+        key = self.setupCacheKey(setupArgs)
+        swingMeterName = self.loadSetupCache(cacheDir=cacheDir, key=key)
+        if swingMeterName is not None:
+            return swingMeterName
+        
+        # Not cached. Setup the model and save it.
+        swingMeterName = self._setupModel(**setupArgs)
+        self.saveSetupCache(cacheDir=cacheDir, key=key,
+                            swingMeterName=swingMeterName)
+        
+        return swingMeterName
+    
+    def setupCacheKey(self, setupArgs):
+        """Compute the setupModel cache key for the current model and the
+        given dictionary of setupModel inputs.
+        """
+        h = hashlib.sha256()
+        h.update(_sourceHash().encode())
+        h.update(json.dumps(setupArgs, sort_keys=True, default=str).encode())
+        h.update(self.strModel.encode())
+        return h.hexdigest()
+    
+    def loadSetupCache(self, cacheDir, key):
+        """Load a cached setupModel result into strModel and objIndex.
+        
+        OUTPUT: the swing meter name, or None if the key isn't cached.
+        """
+        glmPath, jsonPath = (os.path.join(cacheDir, key + ext)
+                             for ext in SETUP_CACHE_EXT)
+        try:
+            with open(jsonPath, 'r') as f:
+                info = json.load(f)
+            strModel = readModel(glmPath)
+        except (OSError, ValueError):
+            # Missing or broken cache files are simply a miss.
+            return None
+        
+        self.strModel = strModel
+        self.objIndex = {n: tuple(v) for n, v in info['objIndex'].items()}
+        return info['swingMeterName']
+    
+    def saveSetupCache(self, cacheDir, key, swingMeterName):
+        """Build the object index for strModel and save both to the cache.
+        Files are written to temporary names and then renamed, so a crash
+        can't leave a partial cache entry behind.
+        """
+        os.makedirs(cacheDir, exist_ok=True)
+        
+        strModel = self.strModel
+        objIndex = glmParser.parse(strModel).objectIndex()
+        
+        glmPath, jsonPath = (os.path.join(cacheDir, key + ext)
+                             for ext in SETUP_CACHE_EXT)
+        
+        # Write the model first - the .json file marks a complete entry.
+        with open(glmPath + '.tmp', 'w') as f:
+            f.write(strModel)
+        os.replace(glmPath + '.tmp', glmPath)
+        
+        with open(jsonPath + '.tmp', 'w') as f:
+            json.dump({'swingMeterName': swingMeterName,
+                       'objIndex': objIndex}, f)
+        os.replace(jsonPath + '.tmp', jsonPath)
+        
+        self.objIndex = objIndex
+        
+    @staticmethod
+    def modObjDict(obj, propDict):
+        """Helper to run modObjProps on an object dictionary (as returned
+        by extractObject). Returns the dictionary.
+        """
+        obj['obj'] = modGLM.modObjProps(objStr=obj['obj'], propDict=propDict)
+        return obj
+    
+    def _setupModel(self, starttime, stoptime, timezone, vSource, playerFile,
+                    database, profiler, triplexGroup, triplexList,
+                    powerflowFlag, threadCount):
+        """Helper for setupModel which does the actual work."""
         # Relax naming rules
         self.addLine(line='#set relax_naming_rules=1')
         
@@ -1072,6 +1493,9 @@ class modGLM:
         self.repeatMessages()
         # Set profiler.
         self.toggleProfile(profiler)
+        # Set thread count.
+        if threadCount is not None:
+            self.setThreadCount(threadCount)
         
         # Update the clock (add if it doesn't exist).
         if starttime or stoptime or timezone:
@@ -1182,6 +1606,66 @@ class modGLM:
             m = TRIPLEX_METER_REGEX.search(self.strModel,
                                           m.span()[0] + len(tObj['obj']))
     
+    def addVoltDump(self, filename, group=None):
+        """Add a voltdump object, which writes the voltage of every node
+        (or every node in the group) in rectangular mode when the simulation
+        ends. See readVoltDump.
+        """
+        properties = {'filename': '"{}"'.format(filename)}
+        if group is not None:
+            properties['group'] = group
+            
+        self.addObject(objType='voltdump', properties=properties,
+                       place='end')
+        
+    def warmStart(self, voltages):
+        """Set the initial voltages of nodes, e.g. to a previous powerflow
+        solution from readVoltDump, so Newton-Raphson starts close to the
+        answer and needs fewer iterations.
+        
+        The swing node is left alone, as are phases with zero voltage (not
+        present) and nodes not in voltages.
+        
+        INPUTS:
+            voltages: dict mapping node names to a tuple of complex voltages
+                for phases A, B, and C (1, 2, and N for triplex nodes).
+                
+        OUTPUT: number of nodes modified.
+        
+        NOTE: Nodes nested within other nodes are not modified (see
+            transformObjects).
+        """
+        def setVoltages(obj):
+            # Leave the swing node alone.
+            if SWING_REGEX.search(obj['obj']):
+                return None
+            
+            try:
+                name = self.extractProperties(obj['obj'], ['name'])
+            except PropNotInObjError:
+                return None
+            
+            v = voltages.get(name['name']['prop'])
+            if v is None:
+                return None
+            
+            # Triplex nodes use different properties.
+            if 'triplex' in obj['obj'][:obj['obj'].index('{')]:
+                props = TRIPLEX_VOLTAGES
+            else:
+                props = NODE_VOLTAGES
+                
+            propDict = {p: '{:+.6f}{:+.6f}j'.format(x.real, x.imag)
+                        for p, x in zip(props, v) if x != 0}
+            if not propDict:
+                return None
+            
+            obj['obj'] = self.modObjProps(obj['obj'], propDict)
+            return obj
+        
+        return self.transformObjects(objRegEx=POWERFLOW_NODE_REGEX,
+                                     func=setVoltages)
+            
     '''
     def addVoltDumps(self, num, group, mode='polar', outDir=None):
         """Function to add voltage dumps for a given group, times, and interval
@@ -1251,34 +1735,30 @@ class modGLM:
         INPUTS:
             typeList: list of strings containing object types to remove
         """
+        if not typeList:
+            return
         
-        # Loop over each type
-        for t in typeList:
-            # Construct regular expression to find the beginning of this type
-            exp = re.compile(r'\b' + objStr + r'\b(\s+)\b' + t + r'\b')
-            
-            # Find the first object
-            m = exp.search(self.strModel)
+        # Construct one regular expression to find the beginning of any of
+        # the types.
+        exp = re.compile(r'\b' + objStr + r'\b(\s+)\b(?:'
+                         + '|'.join(re.escape(t) for t in typeList) + r')\b')
+        
+        strModel = self.strModel
+        
+        def remove(obj):
+            # Replace the object string with the empty string
+            obj['obj'] = ''
             
-            # Loop over all matches and eliminate the objects.
-            while m:
-                # Extract the object
-                obj = self.extractObject(objMatch=m)
-                
-                # Replace the object string with the empty string
-                obj['obj'] = ''
+            # Check to see if the object ends with a semi-colon. If so,
+            # make sure it's included for removal
+            if strModel[obj['end']:obj['end']+1] == ';':
+                # Increment ending index so semi-colon gets removed.
+                obj['end'] += 1
                 
-                # Check to see if the object ends with a semi-colon. If so,
-                # make sure it's included for removal
-                if self.strModel[obj['end']] == ';':
-                    # Increment ending index so semi-colon gets removed.
-                    obj['end'] += 1
-                
-                # Eliminate the object from the model
-                self.replaceObject(obj)
-                
-                # Find the next match
-                m = exp.search(self.strModel)
+            return obj
+        
+        # Eliminate all the objects in one pass.
+        self.transformObjects(objRegEx=exp, func=remove)
                 
     def addVVO(self, starttime):
         """Very hard-coded function to add a volt_var_control object to the 
@@ -1396,9 +1876,27 @@ class modGLM:
                     + str(t['hour']) + '.csv')
             
         
+        # Load the coefficients for all the meters.
+        zipDict = self.readZIP(file=file)
+        
+        # Apply them in a single pass over the model.
+        self.applyZIP(zipDict=zipDict)
+        
+    @staticmethod
+    def readZIP(file):
+        """Function to read a ZIP coefficient .csv file into a dictionary.
+        
+        INPUTS:
+            file: path to .csv file. See addZIP.
+            
+        OUTPUT: dict mapping meter names to dictionaries of ZIP properties
+            (suitable for modObjProps).
+        """
         # Hard code phase information
         phase = '_12'
         
+        zipDict = {}
+        
         # Get a .csv reader
         with open(file, newline='') as f:
             r = csv.reader(f, delimiter=',')
@@ -1428,21 +1926,50 @@ class modGLM:
                     propDict[(headers[ind].lstrip() + phase)] = \
                         row[ind].lstrip()
                     
-                # Extract the triplex_meter object by name
-                tObj = \
-                    self.extractObjectByNameAndType(name=name,
-                                                    objRegEx=TRIPLEX_LOAD_OR_METER)
-                    
-                # Replace the object's type
-                tObj['obj'] = re.sub(TRIPLEX_METER_REGEX,
-                                     'object triplex_load', tObj['obj'])
+                zipDict[name] = propDict
                 
-                # Add the ZIP properties
-                tObj['obj'] = self.modObjProps(objStr=tObj['obj'],
-                                               propDict=propDict)
-                
-                # Splice in the new object
-                self.replaceObject(objDict=tObj)
+        return zipDict
+    
+    def applyZIP(self, zipDict):
+        """Function to turn triplex_meters into triplex_loads with ZIP
+        properties, in a single pass over the model.
+        
+        INPUTS:
+            zipDict: dictionary as returned by readZIP. Objects of type
+                triplex_meter or triplex_load with names in the dictionary
+                get modified.
+        """
+        # Track which names we've found.
+        found = set()
+        
+        def zipObj(obj):
+            # Extract the name, and skip objects we don't have ZIP data for.
+            try:
+                name = self.extractProperties(obj['obj'],
+                                              ['name'])['name']['prop']
+            except PropNotInObjError:
+                return None
+            
+            if name not in zipDict:
+                return None
+            
+            found.add(name)
+            
+            # Replace the object's type
+            obj['obj'] = re.sub(TRIPLEX_METER_REGEX, 'object triplex_load',
+                                obj['obj'])
+            
+            # Add the ZIP properties
+            obj['obj'] = self.modObjProps(objStr=obj['obj'],
+                                          propDict=zipDict[name])
+            return obj
+            
+        self.transformObjects(objRegEx=TRIPLEX_LOAD_OR_METER, func=zipObj)
+        
+        # Every meter in the ZIP file should be in the model.
+        for name in zipDict:
+            if name not in found:
+                raise ObjNotFoundError(obj=name, model=self.pathModelIn)
         
     def checkForModule(self, module):
         """Simple function to check if a module is in a model. Returns None if
@@ -17,6 +17,12 @@ import logging
 from individual import individual, CAPSTATUS
 import populationManager
 import helper
+import modGLM
+import gld
+import gldServer
+import gldProfile
+import glmParser
+import constants
 
 class population:
 
@@ -34,7 +40,9 @@ class population:
                  baseControlFlag=None,
                  randomSeed=None,
                  gldInstall=None,
-                 log=None):
+                 log=None, objIndex=None, serverConfig=None,
+                 simCache=None, runLimits=None, affinity=None,
+                 workDir=None, warmStart=False, batchEval=False):
         """Initialize a population of individuals.
         
         INPUTS:
@@ -88,6 +96,30 @@ class population:
                     to the necessary lib folder on Linux (/usr/local/mysql/lib)
             log: logging.Logger instance. If none, a simple default log will 
                 be used.
+            objIndex: object index for strModel, see modGLM.modGLM.__init__
+            serverConfig: optional dict for running individuals on warm
+                GridLAB-D servers (see gldServer). Fields:
+                - 'ENABLED': True to use servers.
+                - 'SERVERS': number of servers. Use more than
+                    numModelThreads so servers can restart in the background.
+                - 'BASE-PORT': port of the first server.
+                - 'READY-TIMEOUT': seconds to wait for a server to start.
+            simCache: optional simCache.simCache object for caching
+                simulation results. It's saved at the end of ga().
+            runLimits: limits for GridLAB-D runs, see individual.__init__
+            affinity: optional list of worker slots from affinity.coreSets.
+                Model thread k pins its runs to slot k (modulo the number of
+                slots).
+            workDir: optional workDir.workDir object. If given, each run
+                gets its own directory from it (rather than outDir), which is
+                removed once the individual is scored. Note outDir is still
+                used for the models of warm servers.
+            warmStart: True to run the base case for the first timestep
+                in prep, and start every individual's powerflow from its
+                voltages (see warmStartModel).
+            batchEval: True to evaluate the fitness of all the individuals
+                run in a generation with one database query (see
+                evalBatch), rather than a query per individual.
         """
         # Set up the log
         if log is not None:
@@ -107,6 +139,12 @@ class population:
         
         # Set recorders
         self.recorders = recorders
+        
+        # Set simulation cache
+        self.simCache = simCache
+        
+        # Set work directory manager
+        self.workDir = workDir
                     
         # Get a population manager for dealing out UIDs and cleaning up the
         # database.
@@ -138,6 +176,19 @@ class population:
         # GridLAB-D path
         self.gldInstall = gldInstall
         
+        # Set up the GridLAB-D environment and executable once, for all
+        # individuals' runs.
+        self.runner = gld.runner(**(gldInstall or {}))
+        
+        # Limits for running models.
+        self.runLimits = runLimits
+        
+        # Whether to start individuals' powerflows from the base case.
+        self.warmStart = warmStart
+        
+        # Whether to evaluate individuals' fitness a generation at a time.
+        self.batchEval = batchEval
+        
         # Initialize queues and threads for running GLD models in parallel and
         # cleaning up models we're done with.
         self.modelThreads = []
@@ -146,22 +197,36 @@ class population:
         # Call the 'prep' function which sets several object attributes AND
         # initializes the population.
         self.prep(starttime=starttime, stoptime=stoptime, strModel=strModel,
-                  cap=cap, reg=reg)
+                  cap=cap, reg=reg, objIndex=objIndex)
+        
+        # Start warm GridLAB-D servers if we're using them.
+        self.serverPool = None
+        self.regConf = None
+        if (serverConfig is not None) and serverConfig['ENABLED']:
+            self.startServerPool(numServers=serverConfig['SERVERS'],
+                                 basePort=serverConfig['BASE-PORT'],
+                                 readyTimeout=serverConfig['READY-TIMEOUT'])
         
         # Start the threads to be used for running GridLAB-D models. These 
         # models are run in a seperate subprocess, so we need to be sure this
         # is limited to the number of available cores.
-        for _ in range(numModelThreads):
+        for k in range(numModelThreads):
+            if affinity:
+                slot = affinity[k % len(affinity)]
+            else:
+                slot = None
             t = threading.Thread(target=writeRunEval, args=(self.modelQueue,
                                                             self.costs,
-                                                            self.log,))
+                                                            self.log,
+                                                            slot))
             self.modelThreads.append(t)
             t.start()
             
         self.log.info(('Model threads started, population initialization '
                        + 'complete.'))
         
-    def prep(self, starttime, stoptime, strModel, cap, reg, keep=0.1):
+    def prep(self, starttime, stoptime, strModel, cap, reg, keep=0.1,
+             objIndex=None):
         """Method to 'prepare' a population object. This method has two uses:
         initializing the population, and updating it for the next run.
         
@@ -175,19 +240,27 @@ class population:
             keep is for keeping individuals between time periods.
                 Essentially, we'll be seeding this population with 'keep' of 
                 the best individuals.
+                
+            objIndex is described in __init__.
         """
         # Set times.
         self.starttime = starttime
         self.stoptime = stoptime
         
-        # Set population base model
+        # Set population base model, and its object index (see
+        # modGLM.modGLM.__init__) if we have one.
         self.strModel = strModel
+        self.objIndex = objIndex
         
         # Set regulators and capacitors as property. Since the population
         # object will modify reg and cap, make deep copies.
         self.reg = copy.deepcopy(reg)
         self.cap = copy.deepcopy(cap)
         
+        # Start individuals from the base case's powerflow solution.
+        if self.warmStart:
+            self.warmStartModel()
+        
         # Define some common inputs for individuals
         self.indInputs = {'reg': self.reg, 'cap': self.cap,
                           'starttime': self.starttime,
@@ -195,7 +268,9 @@ class population:
                           'timezone': self.timezone,
                           'dbObj': self.dbObj,
                           'recorders': self.recorders,
-                          'gldInstall': self.gldInstall}
+                          'gldInstall': self.gldInstall,
+                          'runLimits': self.runLimits,
+                          'runner': self.runner}
         
         # If the population includes a 'baseline' model, we need to track it.
         # TODO: May want to update this to track multiple baseline individuals
@@ -205,6 +280,12 @@ class population:
         # Track the best scores for each generation.
         self.generationBest = []
         
+        # Track GridLAB-D profiler results for each generation (see
+        # gldProfile.aggregate), and the individuals queued for running in
+        # the current generation.
+        self.generationProfiles = []
+        self.queued = []
+        
         # Track the sum of fitness - used to compute roulette wheel weights
         self.fitSum = 0
         
@@ -245,6 +326,127 @@ class population:
         self.log.info("Prep function complete.")
             
             
+    def warmStartModel(self):
+        """Run the base case (devices at their previous states under manual
+        control) for the first timestep, and set the initial voltages of
+        the population's base model to its solution (see modGLM.warmStart).
+        Individuals differ from the base case by a few taps and switches,
+        so Newton-Raphson starts close to their solutions too.
+        
+        If the run fails, the model is left alone.
+        """
+        # Copy the devices, putting them at their previous states under
+        # manual control.
+        reg = copy.deepcopy(self.reg)
+        cap = copy.deepcopy(self.cap)
+        for d in (reg, cap):
+            for dev in d.values():
+                for phase in dev['phases'].values():
+                    phase.pop('newState', None)
+        for r in reg.values():
+            r['Control'] = 'MANUAL'
+        for c in cap.values():
+            c['control'] = 'MANUAL'
+            
+        # Use a directory of our own if we have a workDir.
+        if self.workDir is not None:
+            outDir = self.workDir.acquire(uid='warm_start',
+                                          size=len(self.strModel))
+        else:
+            outDir = self.outDir
+            
+        modelPath = os.path.join(outDir, 'warm_start.glm').replace('\\', '/')
+        dumpFile = 'warm_start_voltdump.csv'
+        
+        try:
+            # Build the base case, stopping at the starttime.
+            modelObj = modGLM.modGLM(strModel=self.strModel,
+                                     objIndex=self.objIndex,
+                                     pathModelOut=modelPath)
+            modelObj.commandRegulators(reg=reg)
+            modelObj.commandCapacitors(cap=cap)
+            t = self.starttime.strftime(constants.DATE_TZ_FMT)
+            modelObj.updateClock(starttime=t, stoptime=t)
+            # Models are run in their own directory, see gld.runner.run
+            modelObj.addVoltDump(filename=dumpFile)
+            modelObj.writeModel()
+            
+            runLimits = self.runLimits or {}
+            output = self.runner.run(modelPath=modelPath,
+                                     timeout=runLimits.get('TIMEOUT'),
+                                     cpuTime=runLimits.get('CPU-TIME'),
+                                     memory=runLimits.get('MEMORY'))
+            
+            if output.status != gld.RUN_OK:
+                self.log.warning(('Base case run for warm start {}, '
+                                  + 'individuals will start cold.'
+                                  ).format(output.status))
+                return
+            
+            voltages = modGLM.readVoltDump(os.path.join(outDir, dumpFile))
+            
+        finally:
+            if self.workDir is not None:
+                self.workDir.release(outDir)
+            else:
+                for f in (modelPath, os.path.join(outDir, dumpFile)):
+                    try:
+                        os.remove(f)
+                    except OSError:
+                        pass
+            
+        # Set the initial voltages, and rebuild the object index since the
+        # model changed.
+        modelObj = modGLM.modGLM(strModel=self.strModel)
+        count = modelObj.warmStart(voltages=voltages)
+        self.strModel = modelObj.strModel
+        self.objIndex = glmParser.parse(self.strModel).objectIndex()
+        
+        self.log.info(('Initial voltages of {} nodes set from the base '
+                       + 'case.').format(count))
+        
+    def startServerPool(self, numServers, basePort=gldServer.BASE_PORT,
+                        readyTimeout=120, cmd=None):
+        """Method to start a gldServer.serverPool for running individuals.
+        Each server gets its own model, written by a 'server' individual
+        so that it has its own recorder tables.
+        
+        NOTE: Servers are paused at the population's starttime. If prep is
+            called with new times, the pool must be closed and restarted.
+        
+        INPUTS:
+            numServers: number of servers in the pool.
+            basePort: port of first server.
+            readyTimeout: seconds to wait for a server to load its model.
+            cmd: command to start GridLAB-D, see gldServer.gldServer
+        """
+        slots = []
+        for k in range(numServers):
+            w = individual(**self.indInputs, uid='server{}'.format(k),
+                           regFlag=3, capFlag=3, controlFlag=0)
+            w.writeModel(strModel=self.strModel, inPath=self.inPath,
+                         outDir=self.outDir, objIndex=self.objIndex)
+            slots.append(w.serverSlot())
+            
+        # Individuals need to know regulator configurations to send commands.
+        self.regConf = modGLM.modGLM(strModel=self.strModel,
+                                     objIndex=self.objIndex
+                                     ).regulatorConfigs(self.reg)
+        
+        # Clear out a server's tables before it's restarted.
+        def onRecycle(slot):
+            self.dbObj.truncateTableBySuffix(slot['suffix'])
+        
+        self.serverPool = gldServer.serverPool(slots=slots,
+                                               starttime=self.starttime,
+                                               gldInstall=self.gldInstall,
+                                               basePort=basePort, cmd=cmd,
+                                               readyTimeout=readyTimeout,
+                                               onRecycle=onRecycle,
+                                               log=self.log)
+        self.log.info('Server pool with {} servers started.'.format(
+            numServers))
+        
     def initializePop(self):
         """Method to initialize the population.
         
@@ -314,12 +516,12 @@ class population:
         """Main function to run the genetic algorithm.
         """
         g = 0
+        # Files for the first generation go in a new directory.
+        if self.workDir is not None:
+            self.workDir.newGeneration()
         # Put all individuals in the queue for processing.
         for ind in self.individualsList:
-            self.modelQueue.put_nowait({'individual':ind,
-                                        'strModel': self.strModel,
-                                        'inPath': self.inPath,
-                                        'outDir': self.outDir})
+            self.addToModelQueue(ind)
         self.log.info('All individuals put in modeling queue.')
         # Loop over the generations
         while g < self.numGen:
@@ -327,6 +529,17 @@ class population:
             self.modelQueue.join()
             self.log.info('All model runs are complete.')
             
+            # Evaluate the individuals which are waiting for it.
+            self.evalBatch()
+            
+            # Summarize profiler results for the generation's runs.
+            agg = gldProfile.aggregate([ind.profile for ind in self.queued])
+            self.generationProfiles.append(agg)
+            self.queued = []
+            if agg['runs']:
+                self.log.info('Generation {} profile: {}'.format(
+                    g, gldProfile.summaryStr(agg)))
+            
             # If this is the first generation and we're tracking a baseline, 
             # save the requisite information.
             if (g == 0) and (self.baselineIndex is not None):
@@ -368,6 +581,8 @@ class population:
                 
                 # Replenish the population by crossing and mutating individuals
                 # then run their models.
+                if self.workDir is not None:
+                    self.workDir.newGeneration()
                 self.crossMutateRun()
                 msg = 'Cross and mutate complete for generation {}'.format(g)
                 msg += ' All models should be running.'
@@ -375,6 +590,20 @@ class population:
         
         # Done.
         self.log.info('Genetic algorithm complete.')
+        
+        # Persist the simulation cache.
+        if self.simCache is not None:
+            self.simCache.save()
+            self.log.info(('Simulation cache: {} hits, {} misses, {} '
+                           + 'entries.').format(self.simCache.hits,
+                                                self.simCache.misses,
+                                                len(self.simCache)))
+            
+        if self.workDir is not None:
+            self.log.info(('Work directories: {} on tmpfs, {} on '
+                           + 'disk.').format(self.workDir.tmpfsCount,
+                                             self.workDir.fallbackCount))
+            
         # Return the best individual.
         return self.individualsList[0]
     
@@ -384,11 +613,58 @@ class population:
         """
         self.modelQueue.put_nowait({'individual': individual,
                                     'strModel': self.strModel,
+                                    'objIndex': self.objIndex,
+                                    'serverPool': self.serverPool,
+                                    'regConf': self.regConf,
+                                    'simCache': self.simCache,
+                                    'workDir': self.workDir,
+                                    'batchEval': self.batchEval,
                                     'inPath': self.inPath,
                                     'outDir': self.outDir})
+        self.queued.append(individual)
         uid = individual.uid
         self.log.debug('Individual with UID {} put in model queue.'.format(uid))
         
+    def evalBatch(self):
+        """Evaluate the fitness of all the queued individuals which were
+        run but left pending (see individual.writeRunUpdateEval) with a
+        single database query.
+        """
+        pending = [ind for ind in self.queued if ind.pendingEval]
+        if not pending:
+            return
+        
+        tables = {ind.uid: {'energyTable': ind.energyTable,
+                            'powerTable': ind.powerTable,
+                            'triplexTable': ind.triplexTable}
+                  for ind in pending}
+        
+        try:
+            aggregates = self.dbObj.batchCostAggregates(
+                tables=tables,
+                lowerBound=self.costs['undervoltage']['limit'],
+                upperBound=self.costs['overvoltage']['limit'],
+                leadLimit=self.costs['powerFactorLead']['limit'],
+                lagLimit=self.costs['powerFactorLag']['limit'],
+                starttime=self.starttime, stoptime=self.stoptime)
+        except Exception as e:
+            self.log.error('Batch evaluation failed: {}'.format(e))
+            aggregates = {}
+            
+        for ind in pending:
+            try:
+                ind.evalFromAggregates(aggregates=aggregates[ind.uid],
+                                       costs=self.costs,
+                                       simCache=self.simCache)
+            except (KeyError, UserWarning) as e:
+                self.log.error(('Individual {} could not be evaluated: '
+                                + '{}').format(ind.uid, e))
+                ind.pendingEval = False
+                ind.setInfeasible(status='exception')
+                
+        self.log.info(('Fitness of {} individuals evaluated in one '
+                       + 'query.').format(len(pending)))
+        
     def naturalSelection(self):
         """Determines which individuals will be used to create next generation.
         """
@@ -401,8 +677,10 @@ class population:
         i = 0
         while i < len(self.individualsList):
             # If we are past the k'th individual and the random draw mandates
-            # it, kill it.
-            if (i >= k) and (random.random() < self.probabilities['weak']):
+            # it, kill it. Always kill infeasible individuals (failed runs).
+            if (self.individualsList[i].infeasible()
+                    or ((i >= k)
+                        and (random.random() < self.probabilities['weak']))):
                 # Remove indiviual from individualsList, cleanup.
                 ind = self.individualsList.pop(i)
                 self.log.debug(('Killing individual {} via natural '
@@ -572,9 +850,12 @@ class population:
         # Signal to threads that we're done by putting 'None' in the queue.
         for _ in self.modelThreads: self.modelQueue.put_nowait(None)
         for t in self.modelThreads: t.join(timeout=timeout)
+        # Shut down servers.
+        if self.serverPool is not None:
+            self.serverPool.close()
         #print('Threads terminated.', flush=True)
     
-def writeRunEval(modelQueue, costs, log):
+def writeRunEval(modelQueue, costs, log, affinity=None):
                 #, cnxnpool):
     #tEvent):
     """Write individual's model, run the model, and evaluate costs. This is
@@ -592,8 +873,11 @@ def writeRunEval(modelQueue, costs, log):
         
     INPUTS:
         modelQueue: queue which will have dictionaries inserted into it.
-            dictionaries should contain individual, strModel, inPath, 
-            and outDir fields from a population object.
+            dictionaries should contain individual, strModel, objIndex,
+            serverPool, regConf, simCache, workDir, batchEval, inPath, and
+            outDir fields from a population object.
+        affinity: worker slot this thread pins its runs to. See
+            gld.runModel.
     """
     while True:
         try:
@@ -608,14 +892,32 @@ def writeRunEval(modelQueue, costs, log):
             
             uid = inDict['individual'].uid
             log.debug('Pulled individual {} from model queue.'.format(uid))
-            # Write, run, update, and evaluate the individual.
-            inDict['individual'].writeRunUpdateEval(strModel=inDict['strModel'],
-                                                    inPath=inDict['inPath'],
-                                                    outDir=inDict['outDir'],
-                                                    costs=costs)
             
-            # Denote task as complete.
-            modelQueue.task_done()
+            # Use a directory of its own if we have a workDir.
+            workDir = inDict['workDir']
+            if workDir is not None:
+                outDir = workDir.acquire(uid=uid,
+                                         size=len(inDict['strModel']))
+            else:
+                outDir = inDict['outDir']
+            
+            try:
+                # Write, run, update, and evaluate the individual.
+                inDict['individual'].writeRunUpdateEval(strModel=inDict['strModel'],
+                                                        objIndex=inDict['objIndex'],
+                                                        serverPool=inDict['serverPool'],
+                                                        regConf=inDict['regConf'],
+                                                        simCache=inDict['simCache'],
+                                                        affinity=affinity,
+                                                        batchEval=inDict['batchEval'],
+                                                        inPath=inDict['inPath'],
+                                                        outDir=outDir,
+                                                        costs=costs,
+                                                        log=log)
+            finally:
+                # The individual has been scored, its files can go.
+                if workDir is not None:
+                    workDir.release(outDir)
             
             log.debug(('Completed running individual {}. There are {} '
                        + 'individuals left in the model '
@@ -627,6 +929,15 @@ def writeRunEval(modelQueue, costs, log):
             print(error_type, flush=True)
             print(error, flush=True)
             print(traceback, flush=True)
+            # Don't leave the individual without a score.
+            if inDict['individual'].costs is None:
+                inDict['individual'].setInfeasible(status='exception')
+                
+        finally:
+            # Denote task as complete, even if it failed - otherwise
+            # modelQueue.join() never returns.
+            if inDict is not None:
+                modelQueue.task_done()
 
 def mutateChroms(c, prob):
     """Take a chromosome and randomly mutate it.
@@ -7,6 +7,12 @@ from queue import Queue
 import threading
 import logging
 
+def uidRange(numInd):
+    """All the uids given out for a population of numInd individuals. To
+    avoid blocked queues, there are double the UIDs.
+    """
+    return range(numInd*2)
+
 class populationManager:
     
     def __init__(self, dbObj, numInd, log=None):
@@ -31,9 +37,8 @@ class populationManager:
         self.uidQ = Queue()
         self.cleanupQ = Queue()
         
-        # Fill up the uidQ. To avoid blocked queues, we'll have double the UIDs
-        # available.
-        for i in range(numInd*2):
+        # Fill up the uidQ.
+        for i in uidRange(numInd):
             self.uidQ.put(i)
             
         self.log.debug('{} UIDs put in the UID queue'.format(numInd*2))
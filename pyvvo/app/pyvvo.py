@@ -33,8 +33,15 @@ CONFIGFILE = os.path.join(THISDIR, 'config.json')
 # pyvvo imports:
 import sparqlCIM
 import db
+import recorderFiles
+import sqliteDB
 import modGLM
 import population
+import populationManager
+import gld
+import simCache
+import workDir
+import affinity
 import constants as CONST
 from helper import clock
     
@@ -93,10 +100,50 @@ def main():
             
     log.info('Confirmed that all EnergyConsumers have measurements.')
          
-    # Connect to the MySQL database for gridlabd simulations
-    dbObj = db.db(**config['GLD-DB'],
-                  pool_size=config['GLD-DB-OTHER']['NUM-CONNECTIONS'])
-    log.info('Connected to MySQL database for GridLAB-D simulation output.')
+    # Give each model run its own directory, in RAM if possible.
+    if config['WORK-DIR']['ENABLED']:
+        workObj = workDir.workDir(fallback=config['PATHS']['outDir'],
+                                  tmpfs=config['WORK-DIR']['TMPFS'],
+                                  maxMB=config['WORK-DIR']['MAX-MB'],
+                                  minFreeMB=config['WORK-DIR']['MIN-FREE-MB'])
+        log.info('Model runs will use work directories in {}.'.format(
+            workObj.base or config['PATHS']['outDir']))
+    else:
+        workObj = None
+    
+    # GridLAB-D simulation output goes to MySQL, or to files (which may be
+    # imported into SQLite).
+    serverConfig = config['GLD-SERVER']
+    if config['GLD-DB-OTHER']['BACKEND'] in ('file', 'sqlite'):
+        # Put recorder files in RAM too, if we can.
+        if (workObj is not None) and (workObj.base is not None):
+            recorderRoot = workObj.base
+        else:
+            recorderRoot = config['PATHS']['outDir']
+        if config['GLD-DB-OTHER']['BACKEND'] == 'sqlite':
+            dbObj = sqliteDB.sqliteDB(root=recorderRoot, **config['GLD-DB'])
+            log.info(('Recording GridLAB-D simulation output to files, '
+                      + 'imported into SQLite ({}).').format(dbObj.path))
+        else:
+            dbObj = recorderFiles.fileDB(root=recorderRoot)
+            log.info('Recording GridLAB-D simulation output to files.')
+        database = None
+        
+        # Server slots reuse their recorder tables for every run, which is
+        # only supported with MySQL.
+        if serverConfig['ENABLED']:
+            serverConfig = dict(serverConfig, ENABLED=False)
+            log.warning('GridLAB-D servers disabled: they require MySQL.')
+    else:
+        # Connect to the MySQL database for gridlabd simulations
+        # If the number of connections isn't given, there's one for each
+        # model thread (and a couple more).
+        dbObj = db.db(**config['GLD-DB'],
+                      pool_size=config['GLD-DB-OTHER']['NUM-CONNECTIONS'],
+                      workers=config['GA']['THREADS'],
+                      pool_timeout=config['GLD-DB-OTHER']['POOL-TIMEOUT'])
+        database = config['GLD-DB']
+        log.info('Connected to MySQL database for GridLAB-D simulation output.')
     
     # Clear out the database while testing.
     # TODO: take this out?
@@ -111,19 +158,23 @@ def main():
                              pathModelOut=baseOut
                             )
     
-    # Set up the model to run.
+    # Set up the model to run. The result is cached, so this is only slow
+    # the first time a given model is set up with given inputs.
     st = '2016-01-01 00:00:00'
     et = '2016-01-01 01:00:00'
     tz = 'PST+8PDT'
     swingMeterName = \
         modelObj.setupModel(starttime=st,
                             stoptime=et, timezone=tz,
-                            database=config['GLD-DB'],
+                            database=database,
                             powerflowFlag=True,
                             vSource=swingV,
                             #vSource=config['FEEDER']['SUBSTATION-VOLTAGE'],
                             triplexGroup=CONST.LOADS['triplex']['group'],
-                            triplexList=loadV['triplex']['meters']
+                            triplexList=loadV['triplex']['meters'],
+                            cacheDir=config['PATHS']['modelCache'],
+                            threadCount=config['GA']['GLD-THREADS'],
+                            profiler=config['GLD-RUN']['PROFILER']
                             )
     
     # Write the base model
@@ -149,40 +200,108 @@ def main():
                            recordMode='a',
                            query_buffer_limit=config['GLD-DB-OTHER']['QUERY_BUFFER_LIMIT'])
     
-    # Convert costs from fraction of nominal voltage to actual voltage
-    costs = copy.copy(config['COSTS'])
-    costs['undervoltage']['limit'] = (costs['undervoltage']['limit']
-                                      * loadV['triplex']['v'])
-    costs['overvoltage']['limit'] = (costs['overvoltage']['limit']
-                                     * loadV['triplex']['v'])
-    
-    # Initialize a population.
-    # TODO - let's get the 'inPath' outta here. It's really just being used for
-    # model naming, and we may as well be more explicit about that.
-    popObj = population.population(strModel=modelObj.strModel,
-                                   numInd=config['GA']['INDIVIDUALS'],
-                                   numGen=config['GA']['GENERATIONS'],
-                                   numModelThreads=config['GA']['THREADS'],
-                                   recorders=recorders,
-                                   dbObj=dbObj,
-                                   starttime=clockObj.start_dt,
-                                   stoptime=clockObj.stop_dt,
-                                   timezone=tz,
-                                   inPath=modelObj.pathModelIn,
-                                   outDir=outDir,
-                                   reg=reg, cap=cap,
-                                   costs=costs,
-                                   probabilities=config['PROBABILITIES'],
-                                   gldInstall=config['GLD-INSTALLATION'],
-                                   randomSeed=config['RANDOM-SEED'],
-                                   log=log)
-    
-    log.info('Population object initialized.')
-    
-    bestInd = popObj.ga()
-    
-    print(bestInd)
-    print('hoorah')
+    # Create individuals' typed and indexed tables before GridLAB-D does.
+    if config['GLD-DB-OTHER']['BACKEND'] == 'mysql':
+        dbObj.typedTables = config['GLD-DB-OTHER']['TYPED-TABLES']
+        
+        # Recorder output is scratch data: don't pay for durability.
+        if ((config['GLD-DB-OTHER']['ENGINE'] is not None)
+                or config['GLD-DB-OTHER']['RELAXED-DURABILITY']):
+            dbObj.setEngine(engine=config['GLD-DB-OTHER']['ENGINE'],
+                            relaxed=config['GLD-DB-OTHER']['RELAXED-DURABILITY'],
+                            log=log)
+            log.info('Recorder tables use the {} storage engine.'.format(
+                dbObj.engine or 'default'))
+        
+    # From here on, put the server's settings back however the run ends.
+    try:
+        # Record to tables shared by all individuals, partitioned by uid,
+        # rather than letting GridLAB-D create tables for each individual.
+        if ((config['GLD-DB-OTHER']['BACKEND'] == 'mysql')
+                and config['GLD-DB-OTHER']['SHARED-TABLES']):
+            dbObj.createSharedTables(tables=gld.recorderColumns(recorders),
+                                     uids=populationManager.uidRange(
+                                         config['GA']['INDIVIDUALS']))
+            log.info('Shared recorder tables created.')
+        
+            # Servers have their own tables, which aren't partitions.
+            if serverConfig['ENABLED']:
+                serverConfig = dict(serverConfig, ENABLED=False)
+                log.warning(('GridLAB-D servers disabled: they require '
+                             + 'individual tables.'))
+        
+        # Convert costs from fraction of nominal voltage to actual voltage
+        costs = copy.copy(config['COSTS'])
+        costs['undervoltage']['limit'] = (costs['undervoltage']['limit']
+                                          * loadV['triplex']['v'])
+        costs['overvoltage']['limit'] = (costs['overvoltage']['limit']
+                                         * loadV['triplex']['v'])
+        
+        # Get the simulation result cache, if we're using it.
+        if config['SIM-CACHE']['ENABLED']:
+            cacheObj = simCache.simCache(path=config['PATHS']['simCache'],
+                                         maxEntries=config['SIM-CACHE']['MAX-ENTRIES'])
+            log.info('Simulation cache loaded with {} entries.'.format(len(cacheObj)))
+        else:
+            cacheObj = None
+        
+        # Pin model threads to cores if desired. Each simulation gets as many
+        # cores as GridLAB-D threads (0 threads means all cores).
+        if config['AFFINITY']['ENABLED']:
+            coresPerSlot = config['GA']['GLD-THREADS'] or os.cpu_count()
+            slots = affinity.coreSets(numSlots=config['GA']['THREADS'],
+                                      coresPerSlot=coresPerSlot,
+                                      membind=config['AFFINITY']['MEMBIND'])
+        else:
+            slots = None
+        
+        # Initialize a population.
+        # TODO - let's get the 'inPath' outta here. It's really just being used for
+        # model naming, and we may as well be more explicit about that.
+        popObj = population.population(strModel=modelObj.strModel,
+                                       objIndex=modelObj.objIndex,
+                                       numInd=config['GA']['INDIVIDUALS'],
+                                       numGen=config['GA']['GENERATIONS'],
+                                       numModelThreads=config['GA']['THREADS'],
+                                       recorders=recorders,
+                                       dbObj=dbObj,
+                                       starttime=clockObj.start_dt,
+                                       stoptime=clockObj.stop_dt,
+                                       timezone=tz,
+                                       inPath=modelObj.pathModelIn,
+                                       outDir=outDir,
+                                       reg=reg, cap=cap,
+                                       costs=costs,
+                                       probabilities=config['PROBABILITIES'],
+                                       gldInstall=config['GLD-INSTALLATION'],
+                                       randomSeed=config['RANDOM-SEED'],
+                                       serverConfig=serverConfig,
+                                       simCache=cacheObj,
+                                       runLimits=config['GLD-RUN'],
+                                       affinity=slots,
+                                       workDir=workObj,
+                                       warmStart=config['GLD-RUN']['WARM-START'],
+                                       batchEval=config['GLD-DB-OTHER']['BATCH-EVAL'],
+                                       log=log)
+        
+        log.info('Population object initialized.')
+        
+        bestInd = popObj.ga()
+        
+        print(bestInd)
+        print('hoorah')
+    finally:
+        # Report how the connection pool held up, for sizing it.
+        if hasattr(dbObj, 'cnxnPool'):
+            log.info('Connection pool: {}'.format(dbObj.cnxnPool.stats()))
+        
+        # Relaxed durability is server-wide: put it back.
+        if hasattr(dbObj, 'restoreDurability'):
+            dbObj.restoreDurability()
+        
+        # Clean up files in RAM.
+        if workObj is not None:
+            workObj.close()
     
 def readConfig():
     """Helper function to read pyvvo configuration file.
@@ -0,0 +1,276 @@
+'''
+Module for recording GridLAB-D output to files rather than to MySQL.
+
+With the 'file' recorder backend, individuals add tape recorders to their
+models instead of mysql recorders (see individual.addRecorder), and fileDB
+reads the CSV files back with NumPy. fileDB has the methods of util/db.db
+which are used to update and evaluate individuals, so it's used in place of
+a db object as an individual's dbObj, and no database is needed at all.
+
+Each individual gets its own directory under the root directory, named
+after its table suffix (e.g. 'rec_12' for 'power_12'). In it:
+    - A recorder with a parent writes <table>.<parent>.csv, e.g.
+        rec_12/power.swing_meter.csv. Regulators and capacitors share a
+        table, so there's a file for each of them.
+    - A recorder with a group becomes a tape group_recorder for each
+        property, writing <table>.<column>.csv, e.g.
+        rec_12/triplexVoltage.measured_voltage_1_mag.csv. Each has a column
+        for every object in the group.
+
+Tape recorder files look like:
+
+    # file...... power.swing_meter.csv
+    # date...... Fri Jan 01 00:00:00 2016
+    ...
+    # timestamp,measured_real_power,measured_reactive_power
+    2016-01-01 00:00:00 PST,+1234.5,+567.8
+
+NOTE: Like util/db.db.timeWhere, times are compared as strings in
+    constants.DATE_FMT. Files have no ID column, so during the DST 'fall
+    back' rows from both of the repeated hours are read.
+
+Created on Oct 18, 2026
+'''
+import os
+import glob
+import shutil
+import numpy as np
+import constants
+
+# Timestamps start with a time in constants.DATE_FMT, which is this long.
+TIME_LEN = 19
+# Each individual's directory is this followed by its table suffix.
+DIR_PREFIX = 'rec'
+
+def readRecorder(path):
+    """Read a tape recorder (or group_recorder) file.
+
+    OUTPUT: tuple of (columns, times, values):
+        columns: list of column names from the header. Like gld.propToCol,
+            periods are replaced with underscores.
+        times: numpy array of time strings in constants.DATE_FMT.
+        values: 2D numpy array with a row for each time. Values are floats
+            unless a column can't be converted (e.g. a capacitor's switch
+            status), in which case they're all strings.
+    """
+    columns = None
+    data = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith('#'):
+                if line.startswith(constants.GLD_TIMESTAMP):
+                    columns = [c.strip().replace('.', '_')
+                               for c in line.split(',')[1:]]
+            elif line.strip():
+                data.append(line)
+
+    if columns is None:
+        raise UserWarning('No header found in {}'.format(path))
+
+    times = np.array([line[:TIME_LEN] for line in data],
+                     dtype='U{}'.format(TIME_LEN))
+
+    if not data:
+        return columns, times, np.empty((0, len(columns)))
+
+    # Skip the timestamp column.
+    cols = range(1, len(columns) + 1)
+    try:
+        values = np.loadtxt(data, delimiter=',', usecols=cols, ndmin=2)
+    except ValueError:
+        values = np.loadtxt(data, delimiter=',', usecols=cols, ndmin=2,
+                            dtype=str)
+
+    return columns, times, values
+
+def timeMask(times, starttime=None, stoptime=None):
+    """Boolean mask of times (from readRecorder) in [starttime, stoptime].
+    Both times are inclusive, and should be aware datetime objects. If
+    neither is given, all times are included.
+    """
+    if (starttime is None) and (stoptime is None):
+        return np.ones(len(times), dtype=bool)
+    elif (starttime is None) or (stoptime is None):
+        raise ValueError(('If time information is given, it must be given '
+                          + 'for both the starttime and stoptime.'))
+
+    start_str = starttime.strftime(constants.DATE_FMT)
+    stop_str = stoptime.strftime(constants.DATE_FMT)
+    return (times >= start_str) & (times <= stop_str)
+
+class fileDB:
+    """Class to read tape recorder files in place of util/db.db. Only the
+    methods needed to update and evaluate individuals are implemented. The
+    idCol, nameCol, and tCol inputs of db methods are accepted but ignored.
+    """
+
+    def __init__(self, root):
+        """
+        INPUTS:
+            root: directory for recorder files. Since paths in the models
+                are absolute, this doesn't have to be where models are.
+        """
+        self.root = os.path.abspath(root)
+
+    def tableDir(self, table):
+        """Directory for a table. Tables end in an individual's table
+        suffix, see individual.tableSuffix.
+        """
+        suffix = table[table.rindex('_'):]
+        return os.path.join(self.root, DIR_PREFIX + suffix)
+
+    def recorderFile(self, table, part, makeDir=False):
+        """Path to a recorder file for a table.
+
+        INPUTS:
+            table: table name, including the individual's table suffix.
+            part: name of the recorded object for recorders with a parent,
+                column name for group recorders.
+            makeDir: True to create the directory if it doesn't exist
+                (GridLAB-D won't).
+        """
+        d = self.tableDir(table)
+        if makeDir:
+            os.makedirs(d, exist_ok=True)
+
+        base = table[:table.rindex('_')]
+        # GridLAB-D is happier with forward slashes on Windows.
+        return os.path.join(d, base + '.' + part + '.csv').replace('\\', '/')
+
+    def tableFiles(self, table):
+        """Get the recorder files of a table as a dict of {part: path}, see
+        recorderFile.
+        """
+        prefix = self.recorderFile(table, '')[:-len('.csv')]
+        return {p[len(prefix):-len('.csv')]: p
+                for p in sorted(glob.glob(glob.escape(prefix) + '*.csv'))}
+
+    @staticmethod
+    def readCols(path, cols, starttime=None, stoptime=None, numeric=True):
+        """Read the given columns of a file for the given times.
+
+        OUTPUT: 2D numpy array with a column for each of cols. If numeric,
+            values are floats.
+        """
+        columns, times, values = readRecorder(path)
+        try:
+            ind = [columns.index(c) for c in cols]
+        except ValueError:
+            raise UserWarning('{} lacks one of the columns {}'.format(path,
+                                                                     cols))
+
+        out = values[timeMask(times, starttime, stoptime)][:, ind]
+        if numeric and (out.dtype.kind != 'f'):
+            out = out.astype(float)
+
+        return out
+
+    def read(self, table, cols, starttime=None, stoptime=None):
+        """Read the given columns of all of a table's files (see readCols).
+        Rows from each file are stacked.
+        """
+        files = self.tableFiles(table)
+        if not files:
+            raise UserWarning('No recorder files for table {}'.format(table))
+
+        return np.concatenate([self.readCols(path=p, cols=cols,
+                                             starttime=starttime,
+                                             stoptime=stoptime)
+                               for p in files.values()])
+
+    def fetchAll(self, table, cols, starttime=None, stoptime=None,
+                 **kwargs):
+        """Read a table. Returns a list of tuples like db.fetchAll."""
+        rows = self.read(table=table, cols=cols, starttime=starttime,
+                         stoptime=stoptime)
+        return [tuple(r) for r in rows.tolist()]
+
+    def getComplexFromParts(self, table, cols, starttime=None,
+                            stoptime=None, **kwargs):
+        """Get complex numbers from the real and reactive columns in cols
+        (see db.getComplexFromParts). Returns a numpy array.
+        """
+        if len(cols) != 2:
+            raise UserWarning('For now, only two columns are supported')
+
+        try:
+            real = [c for c in cols if '_real' in c.lower()][0]
+            reactive = [c for c in cols if '_reactive' in c.lower()][0]
+        except IndexError:
+            raise UserWarning('Columns provided lack _real and/or _reactive')
+
+        v = self.read(table=table, cols=[real, reactive],
+                      starttime=starttime, stoptime=stoptime)
+        return v[:, 0] + 1j * v[:, 1]
+
+    def sumMatrix(self, table, cols, starttime=None, stoptime=None,
+                  **kwargs):
+        """Sum the given columns over all rows (see db.sumMatrix). Like SQL,
+        returns None if there are no rows.
+        """
+        v = self.read(table=table, cols=cols, starttime=starttime,
+                      stoptime=stoptime)
+        if not v.size:
+            return None
+
+        return v.sum().item()
+
+    def voltViolationsFromRecorder(self, table, lowerBound, upperBound,
+                                   voltageCols, starttime=None,
+                                   stoptime=None, **kwargs):
+        """Count voltage violations recorded by group recorders, see
+        db.voltViolationsFromRecorder. Each object at each time counts once,
+        no matter how many of its voltageCols violate.
+        """
+        low = high = False
+        for col in voltageCols:
+            _, times, v = readRecorder(self.recorderFile(table, col))
+            v = v[timeMask(times, starttime, stoptime)]
+            low = low | (v < lowerBound)
+            high = high | (v > upperBound)
+
+        return {'low': int(np.count_nonzero(low)),
+                'high': int(np.count_nonzero(high))}
+
+    def updateStatus(self, inDict, dictType, table, phaseCols, t,
+                     **kwargs):
+        """Update the 'newState' of reg or cap dictionaries with the states
+        at time t, see db.updateStatus. Tap positions are ints, switch
+        statuses are strings.
+        """
+        # Based on the dictType, determine what to strip from the phaseCols
+        # to just leave the phase behind.
+        if dictType == 'reg':
+            s = 'tap_'
+        elif dictType == 'cap':
+            s = 'switch'
+
+        for name, path in self.tableFiles(table).items():
+            rows = self.readCols(path=path, cols=phaseCols, starttime=t,
+                                 stoptime=t, numeric=False)
+            for row in rows:
+                for col, state in zip(phaseCols, row):
+                    p = col.replace(s, '')
+                    if p in inDict[name]['phases']:
+                        if dictType == 'reg':
+                            state = int(float(state))
+                        inDict[name]['phases'][p]['newState'] = state
+
+        return inDict
+
+    def truncateTableBySuffix(self, suffix):
+        """Remove an individual's files."""
+        shutil.rmtree(os.path.join(self.root, DIR_PREFIX + suffix),
+                      ignore_errors=True)
+
+    def dropAllTables(self, tableSuffix=None):
+        """Remove the files of all individuals, or only those with the
+        given tableSuffix.
+        """
+        if tableSuffix is not None:
+            self.truncateTableBySuffix(tableSuffix)
+            return
+
+        for d in glob.glob(os.path.join(glob.escape(self.root),
+                                        DIR_PREFIX + '_*')):
+            shutil.rmtree(d, ignore_errors=True)
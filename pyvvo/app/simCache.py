@@ -0,0 +1,221 @@
+'''
+Module for caching simulation results, so the same simulation is never run
+twice.
+
+The genetic algorithm commonly produces identical individuals - within a
+generation (crossing two similar parents), across generations (the top
+individuals are kept), and across intervals (devices often don't move).
+Their models are identical down to the last character, apart from the
+uid-dependent table names and paths. So results are cached by a hash of the
+model text with those masked.
+
+What's cached is what an individual reads from the database after a run:
+the cost inputs (see gld.costInputs) and, for individuals which don't use
+manual control, the tap/cap states and counts (see individual.update).
+Costs themselves are NOT cached, since they're cheap to compute and depend
+on the cost dictionary.
+
+The cache is a least recently used (LRU) cache with a maximum number of
+entries, and is persisted to a JSON file with save().
+
+Created on Oct 18, 2026
+'''
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Bump this if what's stored in an entry (or how it's computed) changes, so
+# stale cache files are ignored.
+VERSION = 1
+
+# Mask to put in place of table suffixes.
+MASK = '_{uid}'
+# Mask to put in place of a work directory's generation.
+GEN_MASK = 'gen_{gen}'
+
+def maskTables(strModel, suffix):
+    """Replace suffix in the table names of recorders, and in the
+    directories of an individual's files, with MASK.
+
+    INPUTS:
+        strModel: model string.
+        suffix: table suffix, e.g. '_12'. See individual.tableSuffix.
+    """
+    # Only replace the suffix at the end of a table name - '_12' could show
+    # up in plenty of other places (e.g. 'tm_12'). With shared tables, the
+    # uid is in the name of the database's on_init script instead (see
+    # individual.buildModel).
+    r = re.compile(r'(\b(?:table|on_init)\s+"?[^"\s;]*?)'
+                   + re.escape(suffix) + r'(?=["\s;]|\.sql")')
+    strModel = r.sub(lambda m: m.group(1) + MASK, strModel)
+
+    # Paths may go through the individual's work directory,
+    # gen_<generation>/ind_<uid> (see workDir.acquire), or its directory of
+    # recorder files, rec_<uid> (see recorderFiles.fileDB.tableDir). The
+    # generation is masked too, so individuals from different generations
+    # match.
+    r = re.compile(r'(?<![\w.-])(?:gen_\d+([/\\]))?(ind|rec)'
+                   + re.escape(suffix) + r'(?=[/\\"\s;])')
+    return r.sub(lambda m: ((GEN_MASK + m.group(1)) if m.group(1) else '')
+                 + m.group(2) + MASK, strModel)
+
+def hashText(*args):
+    """sha256 hex digest of the given strings, which are separated by a null
+    character.
+    """
+    h = hashlib.sha256()
+    for a in args:
+        h.update(a.encode('utf-8'))
+        h.update(b'\0')
+
+    return h.hexdigest()
+
+def _encode(obj):
+    """json default for encoding complex numbers."""
+    if isinstance(obj, complex):
+        return {'__complex__': [obj.real, obj.imag]}
+    raise TypeError('{} is not JSON serializable'.format(type(obj)))
+
+def _decode(d):
+    """json object_hook for decoding complex numbers."""
+    if '__complex__' in d:
+        return complex(*d['__complex__'])
+    return d
+
+class simCache:
+    """Thread safe LRU cache of simulation results, persisted to disk."""
+
+    def __init__(self, path=None, maxEntries=10000):
+        """
+        INPUTS:
+            path: path to JSON file for persisting the cache. If the file
+                exists, it's loaded. If None, the cache is only in memory.
+            maxEntries: maximum number of entries to keep. Least recently
+                used entries are dropped past this.
+        """
+        self.path = path
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Track hits and misses
+        self.hits = 0
+        self.misses = 0
+        # Flag for whether entries have changed since loading or saving.
+        self.dirty = False
+        # Last text hashed with baseHash: (text, hash)
+        self._base = (None, None)
+
+        if (path is not None) and os.path.isfile(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, strModel, suffix, *extra):
+        """Compute the cache key for a model.
+
+        INPUTS:
+            strModel: model string, exactly as it will be run.
+            suffix: the table suffix of the individual the model belongs to.
+            extra: any other strings which the results depend on, like the
+                times results are read for.
+        """
+        return hashText(str(VERSION), maskTables(strModel, suffix), *extra)
+
+    def baseHash(self, strModel):
+        """Hash of a base model (e.g. one shared by a population). Since the
+        same (large) string will be passed repeatedly, the last hash is
+        remembered.
+        """
+        with self.lock:
+            text, h = self._base
+            # Keeping a reference to text means its id can't be reused.
+            if text is strModel:
+                return h
+
+        h = hashText(strModel)
+        with self.lock:
+            self._base = (strModel, h)
+
+        return h
+
+    def commandKey(self, strModel, commands, *extra):
+        """Compute the cache key for a base model with commands sent to it
+        (see gldServer.deviceCommands). Inputs are like key().
+        """
+        return hashText(str(VERSION), 'commands', self.baseHash(strModel),
+                        json.dumps(commands, sort_keys=True), *extra)
+
+    def get(self, key):
+        """Get a cached entry. Returns None on a miss."""
+        with self.lock:
+            try:
+                entry = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            # Mark as most recently used.
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Cache an entry. entry should be a dict which can be serialized to
+        JSON (complex numbers are allowed).
+        """
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            # Drop least recently used entries.
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+            self.dirty = True
+
+    def load(self):
+        """Load the cache from self.path. Files from a different VERSION are
+        ignored.
+        """
+        try:
+            with open(self.path) as f:
+                d = json.load(f, object_hook=_decode)
+        except ValueError:
+            # Corrupt file, start over.
+            return
+
+        if d.get('version') != VERSION:
+            return
+
+        with self.lock:
+            # Entries are saved in LRU order.
+            self.entries = OrderedDict(d['entries'])
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+            self.dirty = False
+
+    def save(self):
+        """Save the cache to self.path if anything has changed. The file is
+        written to a temporary file first, so a crash mid-write can't
+        corrupt it.
+        """
+        if (self.path is None) or (not self.dirty):
+            return
+
+        with self.lock:
+            s = json.dumps({'version': VERSION,
+                            'entries': list(self.entries.items())},
+                           default=_encode)
+            self.dirty = False
+
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(s)
+        os.replace(tmp, self.path)
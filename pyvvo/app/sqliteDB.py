@@ -0,0 +1,309 @@
+'''
+Module for keeping GridLAB-D output in SQLite rather than MySQL.
+
+With the 'sqlite' recorder backend, no database server is needed, so the GA
+can be run (and profiled) end to end on a laptop, or for small feeders.
+GridLAB-D can't write to SQLite, so individuals record to files with tape
+recorders, exactly like the 'file' backend (see recorderFiles). After each
+run, the files are imported into tables laid out like GridLAB-D's mysql
+recorder tables (see sqliteDB.importRecorders), and from then on the
+queries of util/db.db are used, including the single query cost
+evaluation (db.costAggregates and db.batchCostAggregates).
+
+The database can be a file, which is put in WAL mode so readers don't
+block the writer, or in memory (path ':memory:').
+
+Created on Oct 18, 2026
+'''
+import os
+import sqlite3
+import threading
+import db
+import gld
+import recorderFiles
+
+# SQLite column types for the SQL types of gld.sqlColumns.
+AFFINITY = {'INT': 'INTEGER', 'DOUBLE': 'REAL'}
+
+class sqliteDB(db.db, recorderFiles.fileDB):
+    """Class to use an SQLite database in place of util/db.db. Query methods
+    come from db.db, and recorder file paths from recorderFiles.fileDB, so
+    individuals add tape recorders (see individual.recordsToFiles). Methods
+    which rely on MySQL (INFORMATION_SCHEMA, TRUNCATE) are replaced.
+
+    Each query opens its own connection to a database file, so this is
+    threadsafe. An in-memory database only lives as long as its connection,
+    so there's a single connection which queries take turns using.
+    """
+
+    def __init__(self, path=':memory:', root=None, timeout=30, **kwargs):
+        """
+        INPUTS:
+            path: database file, or ':memory:' for an in-memory database.
+            root: directory for recorder files, see recorderFiles.fileDB.
+                Defaults to the database file's directory, or the current
+                directory for an in-memory database.
+            timeout: seconds to wait for another connection's write to
+                finish.
+            kwargs: ignored, so the MySQL settings (config['GLD-DB']) can
+                be passed as is.
+        """
+        self.path = path
+        self.timeout = timeout
+        # The schema of the database's own tables.
+        self.database = 'main'
+
+        if root is None:
+            root = (os.getcwd() if path == ':memory:'
+                    else os.path.dirname(os.path.abspath(path)))
+        recorderFiles.fileDB.__init__(self, root=root)
+
+        # See db.db.__init__. Shared tables, typed tables, and storage
+        # engines are for MySQL only.
+        self.sharedTables = None
+        self.tableRegistry = {}
+        self.registryLock = threading.Lock()
+        self.typedTables = False
+        self.createdTables = set()
+        self.typedVerified = False
+        self.engine = None
+        self.flushSetting = None
+
+        if path == ':memory:':
+            self.memoryCnxn = sqlite3.connect(path, check_same_thread=False)
+            self.memoryLock = threading.Lock()
+        else:
+            self.memoryCnxn = None
+            # WAL mode is kept by the database file.
+            cnxn = sqlite3.connect(path, timeout=timeout)
+            try:
+                cnxn.execute('PRAGMA journal_mode=WAL')
+            finally:
+                cnxn.close()
+
+    def getCnxnAndCursor(self, cursorOptions={}, timeout=None):
+        """Get a connection and a cursor, see db.getCnxnAndCursor. The other
+        inputs are ignored.
+        """
+        if self.memoryCnxn is not None:
+            self.memoryLock.acquire()
+            cnxn = self.memoryCnxn
+        else:
+            cnxn = sqlite3.connect(self.path, timeout=self.timeout)
+            # Recorder output is scratch data: don't wait for the disk.
+            cnxn.execute('PRAGMA synchronous=OFF')
+
+        return cnxn, cnxn.cursor()
+
+    def closeCnxnAndCursor(self, cnxn, cursor):
+        """Commit, and close the cursor and connection (or hand the
+        in-memory database's connection to the next query).
+        """
+        cursor.close()
+        try:
+            cnxn.commit()
+        finally:
+            if cnxn is self.memoryCnxn:
+                self.memoryLock.release()
+            else:
+                cnxn.close()
+
+    def getCnxnAndStatement(self, query, timeout=None):
+        """Get a connection and a statement for query, see
+        db.getCnxnAndStatement. SQLite keeps its own cache of parsed
+        statements for each connection.
+        """
+        cnxn, cursor = self.getCnxnAndCursor(timeout=timeout)
+        return cnxn, db.preparedStatement(cursor, query)
+
+    def closeCnxnAndStatement(self, cnxn, stmt):
+        """Close a connection and statement from getCnxnAndStatement."""
+        self.closeCnxnAndCursor(cnxn, stmt.cursor)
+
+    def importRecorders(self, tables, idCol='id', tCol='t', nameCol='name'):
+        """Import an individual's recorder files into tables, then remove
+        the files. Like GridLAB-D's mysql recorder tables, tables have a
+        row for each recorded object at each time, with a column for each
+        property. Tables which don't exist are created, with an index on
+        (time, name). Imported tables are registered (see
+        db.registerTable), so truncateTableBySuffix can find them.
+
+        INPUTS:
+            tables: dict mapping table names (with the individual's suffix)
+                to True if the table's recorder has a group, see
+                individual.addTapeRecorder.
+            idCol, tCol, nameCol: names of the id, time, and name columns.
+        """
+        data = {}
+        for table, group in tables.items():
+            files = self.tableFiles(table)
+            if not files:
+                raise UserWarning('No recorder files for table {}'.format(
+                    table))
+
+            if group:
+                data[table] = self.groupRows(files)
+            else:
+                data[table] = self.parentRows(files)
+
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+
+        try:
+            for table, (cols, rows) in data.items():
+                types = gld.sqlColumns(cols)
+                colStr = ''.join(', {} {}'.format(c, AFFINITY.get(t, 'TEXT'))
+                                 for c, t in types)
+                cursor.execute(('CREATE TABLE IF NOT EXISTS {table} ({idCol} '
+                                + 'INTEGER PRIMARY KEY, {tCol} TEXT NOT NULL, '
+                                + '{nameCol} TEXT{cols})'
+                                ).format(table=table, idCol=idCol, tCol=tCol,
+                                         nameCol=nameCol, cols=colStr))
+                cursor.execute(('CREATE INDEX IF NOT EXISTS {index}_{table} '
+                                + 'ON {table} ({tCol}, {nameCol})'
+                                ).format(index=db.T_NAME_INDEX, table=table,
+                                         tCol=tCol, nameCol=nameCol))
+                cursor.executemany(
+                    'INSERT INTO {} ({}) VALUES ({})'.format(
+                        table, ', '.join([tCol, nameCol] + cols),
+                        ', '.join('?' * (len(cols) + 2))),
+                    rows)
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+
+        for table in data:
+            self.registerTable(suffix=table[table.rindex('_'):], table=table)
+            for path in self.tableFiles(table).values():
+                os.remove(path)
+
+    @staticmethod
+    def columnValues(cols, values):
+        """Get a list of the values of each column of a 2D array from
+        recorderFiles.readRecorder. Numeric columns (see gld.sqlColumns)
+        are floats, e.g. tap positions from a file which also has switch
+        statuses.
+        """
+        out = []
+        for (_, t), v in zip(gld.sqlColumns(cols), values.T):
+            if t in AFFINITY:
+                v = v.astype(float)
+            out.append(v.tolist())
+
+        return out
+
+    def parentRows(self, files):
+        """Get (columns, rows) to import from the files of recorders with
+        parents, given as {parent: path} (see recorderFiles.tableFiles).
+        """
+        cols = None
+        rows = []
+        for name, path in files.items():
+            c, times, values = recorderFiles.readRecorder(path)
+            if cols is None:
+                cols = c
+            elif c != cols:
+                raise UserWarning(('{} has the columns {} rather than {}'
+                                   ).format(path, c, cols))
+
+            rows.extend(zip(times.tolist(), [name] * len(times),
+                            *self.columnValues(cols, values)))
+
+        return cols, rows
+
+    @staticmethod
+    def groupRows(files):
+        """Get (columns, rows) to import from the files of a group recorder,
+        given as {column: path} (see recorderFiles.tableFiles). Each file
+        has a column for each object.
+        """
+        names = None
+        columns = []
+        for col, path in files.items():
+            n, times, values = recorderFiles.readRecorder(path)
+            if names is None:
+                names = n
+                t = times
+            elif (n != names) or (times.tolist() != t.tolist()):
+                raise UserWarning(('{} has different objects or times than '
+                                   + 'the other files of its table.'
+                                   ).format(path))
+
+            # Rows are times, so objects vary fastest.
+            columns.append(values.astype(float).ravel().tolist())
+
+        rows = zip([x for x in t.tolist() for _ in names],
+                   names * len(t), *columns)
+        return list(files), list(rows)
+
+    def truncateTable(self, table):
+        """Delete all rows of a table (SQLite has no TRUNCATE)."""
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        try:
+            cursor.execute('DELETE FROM {}'.format(table))
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+
+    def truncateTableBySuffix(self, suffix):
+        """Delete the rows of an individual's tables (see importRecorders),
+        and any of its recorder files which weren't imported.
+        """
+        tables = self.registeredTables(suffix) or []
+
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        try:
+            for t in tables:
+                cursor.execute('DELETE FROM {}'.format(t))
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+
+        recorderFiles.fileDB.truncateTableBySuffix(self, suffix)
+
+    def dropAllTables(self, tableSuffix=None):
+        """Drop all tables, or those ending with tableSuffix, and remove
+        their recorder files. Returns the number of tables dropped.
+        """
+        q = ("SELECT name FROM sqlite_master WHERE type = 'table' AND name "
+             + "NOT LIKE 'sqlite\\_%' ESCAPE '\\'")
+        if tableSuffix:
+            q += " AND name LIKE '%{}' ESCAPE '\\'".format(
+                tableSuffix.replace('_', '\\_'))
+
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        try:
+            cursor.execute(q)
+            tables = [r[0] for r in cursor.fetchall()]
+            for t in tables:
+                cursor.execute('DROP TABLE IF EXISTS {}'.format(t))
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+
+        # Forget the dropped tables.
+        with self.registryLock:
+            if tableSuffix:
+                self.tableRegistry.pop(tableSuffix, None)
+            else:
+                self.tableRegistry.clear()
+
+        recorderFiles.fileDB.dropAllTables(self, tableSuffix=tableSuffix)
+        return len(tables)
+
+    def getColumnNames(self, table, exceptList=None):
+        """Get the columns of a table, see db.getColumnNames."""
+        # Get connection and cursor.
+        cnxn, cursor = self.getCnxnAndCursor()
+        try:
+            cursor.execute('PRAGMA table_info({})'.format(table))
+            rows = cursor.fetchall()
+        finally:
+            # Clean up.
+            self.closeCnxnAndCursor(cnxn, cursor)
+
+        # Rows are (cid, name, type, notnull, default, pk).
+        return [r[1] for r in rows if r[1] not in (exceptList or [])]
@@ -0,0 +1,154 @@
+'''
+Module for managing where individuals write their files.
+
+Each individual writes a model, and possibly a player file (see
+modGLM.addVVO) and log files (see gld.runModel), for every run. Written to
+regular disk and left there, these files cost fsync latency and pile up.
+Instead, a workDir hands out a fresh directory for each run, on a RAM
+backed file system (tmpfs, e.g. /dev/shm on Linux) if one is available,
+and removes it once the individual has been scored. Directories are grouped
+by generation: <base>/gen_<generation>/ind_<uid>.
+
+Space on the tmpfs is bounded: if the files in use would pass maxMB, or the
+tmpfs would have less than minFreeMB free, directories go on the fallback
+directory (on disk) instead. Since a run's size isn't known until it's
+done, the estimate is the largest directory released so far, or a given
+size hint (e.g. the size of the model) if that's bigger.
+
+Created on Oct 18, 2026
+'''
+import os
+import shutil
+import tempfile
+import threading
+
+# Default RAM backed file system.
+TMPFS = '/dev/shm'
+MB = 1024 * 1024
+
+def dirSize(path):
+    """Total size in bytes of the files in a directory tree."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+
+    return total
+
+class workDir:
+    """Thread safe manager of per-run directories."""
+
+    def __init__(self, fallback, tmpfs=TMPFS, maxMB=1024, minFreeMB=256):
+        """
+        INPUTS:
+            fallback: directory on disk to use when the tmpfs isn't available
+                or is short on space, e.g. config['PATHS']['outDir'].
+            tmpfs: RAM backed directory. If None, or it doesn't exist or
+                can't be written, the fallback is always used.
+            maxMB: maximum size in MB of the directories in use on the tmpfs.
+            minFreeMB: space in MB to always leave free on the tmpfs.
+        """
+        self.fallback = fallback
+        self.maxBytes = maxMB * MB
+        self.minFree = minFreeMB * MB
+        self.lock = threading.Lock()
+
+        # Make our own directory on the tmpfs, so we never collide with
+        # another process.
+        self.base = None
+        if tmpfs and os.path.isdir(tmpfs) and os.access(tmpfs, os.W_OK):
+            self.base = tempfile.mkdtemp(prefix='pyvvo_', dir=tmpfs)
+
+        self.generation = 0
+        # Bytes reserved for each directory in use on the tmpfs.
+        self.reserved = {}
+        # Largest directory released so far, used as the estimate for new
+        # ones.
+        self.estimate = 0
+        # Count directories put on the tmpfs and on disk.
+        self.tmpfsCount = 0
+        self.fallbackCount = 0
+
+    def newGeneration(self):
+        """Start a new generation: directories acquired from now on go in a
+        new subdirectory.
+        """
+        with self.lock:
+            self.generation += 1
+
+    def useTmpfs(self, estimate):
+        """True if a new directory of estimate bytes fits on the tmpfs.
+        Call with the lock held.
+        """
+        if self.base is None:
+            return False
+
+        if sum(self.reserved.values()) + estimate > self.maxBytes:
+            return False
+
+        try:
+            free = shutil.disk_usage(self.base).free
+        except OSError:
+            return False
+
+        return (free - estimate) >= self.minFree
+
+    def acquire(self, uid, size=0):
+        """Create and return a directory for an individual's run. Pass it to
+        release once the individual has been scored.
+        
+        INPUTS:
+            uid: the individual's uid, which names the directory.
+            size: hint for how many bytes will be written, e.g. the size of
+                the model.
+        """
+        with self.lock:
+            estimate = max(self.estimate, size)
+            tmpfs = self.useTmpfs(estimate)
+            if tmpfs:
+                base = self.base
+                self.tmpfsCount += 1
+            else:
+                base = self.fallback
+                self.fallbackCount += 1
+
+            path = os.path.join(base, 'gen_{}'.format(self.generation),
+                                'ind_{}'.format(uid)).replace('\\', '/')
+            os.makedirs(path, exist_ok=True)
+
+            if tmpfs:
+                self.reserved[path] = estimate
+
+        return path
+
+    def release(self, path):
+        """Remove a directory from acquire, and its generation's directory
+        if it's now empty.
+        """
+        with self.lock:
+            tmpfs = path in self.reserved
+
+        # Learn how big directories get.
+        if tmpfs:
+            size = dirSize(path)
+
+        shutil.rmtree(path, ignore_errors=True)
+
+        with self.lock:
+            if tmpfs:
+                del self.reserved[path]
+                self.estimate = max(self.estimate, size)
+
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # Not empty (or already gone).
+                pass
+
+    def close(self):
+        """Remove everything on the tmpfs."""
+        if self.base is not None:
+            shutil.rmtree(self.base, ignore_errors=True)
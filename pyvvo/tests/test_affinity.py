@@ -0,0 +1,60 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import affinity
+import gld
+
+class Test(unittest.TestCase):
+
+    def test_parseCpuList(self):
+        self.assertEqual(affinity.parseCpuList('0-3,8,10-11\n'),
+                         [0, 1, 2, 3, 8, 10, 11])
+
+    def test_coreSets(self):
+        """Slots alternate between nodes, and never span nodes"""
+        nodes = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+        s = affinity.coreSets(numSlots=5, coresPerSlot=2, nodes=nodes)
+        self.assertEqual([(x['cores'], x['node']) for x in s],
+                         [({0, 1}, 0), ({4, 5}, 1), ({2, 3}, 0),
+                          ({6, 7}, 1), ({0, 1}, 0)])
+        s = affinity.coreSets(numSlots=1, coresPerSlot=8, nodes=nodes)
+        self.assertEqual(s[0]['cores'], {0, 1, 2, 3})
+
+    @unittest.skipUnless(affinity.available(), 'Linux only')
+    def test_numaNodes(self):
+        """Nodes come from sysfs, limited to cores we're allowed to use"""
+        allowed = sorted(os.sched_getaffinity(0))
+        with tempfile.TemporaryDirectory() as d:
+            self.assertEqual(affinity.numaNodes(nodeDir=d), {0: allowed})
+            for n, cores in ((0, allowed[:1]), (1, allowed[1:] + [100000])):
+                os.mkdir(os.path.join(d, 'node{}'.format(n)))
+                with open(os.path.join(d, 'node{}'.format(n), 'cpulist'),
+                          'w') as f:
+                    f.write(','.join(str(c) for c in cores))
+            nodes = affinity.numaNodes(nodeDir=d)
+        self.assertEqual(nodes[0], allowed[:1])
+        self.assertEqual(nodes.get(1, []), allowed[1:])
+
+    @unittest.skipUnless(affinity.available(), 'Linux only')
+    def test_pin(self):
+        """Runs are pinned to their slot's cores"""
+        core = sorted(os.sched_getaffinity(0))[-1]
+        slot = {'cores': {core}, 'node': 0, 'membind': False}
+        with tempfile.TemporaryDirectory() as d:
+            out = gld.runModel(modelPath=os.path.join(d, 'model.glm'),
+                               cmd=[sys.executable, '-c',
+                                    'import os, time; time.sleep(0.5); '
+                                    'print(sorted(os.sched_getaffinity(0)))'],
+                               affinity=slot)
+        self.assertEqual(out.stdout.strip().decode(), str([core]))
+
+if __name__ == "__main__":
+    unittest.main()
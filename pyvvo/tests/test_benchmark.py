@@ -0,0 +1,141 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import json
+import sqlite3
+import benchmark
+import gld
+import sqliteDB
+from test_gldServer import freePort
+
+class Test(unittest.TestCase):
+
+    def test_tuneCombos(self):
+        self.assertEqual(benchmark.tuneCombos(cpus=6),
+                         [(1, 6), (2, 3), (4, 1)])
+
+    def test_autotune(self):
+        """Each combination is run, and the fastest is written to config"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            with open(model, 'w') as f:
+                f.write('object mysql.recorder {\n  table "t_1";\n}\n'
+                        'object node {\n  name n;\n}\n')
+            # Stand in for gridlabd: check the model, then take a while.
+            code = ('import sys, time\n'
+                    's = open(sys.argv[1]).read()\n'
+                    'assert "recorder" not in s\n'
+                    'assert s.startswith("#set thread_count=")\n'
+                    'time.sleep(0.2)\n')
+            best, results = benchmark.autotune(
+                model, combos=[(2, 1), (1, 4)], numSims=4,
+                cmd=[sys.executable, '-c', code])
+            self.assertTrue(all(r['ok'] for r in results))
+            self.assertEqual((best['threads'], best['sims']), (1, 4))
+            # Temporary models are cleaned up.
+            self.assertEqual(os.listdir(d), ['model.glm'])
+
+            configFile = os.path.join(d, 'config.json')
+            with open(configFile, 'w') as f:
+                json.dump({'GA': {'THREADS': 8, 'INDIVIDUALS': 16}}, f)
+            benchmark.writeTuning(best, configFile=configFile)
+            with open(configFile) as f:
+                self.assertEqual(json.load(f)['GA'],
+                                 {'THREADS': 4, 'GLD-THREADS': 1,
+                                  'INDIVIDUALS': 16})
+
+    def test_runConcurrent(self):
+        """Simulations running at once each have a directory"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            with open(model, 'w') as f:
+                f.write('object node {\n  name n;\n}\n')
+            cwds = os.path.join(d, 'cwds.txt')
+            # Stand in for gridlabd: write an output file in the cwd.
+            code = ('import os, sys, time\n'
+                    'assert os.path.exists(sys.argv[1])\n'
+                    'assert not os.path.exists("out.csv")\n'
+                    'open("out.csv", "w").close()\n'
+                    'time.sleep(0.1)\n'
+                    'os.remove("out.csv")\n'
+                    'open({!r}, "a").write(os.getcwd() + "\\n")\n'
+                    ).format(cwds)
+            _, out = benchmark.runConcurrent(model, sims=3, numSims=6,
+                                             cmd=[sys.executable, '-c', code])
+            self.assertTrue(all(o.status == gld.RUN_OK for o in out))
+            with open(cwds) as f:
+                self.assertEqual(len(set(f.read().split())), 3)
+            # Copies are cleaned up.
+            self.assertEqual(sorted(os.listdir(d)), ['cwds.txt', 'model.glm'])
+
+    def test_benchAffinity(self):
+        """Pinned and unpinned runs are both timed"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            with open(model, 'w') as f:
+                f.write('object node {\n  name n;\n}\n')
+            r = benchmark.benchAffinity(model, sims=2, numSims=2,
+                                        cmd=[sys.executable, '-c', ''])
+        self.assertGreater(r['unpinned'], 0)
+        if benchmark.affinity.available():
+            self.assertGreater(r['pinned'], 0)
+
+    def test_benchServers(self):
+        """Cold runs and runs on warm servers are both timed"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            with open(model, 'w') as f:
+                f.write("clock {\n  starttime '2016-01-01 00:00:00';\n"
+                        "  stoptime '2016-01-01 01:00:00';\n}\n")
+            # Stand in for gridlabd: loading takes a while.
+            r = benchmark.benchServers(
+                model, sims=1, spare=1, numSims=2,
+                cmd=[sys.executable, '-c', 'import time; time.sleep(0.2)'],
+                serverCmd=benchmark.gldServer.FAKE_CMD
+                + ['-D', 'fake_loadtime=0.2'],
+                basePort=freePort(), readyTimeout=30)
+            self.assertTrue(r['ok'])
+            self.assertGreater(r['cold'], 0)
+            self.assertGreater(r['warm'], 0)
+            # Copies are cleaned up.
+            self.assertEqual(os.listdir(d), ['model.glm'])
+
+    def test_benchEngines(self):
+        """Each engine's tables are recreated and their rows counted"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            with open(model, 'w') as f:
+                f.write('object database {\n  schema "pyvvo";\n}\n'
+                        'object mysql.recorder {\n  table "t_1";\n}\n')
+            path = os.path.join(d, 'test.db')
+            # Stand in for gridlabd: check the engine is set, then insert
+            # rows (only into a new table).
+            code = ('import sys, sqlite3\n'
+                    'assert \'on_init "engine.sql"\' in open(sys.argv[1]).read()\n'
+                    'assert "default_storage_engine" in open("engine.sql").read()\n'
+                    'c = sqlite3.connect({!r})\n'
+                    'c.execute("CREATE TABLE t_1 (x REAL)")\n'
+                    'c.executemany("INSERT INTO t_1 VALUES (?)", [(1,)] * 10)\n'
+                    'c.commit()\n').format(path)
+            r = benchmark.benchEngines(model, dbObj=sqliteDB.sqliteDB(path),
+                                       engines=['InnoDB', 'MEMORY'], repeat=2,
+                                       cmd=[sys.executable, '-c', code])
+            self.assertEqual(list(r), ['InnoDB', 'MEMORY'])
+            for v in r.values():
+                self.assertTrue(v['ok'])
+                self.assertEqual(v['rows'], 10)
+                self.assertGreater(v['throughput'], 0)
+            # Tables are dropped afterwards.
+            self.assertEqual(sqlite3.connect(path).execute(
+                'SELECT name FROM sqlite_master').fetchall(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,576 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import threading
+import time
+import mysql.connector
+import sqlite3
+import numpy as np
+import datetime
+import dateutil.tz
+import cmath
+import db
+import helper
+import gld
+import simCache
+import sqliteDB
+from individual import individual
+
+TZ = dateutil.tz.gettz('America/Los_Angeles')
+START = datetime.datetime(2016, 1, 1, 0, tzinfo=TZ)
+STOP = datetime.datetime(2016, 1, 1, 1, tzinfo=TZ)
+
+TABLES = {'energyTable': {'table': 'energy_3',
+                          'columns': ['measured_real_energy']},
+          'powerTable': {'table': 'power_3',
+                         'columns': ['measured_real_power',
+                                     'measured_reactive_power']},
+          'triplexTable': {'table': 'triplexVoltage_3',
+                           'columns': ['measured_voltage_1_mag',
+                                       'measured_voltage_2_mag']}}
+
+COSTS = {'realEnergy': 0.00008,
+         'powerFactorLead': {'limit': 0.99, 'cost': 0.1},
+         'powerFactorLag': {'limit': 0.95, 'cost': 0.2},
+         'tapChange': 0.5, 'capSwitch': 2,
+         'undervoltage': {'limit': 114, 'cost': 0.05},
+         'overvoltage': {'limit': 126, 'cost': 0.05}}
+
+# Power at each time, the last one is outside the interval.
+POWER = [('2016-01-01 00:00:00', 1000, 100),
+         ('2016-01-01 00:15:00', 1000, -500),
+         ('2016-01-01 00:30:00', 0, 0),
+         ('2016-01-01 00:45:00', 1000, 400),
+         ('2016-01-01 01:00:00', -1000, -10),
+         ('2016-01-01 01:15:00', 10, 1000)]
+
+class fakeConnection:
+    """Stands in for a MySQL connection in the pool."""
+
+    def __init__(self, n):
+        self.n = n
+        self.rollbacks = 0
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def reconnect(self):
+        self.connected = True
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def cursor(self, prepared=False):
+        return fakeCursor()
+
+    def close(self):
+        pass
+
+class fakeCursor:
+    """Stands in for a prepared MySQL cursor."""
+
+    def __init__(self):
+        self.executed = []
+        self.closed = False
+
+    def execute(self, query, params=()):
+        self.executed.append((query, params))
+
+    def close(self):
+        self.closed = True
+
+class serverCursor(fakeCursor):
+    """Answers setEngine's queries like a MySQL server would."""
+
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+        self.rows = []
+
+    def execute(self, query, params=()):
+        super().execute(query, params)
+        if query == 'SHOW ENGINES':
+            self.rows = [('InnoDB', 'DEFAULT'), ('MEMORY', 'YES'),
+                         ('ARCHIVE', 'NO')]
+        elif query.startswith('SELECT @@GLOBAL'):
+            self.rows = [(self.server.flush,)]
+        elif self.server.denied:
+            raise mysql.connector.Error(msg='Access denied', errno=1227)
+        else:
+            self.server.flush = int(query.split()[-1])
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+class serverDB(db.db):
+    """db with a stand-in MySQL server, for setEngine and for building
+    individuals' models with mysql recorders.
+    """
+
+    def __init__(self, denied=False):
+        # See db.db.__init__
+        self.database = 'gridlabd'
+        self.sharedTables = None
+        self.tableRegistry = {}
+        self.registryLock = threading.Lock()
+        self.typedTables = False
+        self.createdTables = set()
+        self.typedVerified = False
+        self.engine = None
+        self.flushSetting = None
+        self.flush = 1
+        self.denied = denied
+
+    def getCnxnAndCursor(self, cursorOptions={}, timeout=None):
+        return fakeConnection(0), serverCursor(self)
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        # SQLite stands in for MySQL - the queries are plain SQL.
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.db')
+        self.cnxn = sqlite3.connect(self.path)
+        c = self.cnxn
+        c.execute('CREATE TABLE energy_3 (t TEXT, measured_real_energy REAL)')
+        c.executemany('INSERT INTO energy_3 VALUES (?, ?)',
+                      [('2016-01-01 00:00:00', 0),
+                       ('2016-01-01 01:00:00', 1500.5)])
+        c.execute(('CREATE TABLE power_3 (t TEXT, measured_real_power REAL, '
+                   'measured_reactive_power REAL)'))
+        c.executemany('INSERT INTO power_3 VALUES (?, ?, ?)', POWER)
+        c.execute(('CREATE TABLE triplexVoltage_3 (t TEXT, name TEXT, '
+                   'measured_voltage_1_mag REAL, '
+                   'measured_voltage_2_mag REAL)'))
+        c.executemany('INSERT INTO triplexVoltage_3 VALUES (?, ?, ?, ?)',
+                      [('2016-01-01 00:00:00', 'tl_1', 110, 113),
+                       ('2016-01-01 00:00:00', 'tl_2', 120, 120),
+                       ('2016-01-01 00:30:00', 'tl_2', 130, 121),
+                       ('2016-01-01 01:00:00', 'tl_2', 120, 127),
+                       ('2016-01-01 02:00:00', 'tl_2', 200, 200)])
+        # A second individual, with no power and only one violation.
+        for t in ('energy', 'power', 'triplexVoltage'):
+            c.execute('CREATE TABLE {}_4 AS SELECT * FROM {}_3'.format(t, t))
+        c.execute('DELETE FROM power_4')
+        c.execute('DELETE FROM triplexVoltage_4 WHERE name = "tl_2"')
+        c.commit()
+
+    def tearDown(self):
+        self.cnxn.close()
+        self.tmp.cleanup()
+
+    def test_costQuery(self):
+        """Costs from one query match costs computed from every power row"""
+        filters = {'energy': db.db.timeWhere(STOP, STOP, 't'),
+                   'power': db.db.timeWhere(START, STOP, 't'),
+                   'triplex': db.db.timeWhere(START, STOP, 't')}
+        q = db.db.costQuery(lowerBound=114, upperBound=126,
+                            leadLimit=COSTS['powerFactorLead']['limit'],
+                            lagLimit=COSTS['powerFactorLag']['limit'],
+                            filters=filters, **TABLES)
+        a = db.db.costRow(self.cnxn.execute(q).fetchone())
+        self.assertEqual(a['energy'], 1500.5)
+        self.assertEqual(a['energyRows'], 1)
+        self.assertEqual(a['violations'], {'low': 1, 'high': 2})
+
+        # Compare to computing power factors from all the rows.
+        inputs = {'energy': a['energy'], 'violations': a['violations'],
+                  'power': [complex(p, q) for _, p, q in POWER[:-1]]}
+        expected = gld.costsFromInputs(inputs=inputs, tapChangeCount=1,
+                                       capSwitchCount=1, costs=COSTS)
+        inputs = {'energy': a['energy'], 'violations': a['violations'],
+                  'pfDeviation': {k: a[k] for k in ('powerFactorLead',
+                                                    'powerFactorLag')}}
+        c = gld.costsFromInputs(inputs=inputs, tapChangeCount=1,
+                                capSwitchCount=1, costs=COSTS)
+        self.assertGreater(c['powerFactorLead'], 0)
+        self.assertGreater(c['powerFactorLag'], 0)
+        for k, v in expected.items():
+            self.assertAlmostEqual(c[k], v)
+
+        with self.assertRaises(UserWarning):
+            db.db.costQuery(lowerBound=114, upperBound=126, leadLimit=0.9,
+                            lagLimit=0.9, filters=filters,
+                            energyTable=TABLES['energyTable'],
+                            powerTable={'table': 'power_3',
+                                        'columns': ['a', 'b']},
+                            triplexTable=TABLES['triplexTable'])
+
+    def test_batch(self):
+        """A generation is evaluated in one query"""
+        dbObj = sqliteDB.sqliteDB(self.path)
+        tables = {}
+        for uid in (3, 4):
+            tables[uid] = {k: dict(v, table=v['table'][:-1] + str(uid))
+                           for k, v in TABLES.items()}
+        kwargs = {'lowerBound': 114, 'upperBound': 126, 'leadLimit': 0.99,
+                  'lagLimit': 0.95, 'starttime': START, 'stoptime': STOP}
+        a = dbObj.batchCostAggregates(tables=tables, **kwargs)
+        self.assertEqual(set(a), {3, 4})
+        self.assertEqual(a[3], dbObj.costAggregates(**tables[3], **kwargs))
+        self.assertEqual(a[4]['violations'], {'low': 1, 'high': 0})
+        self.assertEqual(a[4]['powerFactorLead'], 0)
+        self.assertEqual(dbObj.batchCostAggregates(tables={}, **kwargs), {})
+
+        # Individuals evaluated from the batch match evalFitness.
+        inputs = gld.costInputs(dbObj=dbObj, lowerBound=114,
+                                upperBound=126, leadLimit=0.99,
+                                lagLimit=0.95, starttime=START,
+                                stoptime=STOP, **tables[3])
+        self.assertEqual(inputs, gld.inputsFromAggregates(a[3]))
+
+    def test_fetchArray(self):
+        """Rows are fetched in batches into structured arrays"""
+        dbObj = sqliteDB.sqliteDB(self.path)
+        cols = TABLES['powerTable']['columns']
+        a = dbObj.fetchArray(table='power_3', cols=cols, starttime=START,
+                             stoptime=STOP, batchSize=2)
+        self.assertEqual(a.dtype.names, tuple(cols))
+        self.assertEqual(a['measured_real_power'].tolist(),
+                         [p for _, p, _ in POWER[:-1]])
+        power = dbObj.getComplexFromParts(table='power_3', cols=cols,
+                                          starttime=START, stoptime=STOP)
+        self.assertEqual(power.tolist(),
+                         [complex(p, q) for _, p, q in POWER[:-1]])
+
+        # No rows.
+        a = dbObj.fetchArray(table='power_4', cols=cols, starttime=START,
+                             stoptime=STOP)
+        self.assertEqual((len(a), a.dtype.names), (0, tuple(cols)))
+
+        # Types per column, and NULLs.
+        self.cnxn.execute("INSERT INTO triplexVoltage_3 VALUES "
+                          "('2016-01-01 00:15:00', 'tl_3', NULL, 1)")
+        self.cnxn.execute(('CREATE TABLE s_3 (t TEXT, name TEXT, '
+                           'power_A TEXT, power_B TEXT)'))
+        self.cnxn.execute("INSERT INTO s_3 VALUES ('2016-01-01 00:00:00', "
+                          "'m', '+1+2j VA', '+3-1j VA')")
+        self.cnxn.commit()
+        a = dbObj.fetchArray(table='triplexVoltage_3',
+                             cols=['name', 'measured_voltage_1_mag'],
+                             dtype=['U8', float], starttime=START,
+                             stoptime=STOP)
+        self.assertEqual(a['name'].tolist(), ['tl_1', 'tl_2', 'tl_2',
+                                              'tl_2', 'tl_3'])
+        self.assertTrue(np.isnan(a['measured_voltage_1_mag'][-1]))
+        self.assertEqual(dbObj.sumComplexPower(cols=['power_A', 'power_B'],
+                                               table='s_3', starttime=START,
+                                               stoptime=STOP),
+                         {'rowSums': [4+1j], 'unit': 'VA'})
+
+    def test_sumComplexPower(self):
+        """Bulk parsing gives the same sums as parsing each value"""
+        self.cnxn.execute(('CREATE TABLE s_4 (t TEXT, name TEXT, '
+                           'power_A TEXT, power_B TEXT)'))
+        rows = [('+1+2j VA', '+3-1j VA'), ('+100+30d VA', '-5.5e1-0.5r VA'),
+                ('+1.2e+03-4e+02j VA', '+0+0j VA'), ('-2+1.5r VA', '+7+90d VA')]
+        self.cnxn.executemany("INSERT INTO s_4 VALUES "
+                              "('2016-01-01 00:00:00', 'm', ?, ?)", rows)
+        self.cnxn.commit()
+        out = sqliteDB.sqliteDB(self.path).sumComplexPower(cols=['power_A', 'power_B'],
+                                                  table='s_4',
+                                                  starttime=START,
+                                                  stoptime=STOP)
+        # What it used to do: getComplex on each value.
+        expected = [sum(helper.getComplex(v)[0] for v in r) for r in rows]
+        self.assertEqual(out['unit'], 'VA')
+        self.assertEqual(len(out['rowSums']), len(expected))
+        for a, b in zip(out['rowSums'], expected):
+            self.assertTrue(cmath.isclose(a, b))
+
+    def test_connectionPool(self):
+        """Threads wait their turn for connections"""
+        made = []
+        def connect():
+            made.append(fakeConnection(len(made)))
+            return made[-1]
+        pool = db.connectionPool(connect=connect, size=2, timeout=5)
+        a = pool.acquire()
+        b = pool.acquire()
+        self.assertEqual((a.n, b.n), (0, 1))
+
+        # Waiters are served in order.
+        got = []
+        def wait(name):
+            c = pool.acquire()
+            got.append((name, c.n))
+        threads = []
+        for name in ('first', 'second'):
+            threads.append(threading.Thread(target=wait, args=(name,)))
+            threads[-1].start()
+            while len(pool.waiters) < len(threads):
+                time.sleep(0.001)
+        b.close()
+        threads[0].join()
+        a.close()
+        # Closing twice does nothing.
+        a.close()
+        threads[1].join()
+        self.assertEqual(got, [('first', 1), ('second', 0)])
+        self.assertEqual(len(made), 2)
+        self.assertEqual(made[0].rollbacks, 1)
+
+        # Nothing is released, so the wait times out.
+        with self.assertRaises(mysql.connector.errors.PoolError):
+            pool.acquire(timeout=0.01)
+        self.assertEqual(len(pool.waiters), 0)
+        stats = pool.stats()
+        self.assertEqual((stats['checkouts'], stats['waits'],
+                          stats['timeouts'], stats['maxInUse']),
+                         (4, 3, 1, 2))
+        self.assertGreater(stats['maxWait'], 0)
+
+        self.assertEqual(db.db.autoPoolSize(workers=8, serverMax=151), 10)
+        # Leave room for GridLAB-D's connections.
+        self.assertEqual(db.db.autoPoolSize(workers=8, serverMax=15), 7)
+        with self.assertRaises(ValueError):
+            db.db.autoPoolSize(workers=8, serverMax=8)
+
+    def test_statements(self):
+        """Connections keep their prepared statements"""
+        pool = db.connectionPool(connect=lambda: fakeConnection(0), size=1,
+                                 statements=2)
+        c = pool.acquire()
+        q = 'SELECT x FROM t WHERE (t=?)'
+        s = c.statement(q)
+        s.execute(['2016-01-01 00:00:00'])
+        # An equal query gets the same statement, which executes the very
+        # same query object (so mysql.connector doesn't prepare it again).
+        self.assertIs(c.statement(''.join(q)), s)
+        s.execute(['2016-01-01 00:15:00'])
+        self.assertTrue(all(e[0] is q for e in s.cursor.executed))
+        self.assertEqual([e[1] for e in s.cursor.executed],
+                         [('2016-01-01 00:00:00',), ('2016-01-01 00:15:00',)])
+        c.close()
+
+        # Statements outlive checkouts. The least recently used one is
+        # closed when there are too many.
+        c = pool.acquire()
+        other = c.statement('SELECT y FROM t')
+        self.assertIs(c.statement(q), s)
+        c.statement('SELECT z FROM t')
+        self.assertTrue(other.cursor.closed)
+        self.assertFalse(s.cursor.closed)
+        c.close()
+        stats = pool.stats()
+        self.assertEqual((stats['prepares'], stats['statementHits']), (3, 2))
+
+        # Statements go with their session.
+        pool.idle[0]['cnxn'].connected = False
+        c = pool.acquire()
+        self.assertIsNot(c.statement(q), s)
+        c.close()
+
+        # Each connection has its own statements.
+        pool = db.connectionPool(connect=lambda: fakeConnection(0), size=2)
+        a = pool.acquire()
+        b = pool.acquire()
+        self.assertIsNot(a.statement(q), b.statement(q))
+        a.close()
+        b.close()
+
+    def test_preparedQueries(self):
+        """Times and bounds are passed as values"""
+        self.assertEqual(db.db.timeParams(START, STOP, 't'),
+                         (' WHERE (t>=? AND t<=?)',
+                          ['2016-01-01 00:00:00', '2016-01-01 01:00:00']))
+        self.assertEqual(db.db.timeParams(STOP, STOP, 't'),
+                         (' WHERE (t=?)', ['2016-01-01 01:00:00']))
+        self.assertEqual(db.db.timeParams(None, None, 't'), ('', []))
+        with self.assertRaises(ValueError):
+            db.db.timeParams(START, None, 't')
+
+        dbObj = sqliteDB.sqliteDB(self.path)
+        cols = TABLES['triplexTable']['columns']
+        self.assertEqual(dbObj.voltViolationsFromRecorder(
+                            table='triplexVoltage_3', lowerBound=114,
+                            upperBound=126, voltageCols=cols, idCol='t',
+                            starttime=START, stoptime=STOP),
+                         {'low': 1, 'high': 2})
+        self.assertEqual(dbObj.sumMatrix(table='power_3',
+                                         cols=['measured_real_power'],
+                                         starttime=START, stoptime=STOP),
+                         2000)
+
+        self.cnxn.execute('CREATE TABLE reg_3 (t TEXT, name TEXT, '
+                          'tap_A INT, tap_B INT)')
+        self.cnxn.execute("INSERT INTO reg_3 VALUES "
+                          "('2016-01-01 01:00:00', 'r', 3, -2)")
+        self.cnxn.commit()
+        reg = {'r': {'phases': {'A': {'newState': 0}}}}
+        dbObj.updateStatus(inDict=reg, dictType='reg', table='reg_3',
+                           phaseCols=['tap_A', 'tap_B'], t=STOP)
+        self.assertEqual(reg['r']['phases']['A']['newState'], 3)
+
+    def test_sharedTables(self):
+        """Individuals write to shared tables and read their partitions"""
+        self.assertEqual(db.db.partitionTable('power', 12),
+                         'power PARTITION (p12)')
+        self.assertEqual(db.db.uidScript(12), 'SET @pyvvo_uid = 12;\n')
+
+        recorders = {v['table'][:-2]: {'objType': 'recorder',
+                                       'properties': {
+                                           'parent': 'swing',
+                                           'table': v['table'][:-2],
+                                           'interval': 60,
+                                           'propList': v['columns']}}
+                     for v in TABLES.values()}
+        tables = gld.recorderColumns(recorders)
+        self.assertEqual(set(tables), {'energy', 'power', 'triplexVoltage',
+                                       'reg', 'cap'})
+        self.assertEqual(tables['cap'][-1], ('switchC', 'VARCHAR(32)'))
+        self.assertEqual(tables['reg'][0], ('tap_A_change_count', 'INT'))
+        self.assertEqual(tables['power'][0], ('measured_real_power',
+                                              'DOUBLE'))
+
+        dbObj = serverDB()
+        dbObj.sharedTables = list(tables)
+        ind = individual(uid=12, starttime=START, stoptime=STOP,
+                         timezone='PST+8PDT', dbObj=dbObj,
+                         recorders=recorders, reg={}, cap={}, regFlag=3,
+                         capFlag=3)
+        model = ('object database {\n  schema "pyvvo";\n}\n'
+                 'module powerflow;\nobject meter {\n  name swing;\n}\n')
+        writeObj = ind.buildModel(strModel=model, inPath='model.glm',
+                                  outDir=self.tmp.name)
+        s = writeObj.strModel
+        self.assertIn('table "power";', s)
+        self.assertIn('on_init "uid_12.sql";', s)
+        self.assertEqual(ind.powerTable['table'], 'power PARTITION (p12)')
+        with open(os.path.join(self.tmp.name, 'uid_12.sql')) as f:
+            self.assertEqual(f.read(), db.db.uidScript(12))
+
+        # The uid doesn't change the simulation cache key.
+        self.assertNotIn('_12', simCache.maskTables(s, '_12'))
+
+    def test_registry(self):
+        """Registered tables are cleaned up without a search"""
+        dbObj = sqliteDB.sqliteDB(self.path)
+        # SQLite has no INFORMATION_SCHEMA, so db's search fails.
+        self.assertIsNone(dbObj.registeredTables('_3'))
+        with self.assertRaises(sqlite3.Error):
+            db.db.dropAllTables(dbObj, tableSuffix='_3')
+
+        for t in ('power_3', 'energy_3', 'power_3'):
+            dbObj.registerTable(suffix='_3', table=t)
+        self.assertEqual(dbObj.registeredTables('_3'),
+                         ['energy_3', 'power_3'])
+        dbObj.truncateTableBySuffix('_3')
+        count = 'SELECT COUNT(*) FROM {}'
+        self.assertEqual(self.cnxn.execute(count.format('power_3')
+                                           ).fetchone()[0], 0)
+        self.assertEqual(self.cnxn.execute(count.format('triplexVoltage_3')
+                                           ).fetchone()[0], 5)
+        self.assertEqual(db.db.dropAllTables(dbObj, tableSuffix='_3'), 2)
+        self.assertIsNone(dbObj.registeredTables('_3'))
+        tables = [r[0] for r in self.cnxn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        self.assertNotIn('power_3', tables)
+        self.assertIn('triplexVoltage_3', tables)
+        self.assertIn('power_4', tables)
+
+        # sqliteDB finds its tables itself.
+        self.assertEqual(dbObj.dropAllTables(tableSuffix='_4'), 3)
+        self.assertEqual(dbObj.dropAllTables(), 1)
+
+        # Group recorders make tables we don't know about.
+        dbObj.registerTable(suffix='_4', table='power_4')
+        dbObj.registerTable(suffix='_4', table='tpx_4', scan=True)
+        dbObj.registerTable(suffix='_4', table='energy_4')
+        self.assertIsNone(dbObj.registeredTables('_4'))
+
+    def test_typedTables(self):
+        """Recorder tables are typed and indexed"""
+        cols = gld.sqlColumns(['measured_voltage_1.mag', 'tap_A'])
+        self.assertEqual(cols, [('measured_voltage_1_mag', 'DOUBLE'),
+                                ('tap_A', 'INT')])
+        q = db.db.recorderTableSQL(table='power_3', cols=cols)
+        self.assertEqual(q, ('CREATE TABLE IF NOT EXISTS power_3 (id BIGINT '
+                             'NOT NULL AUTO_INCREMENT, t DATETIME NOT NULL, '
+                             'name VARCHAR(64), measured_voltage_1_mag '
+                             'DOUBLE, tap_A INT, PRIMARY KEY (id), INDEX '
+                             'ix_t_name (t, name)) ROW_FORMAT=COMPACT'))
+        q = db.db.recorderTableSQL(table='power', cols=cols,
+                                   partitions=['PARTITION p0 VALUES IN (0)'])
+        self.assertIn('uid INT NOT NULL, PRIMARY KEY (id, uid)', q)
+        self.assertTrue(q.endswith('PARTITION BY LIST (uid) '
+                                   '(PARTITION p0 VALUES IN (0))'))
+        q = db.db.recorderTableSQL(table='power_3', cols=cols,
+                                   engine='MEMORY')
+        self.assertTrue(q.endswith('INDEX ix_t_name USING BTREE (t, name)) '
+                                   'ENGINE=MEMORY'))
+        q = db.db.recorderTableSQL(table='power_3', cols=cols,
+                                   engine='InnoDB')
+        self.assertTrue(q.endswith('ENGINE=InnoDB ROW_FORMAT=COMPACT'))
+
+        # Individuals track their tables' columns.
+        recorders = {'energy': {'objType': 'recorder',
+                                'properties': {'parent': 'swing',
+                                               'table': 'energy',
+                                               'interval': 60,
+                                               'propList': ['x.real']}}}
+        recorders['power'] = recorders['triplexVoltage'] = recorders['energy']
+        ind = individual(uid=7, starttime=START, stoptime=STOP,
+                         timezone='PST+8PDT', dbObj=serverDB(),
+                         recorders=recorders, reg={}, cap={}, regFlag=3,
+                         capFlag=3)
+        ind.buildModel(strModel='module powerflow;\n', inPath='model.glm',
+                       outDir=self.tmp.name)
+        self.assertEqual(ind.recorderTables,
+                         {'energy_7': [('x_real', 'DOUBLE')]})
+
+    def test_engine(self):
+        """GridLAB-D sessions set the storage engine"""
+        dbObj = sqliteDB.sqliteDB(self.path)
+        ind = individual(uid=7, starttime=START, stoptime=STOP,
+                         timezone='PST+8PDT', dbObj=dbObj, recorders={},
+                         reg={}, cap={}, regFlag=3, capFlag=3)
+        self.assertEqual(ind.sessionScript(), '')
+        dbObj.engine = 'MEMORY'
+        self.assertEqual(ind.sessionScript(),
+                         'SET SESSION default_storage_engine = MEMORY;\n')
+        dbObj.sharedTables = ['power']
+        self.assertTrue(ind.sessionScript().startswith(db.db.uidScript(7)))
+        # Partitioned tables must be InnoDB.
+        with self.assertRaises(UserWarning):
+            dbObj.createSharedTables(tables={'power': []}, uids=[7])
+
+    def test_durability(self):
+        """Relaxed durability is put back, and needs privileges"""
+        dbObj = serverDB()
+        dbObj.setEngine(engine='memory', relaxed=True)
+        self.assertEqual((dbObj.engine, dbObj.flush), ('MEMORY', 2))
+        # Relaxing again keeps the original setting.
+        dbObj.setEngine(relaxed=True)
+        self.assertEqual(dbObj.flushSetting, 1)
+        dbObj.restoreDurability()
+        self.assertEqual((dbObj.flush, dbObj.flushSetting), (1, None))
+        with self.assertRaises(UserWarning):
+            dbObj.setEngine(engine='ARCHIVE')
+
+        # Without privileges, there's a warning rather than an error.
+        dbObj = serverDB(denied=True)
+        with self.assertLogs(level='WARNING'):
+            dbObj.setEngine(engine='InnoDB', relaxed=True)
+        self.assertEqual((dbObj.engine, dbObj.flushSetting), ('InnoDB', None))
+        dbObj.restoreDurability()
+        self.assertEqual(dbObj.flush, 1)
+
+if __name__ == "__main__":
+    unittest.main()
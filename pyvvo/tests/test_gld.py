@@ -10,6 +10,9 @@ parentdir = os.path.dirname(currentdir)
 sys.path.insert(0,parentdir)
 
 import unittest
+import tempfile
+import types
+import signal
 import gld
 
 # List for testing translate taps. Each element should be in the form:
@@ -40,6 +43,109 @@ class Test(unittest.TestCase):
                 out = gld.inverseTranslateTaps(el[0], el[2])
                 self.assertEqual(el[1], out)
 
+    def test_runModel(self):
+        """Runs time out, hit CPU limits, fail, and log to files"""
+        with tempfile.TemporaryDirectory() as d:
+            model = os.path.join(d, 'model.glm')
+            # Stand in for gridlabd: run python code, with the model as the
+            # first argument.
+            def run(code, **kwargs):
+                return gld.runModel(modelPath=model,
+                                    cmd=[sys.executable, '-c', code],
+                                    **kwargs)
+            
+            out = run('import sys; print(sys.argv[1])')
+            self.assertEqual(out.status, gld.RUN_OK)
+            self.assertEqual(out.stdout.strip(), b'model.glm')
+            
+            out = run('import sys; sys.exit(3)')
+            self.assertEqual((out.status, out.returncode), (gld.RUN_FAILED, 3))
+            
+            out = run('import time; time.sleep(30)', timeout=0.5)
+            self.assertEqual(out.status, gld.RUN_TIMEOUT)
+            
+            if gld.resource is not None:
+                out = run('while True: pass', cpuTime=1, timeout=30)
+                self.assertEqual(out.status, gld.RUN_CPU)
+                
+                # Killed for something else.
+                out = run('import os, signal; '
+                          'os.kill(os.getpid(), signal.SIGKILL)',
+                          cpuTime=10, timeout=30)
+                self.assertEqual(out.status, gld.RUN_FAILED)
+            
+            prefix = os.path.join(d, 'log')
+            out = run('import sys; print("out"); print("err", file=sys.stderr)',
+                      logPrefix=prefix)
+            self.assertEqual(out.status, gld.RUN_OK)
+            self.assertIsNone(out.stdout)
+            for path, text in zip(out.logs, ('out', 'err')):
+                with open(path) as f:
+                    self.assertEqual(f.read().strip(), text)
+            
+            # Runs don't inherit our descriptors, even inheritable ones.
+            if os.name == 'posix':
+                r, w = os.pipe()
+                os.set_inheritable(w, True)
+                try:
+                    out = run('import os; os.fstat({})'.format(w),
+                              logPrefix=prefix)
+                finally:
+                    os.close(r)
+                    os.close(w)
+                self.assertEqual(out.status, gld.RUN_FAILED)
+
+    def test_cpuLimited(self):
+        """Only SIGXCPU, or SIGKILL at the hard limit, is a CPU limit"""
+        if gld.resource is None:
+            self.skipTest('No resource limits on this platform.')
+        def rusage(t):
+            return types.SimpleNamespace(ru_utime=t - 0.5, ru_stime=0.5)
+        
+        self.assertTrue(gld.cpuLimited(-signal.SIGXCPU, None, cpuTime=10))
+        hard = 10 + gld.CPU_HARD_MARGIN
+        self.assertTrue(gld.cpuLimited(-signal.SIGKILL, rusage(hard), 10))
+        self.assertTrue(gld.cpuLimited(-signal.SIGKILL, rusage(hard - 0.1),
+                                       10))
+        self.assertFalse(gld.cpuLimited(-signal.SIGKILL, rusage(hard - 1), 10))
+        self.assertFalse(gld.cpuLimited(-signal.SIGKILL, None, 10))
+        self.assertFalse(gld.cpuLimited(1, rusage(hard), 10))
+
+    def test_runner(self):
+        """The environment is built once, without touching os.environ"""
+        before = dict(os.environ)
+        with tempfile.TemporaryDirectory() as d:
+            # Fake installation with a gridlabd executable.
+            os.mkdir(os.path.join(d, 'bin'))
+            exe = os.path.join(d, 'bin', 'gridlabd')
+            with open(exe, 'w') as f:
+                f.write('#!/bin/sh\necho "$GLPATH"\n')
+            os.chmod(exe, 0o755)
+            
+            r = gld.runner(DIR=d, LD_LIBRARY_PATH='/opt/lib')
+            self.assertEqual(dict(os.environ), before)
+            self.assertEqual(r.cmd, (exe,))
+            with self.assertRaises(TypeError):
+                r.env['PATH'] = ''
+                
+            # Building again doesn't grow the paths.
+            env = gld.buildEnv(DIR=d, LD_LIBRARY_PATH='/opt/lib')
+            env2 = gld.buildEnv(DIR=d, LD_LIBRARY_PATH='/opt/lib')
+            os.environ['LD_LIBRARY_PATH'] = env['LD_LIBRARY_PATH']
+            try:
+                env3 = gld.buildEnv(DIR=d, LD_LIBRARY_PATH='/opt/lib')
+            finally:
+                os.environ.clear()
+                os.environ.update(before)
+            self.assertEqual(env, env2)
+            self.assertEqual(env3['LD_LIBRARY_PATH'], env['LD_LIBRARY_PATH'])
+            
+            if os.name == 'posix':
+                model = os.path.join(d, 'model.glm')
+                out = r.run(modelPath=model)
+                self.assertEqual(out.status, gld.RUN_OK)
+                self.assertEqual(out.stdout.decode().strip(), r.env['GLPATH'])
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.test_translateTaps']
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import gldProfile
+
+OUTPUT = """WARNING  [2016-01-01 00:00:00 PST] : some warning
+Core profiler results
+======================
+
+Total objects               2345 objects
+Parallelism                    1 thread
+Total time                   2.0 seconds
+  Core time                  0.3 seconds (15.0%)
+    Compiler                 0.0 seconds (0.0%)
+  Model time                 1.7 seconds/thread (85.0%)
+Simulation time                1 days
+Passes completed              25 passes
+
+Model profiler results
+======================
+
+Class            Time (s) Time (%) msec/obj
+---------------- -------- -------- --------
+node               0.800     47.1%      0.3
+triplex_meter      0.300     17.6%      0.1
+recorder           0.500     29.4%      2.0
+underground_line   0.100      5.9%      0.1
+mystery            0.000      0.0%      0.0
+================ ======== ======== ========
+Total              1.700    100.0%      0.7
+
+"""
+
+class Test(unittest.TestCase):
+
+    def test_parse(self):
+        p = gldProfile.parse(OUTPUT.encode())
+        self.assertEqual(p['core']['Total time'], 2.0)
+        self.assertEqual(p['core']['Model time'], 1.7)
+        self.assertEqual(p['core']['Passes completed'], 25)
+        self.assertEqual(p['total'], 1.7)
+        self.assertEqual(p['classes']['recorder'],
+                         {'time': 0.5, 'percent': 29.4, 'msecPerObj': 2.0,
+                          'module': 'mysql'})
+        # Truncated names are matched.
+        self.assertEqual(p['classes']['underground_line']['module'],
+                         'powerflow')
+        self.assertEqual(set(p['modules']), {'powerflow', 'mysql', 'other'})
+        self.assertAlmostEqual(p['modules']['powerflow'], 1.2)
+        self.assertIsNone(gldProfile.parse('no profiler here'))
+
+        # Modules can be overridden.
+        p = gldProfile.parse(OUTPUT, classModules={'recorder': 'tape'})
+        self.assertEqual(p['modules']['tape'], 0.5)
+
+    def test_readTail(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'model.out')
+            with open(path, 'w') as f:
+                f.write('x' * 100000 + OUTPUT)
+            p = gldProfile.parse(gldProfile.readTail(path))
+        self.assertEqual(p['total'], 1.7)
+
+    def test_aggregate(self):
+        p = gldProfile.parse(OUTPUT)
+        agg = gldProfile.aggregate([p, None, p])
+        self.assertEqual(agg['runs'], 2)
+        self.assertEqual(agg['dominant'], 'powerflow')
+        self.assertAlmostEqual(agg['modules']['mysql']['total'], 1.0)
+        self.assertAlmostEqual(agg['modules']['mysql']['mean'], 0.5)
+        self.assertAlmostEqual(agg['modules']['mysql']['share'], 0.5 / 1.7)
+        self.assertEqual(agg['core']['Total time'], 2.0)
+        self.assertIn('mysql: 1.000 s', gldProfile.summaryStr(agg))
+        self.assertEqual(gldProfile.aggregate([None])['runs'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
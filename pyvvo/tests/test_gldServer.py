@@ -0,0 +1,172 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import socket
+import gldServer
+import modGLM
+
+MODEL = """clock {
+  timezone PST+8PDT;
+  starttime '2016-01-01 00:00:00';
+  stoptime '2016-01-01 02:00:00';
+}
+object regulator_configuration {
+  name "rcon_1";
+  Control MANUAL;
+  tap_pos_A 1;
+}
+object regulator {
+  name "reg_1";
+  configuration rcon_1;
+  tap_A 1;
+}
+object capacitor {
+  name cap_1;
+  switchA OPEN;
+}
+"""
+
+REG = {'reg_1': {'phases': {'A': {'newState': 5, 'prevState': 1}},
+                 'Control': 'MANUAL'}}
+CAP = {'cap_1': {'phases': {'A': {'prevState': 'CLOSED'}},
+                 'control': 'MANUAL'}}
+
+def freePort():
+    """Get a port which is (probably) free, with a free port after it."""
+    while True:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        with socket.socket() as s:
+            try:
+                s.bind(('127.0.0.1', port + 1))
+            except OSError:
+                continue
+        return port
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = os.path.join(self.tmp.name, 'model.glm')
+        with open(self.model, 'w') as f:
+            f.write(MODEL)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_deviceCommands(self):
+        regConf = modGLM.modGLM(strModel=MODEL).regulatorConfigs(REG)
+        self.assertEqual(regConf, {'reg_1': 'rcon_1'})
+        c = gldServer.deviceCommands(reg=REG, cap=CAP, regConf=regConf)
+        self.assertEqual(c, [('reg_1', 'tap_A', 5), ('rcon_1', 'tap_pos_A', 5),
+                             ('rcon_1', 'Control', 'MANUAL'),
+                             ('cap_1', 'switchA', 'CLOSED'),
+                             ('cap_1', 'control', 'MANUAL')])
+
+    def test_pool(self):
+        """Servers start paused, take commands, run, and get replaced."""
+        recycled = []
+        pool = gldServer.serverPool(slots=[{'model': self.model},
+                                           {'model': self.model}],
+                                    starttime='2016-01-01 00:00:00',
+                                    basePort=freePort(),
+                                    cmd=gldServer.FAKE_CMD, readyTimeout=30,
+                                    onRecycle=recycled.append)
+        try:
+            slot = pool.acquire(timeout=30)
+            srv = slot['server']
+            self.assertEqual(srv.request('raw/clock'), '2016-01-01 00:00:00')
+
+            commands = gldServer.deviceCommands(reg=REG, cap=CAP,
+                                                regConf={'reg_1': 'rcon_1'})
+            pool.run(slot=slot, commands=commands,
+                     stoptime='2016-01-01 01:00:00', timeout=30)
+            self.assertEqual(srv.getProp('reg_1', 'tap_A'), '5')
+            self.assertEqual(srv.getProp('cap_1', 'switchA'), 'CLOSED')
+            self.assertEqual(srv.request('raw/clock'), '2016-01-01 01:00:00')
+            self.assertEqual(srv.request('raw/mainloop_state'), 'PAUSED')
+
+            # Releasing restarts the server from scratch.
+            pool.release(slot)
+            slots = [pool.acquire(timeout=30), pool.acquire(timeout=30)]
+            self.assertEqual(recycled, [slot])
+            self.assertIsNot(slot['server'], srv)
+            self.assertIsNotNone(srv.proc.poll())
+            for s in slots:
+                self.assertEqual(s['server'].getProp('reg_1', 'tap_A'), '1')
+        finally:
+            pool.close()
+
+        # Each slot keeps only its latest thread.
+        for s in pool.slots:
+            self.assertIsNotNone(s['server'].proc.poll())
+            self.assertFalse(s['thread'].is_alive())
+
+    def test_badModel(self):
+        """A server which dies while loading raises a ServerError"""
+        pool = gldServer.serverPool(slots=[{'model': self.model + '.nope'}],
+                                    starttime='2016-01-01 00:00:00',
+                                    basePort=freePort(),
+                                    cmd=gldServer.FAKE_CMD, readyTimeout=30)
+        try:
+            with self.assertRaises(gldServer.ServerError):
+                pool.acquire(timeout=30)
+        finally:
+            pool.close()
+
+    def test_retries(self):
+        """Failed slots are re-warmed a few times, then given up on"""
+        starts = os.path.join(self.tmp.name, 'starts.txt')
+        # Stand in for gridlabd: exit right away.
+        code = 'open({!r}, "a").write("x")'.format(starts)
+        pool = gldServer.serverPool(slots=[{'model': self.model},
+                                           {'model': self.model}],
+                                    starttime='2016-01-01 00:00:00',
+                                    basePort=freePort(),
+                                    cmd=[sys.executable, '-c', code],
+                                    readyTimeout=30, retries=1)
+        try:
+            with self.assertRaises(gldServer.ServerError):
+                pool.acquire(timeout=30)
+            # Every slot was started twice, and later callers see the error
+            # right away.
+            with open(starts) as f:
+                self.assertEqual(f.read(), 'xxxx')
+            with self.assertRaises(gldServer.ServerError):
+                pool.acquire(timeout=1)
+        finally:
+            pool.close()
+
+    def test_deadSlot(self):
+        """Callers get a working slot while another slot is failing"""
+        pool = gldServer.serverPool(slots=[{'model': self.model + '.nope'},
+                                           {'model': self.model}],
+                                    starttime='2016-01-01 00:00:00',
+                                    basePort=freePort(),
+                                    cmd=gldServer.FAKE_CMD, readyTimeout=30)
+        try:
+            for _ in range(2):
+                slot = pool.acquire(timeout=30)
+                self.assertEqual(slot['model'], self.model)
+                pool.release(slot)
+        finally:
+            pool.close()
+
+    def test_requestError(self):
+        """Transport errors are raised as ServerErrors"""
+        srv = gldServer.gldServer(modelPath=self.model, port=freePort(),
+                                  starttime='2016-01-01 00:00:00', timeout=1)
+        with self.assertRaises(gldServer.ServerError):
+            srv.request('raw/clock')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import glmParser
+import modGLM
+
+# Small model which exercises most of the syntax we care about.
+MODEL = """// Test model, comment with braces { } and ; in it
+#set relax_naming_rules=1
+#define VSOURCE=66395.3
+clock {
+  timezone PST+8PDT;
+  starttime '2016-01-01 00:00:00';
+}
+module tape;
+module powerflow {
+  solver_method NR;
+  line_capacitance TRUE;
+};
+object regulator_configuration {
+  name "rcon_1";
+  Control MANUAL; // OUTPUT_VOLTAGE;
+  tap_pos_A 1;
+}
+object regulator:12 {
+  name "reg_1";
+  configuration rcon_1;
+  tap_A 1;
+};
+object capacitor {
+  name cap_1;
+  switchA OPEN;
+  object recorder {
+    file "cap_{1}.csv";
+    property switchA;
+  };
+}
+object triplex_meter {
+	name tm_1;
+	phases AS;
+	nominal_voltage 120;
+}
+
+"""
+
+# Dictionaries for commanding devices.
+REG = {'reg_1': {'phases': {'A': {'newState': 5, 'prevState': 1}},
+                 'Control': 'OUTPUT_VOLTAGE'}}
+CAP = {'cap_1': {'phases': {'A': {'newState': 'CLOSED',
+                                  'prevState': 'OPEN'}},
+                 'control': 'MANUAL'}}
+
+class Test(unittest.TestCase):
+
+    def test_roundTrip(self):
+        """Parsing and serializing gives back exactly the input"""
+        tree = glmParser.parse(MODEL)
+        self.assertEqual(MODEL, tree.serialize())
+
+    def test_roundTripMalformed(self):
+        """Unbalanced braces and unterminated statements aren't lost"""
+        for s in ['}\nobject node { name n1;', 'module tape', 'a "b;',
+                  'object x { name y; }} ;;']:
+            with self.subTest(s=s):
+                self.assertEqual(s, glmParser.parse(s).serialize())
+
+    def test_structure(self):
+        """Blocks, statements, and directives are recognized"""
+        tree = glmParser.parse(MODEL)
+        d = tree.findDirective('set', 'relax_naming_rules')
+        self.assertEqual(d.value, '1')
+        self.assertIsNotNone(tree.findStatement('module', 'tape'))
+        pf = tree.findFirst(kind='module', objType='powerflow')
+        self.assertEqual(pf.getProp('solver_method'), 'NR')
+        clock = tree.findFirst(kind='clock')
+        self.assertEqual(clock.getProp('starttime'), "'2016-01-01 00:00:00'")
+        reg = tree.findByName('reg_1', objType='regulator')
+        self.assertEqual(reg.type, 'regulator')
+        self.assertEqual(reg.props['configuration'], 'rcon_1')
+        # Nested recorder is a child of the capacitor.
+        cap = tree.findByName('cap_1')
+        self.assertEqual([b.type for b in cap.blocks()], ['recorder'])
+        self.assertEqual(len(list(tree.find(kind='object'))), 5)
+        # Type mismatch
+        self.assertIsNone(tree.findByName('reg_1', objType='capacitor'))
+
+    def test_setPropMatchesModObjProps(self):
+        """Tree edits give the same text as modGLM.modObjProps"""
+        props = {'tap_A': 7, 'tap_B': 3}
+        tree = glmParser.parse(MODEL)
+        reg = tree.findByName('reg_1')
+        expected = modGLM.modGLM.modObjProps(
+            objStr=reg.serialize()[:-1], propDict=props) + ';'
+        reg.setProps(props)
+        self.assertEqual(reg.serialize(), expected)
+
+    def test_delProp(self):
+        tree = glmParser.parse(MODEL)
+        reg = tree.findByName('reg_1')
+        reg.delProp('tap_A')
+        self.assertEqual(reg.serialize(),
+                         ('object regulator:12 {\n  name "reg_1";\n'
+                          '  configuration rcon_1;\n};'))
+
+    def test_insertRemove(self):
+        tree = glmParser.parse(MODEL)
+        tree.insert('object node {\n  name n_2;\n}\n', place='beginning')
+        self.assertIsNotNone(tree.findByName('n_2'))
+        self.assertTrue(tree.serialize().startswith('object node {'))
+        tree.remove(tree.findByName('cap_1'))
+        self.assertIsNone(tree.findByName('cap_1'))
+        self.assertNotIn('cap_1', tree.serialize())
+
+    def test_directiveValue(self):
+        tree = glmParser.parse('#set profiler=0\n')
+        d = tree.findDirective('set', 'profiler')
+        d.value = 1
+        self.assertEqual(tree.serialize(), '#set profiler=1\n')
+
+    def test_typeSetter(self):
+        tree = glmParser.parse(MODEL)
+        tm = tree.findByName('tm_1')
+        tm.type = 'triplex_load'
+        self.assertTrue(tm.serialize().startswith('object triplex_load {'))
+        self.assertIs(tree.findByName('tm_1', objType='triplex_load'), tm)
+
+    def test_modGLMTreeMatchesString(self):
+        """modGLM gives identical output in string and tree mode"""
+        strObj = modGLM.modGLM(strModel=MODEL)
+        strObj.commandRegulators(reg=REG)
+        strObj.commandCapacitors(cap=CAP)
+        self.assertFalse(strObj.treeMode)
+
+        treeObj = modGLM.modGLM(strModel=MODEL)
+        treeObj.tree
+        treeObj.commandRegulators(reg=REG)
+        treeObj.commandCapacitors(cap=CAP)
+        self.assertTrue(treeObj.treeMode)
+
+        self.assertEqual(strObj.strModel, treeObj.strModel)
+        self.assertFalse(treeObj.treeMode)
+
+    def test_modGLMNotFound(self):
+        """Missing objects raise ObjNotFoundError in both modes"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        for tree in (False, True):
+            if tree:
+                obj.tree
+            with self.subTest(tree=tree):
+                with self.assertRaises(modGLM.ObjNotFoundError):
+                    obj.modObjPropsByName(name='nope', objType='capacitor',
+                                          propDict={'switchA': 'OPEN'})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -84,6 +84,18 @@ class Test(unittest.TestCase):
                 cplx = helper.getComplex(k)[0]
                 self.assertTrue(cmath.isclose(cplx, v))
                 
+    def test_getComplexArray(self):
+        """getComplexArray matches getComplex for many strings at once."""
+        n, u = helper.getComplexArray(COMPLEXDICT.keys())
+        for k, s in enumerate(COMPLEXDICT):
+            with self.subTest(complexStr=s):
+                cplx, unit = helper.getComplex(s)
+                self.assertTrue(cmath.isclose(n[k], cplx))
+                self.assertEqual(u[k] or None, unit)
+        with self.assertRaises(ValueError):
+            helper.getComplexArray(['1+1j', '12 VA'])
+        self.assertEqual(len(helper.getComplexArray([])[0]), 0)
+                
     def test_powerFactor(self):
         """powerFactor method gives a power factor from a complex number."""
         for cplx, pair in PFDICT.items():
@@ -92,6 +104,14 @@ class Test(unittest.TestCase):
                 self.assertTrue(math.isclose(pf, pair[0]))
                 self.assertEqual(direction, pair[1])
                 
+    def test_powerFactors(self):
+        """powerFactors matches powerFactor for many values at once."""
+        pf, lead = helper.powerFactors(list(PFDICT.keys()))
+        for k, pair in enumerate(PFDICT.values()):
+            with self.subTest(index=k):
+                self.assertTrue(math.isclose(pf[k], pair[0]))
+                self.assertEqual(lead[k], pair[1] == 'lead')
+                
     def test_binaryWidth(self):
         """binaryWidth computes length of binary number for an integer."""
         for num, width in BINWIDTHDICT.items():
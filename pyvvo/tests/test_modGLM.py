@@ -0,0 +1,269 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import glmParser
+import modGLM
+
+# Small model with a swing node, a regulator, capacitors, and triplex meters.
+MODEL = """clock {
+  timezone EST+5EDT;
+  starttime '2000-01-01 00:00:00';
+}
+module powerflow {
+  solver_method NR;
+}
+object node {
+  name "src";
+  phases ABCN;
+  bustype SWING;
+  nominal_voltage 7200;
+}
+object regulator_configuration {
+  name "rcon_1";
+  Control MANUAL;
+  tap_pos_A 1;
+}
+object regulator {
+  name "reg_1";
+  configuration rcon_1;
+  tap_A 1;
+}
+object capacitor {
+  name cap_1;
+  switchA OPEN;
+  object recorder {
+    name cap_1_rec;
+    property switchA;
+  };
+}
+object capacitor {
+  name cap_2;
+  switchA OPEN;
+}
+object triplex_meter {
+  name tm_1;
+  phases AS;
+}
+object triplex_meter {
+  name tm_2;
+  phases BS;
+}
+"""
+
+# Inputs to setupModel.
+SETUP = {'starttime': '2016-01-01 00:00:00',
+         'stoptime': '2016-01-01 01:00:00', 'timezone': 'PST+8PDT',
+         'powerflowFlag': True, 'triplexGroup': 'tpx',
+         'triplexList': ['tm_1']}
+
+# Dictionaries for commanding devices.
+REG = {'reg_1': {'phases': {'A': {'newState': 5, 'prevState': 1}},
+                 'Control': 'OUTPUT_VOLTAGE'}}
+CAP = {'cap_1': {'phases': {'A': {'newState': 'CLOSED',
+                                  'prevState': 'OPEN'}},
+                 'control': 'MANUAL'},
+       'cap_2': {'phases': {'A': {'newState': 'CLOSED',
+                                  'prevState': 'OPEN'}},
+                 'control': 'MANUAL'}}
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cacheDir = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_setupCacheMatchesUncached(self):
+        """Cold and warm cached setup give the same model as no cache"""
+        plain = modGLM.modGLM(strModel=MODEL)
+        swing = plain.setupModel(**SETUP)
+
+        for _ in range(2):
+            obj = modGLM.modGLM(strModel=MODEL)
+            self.assertEqual(obj.setupModel(cacheDir=self.cacheDir, **SETUP),
+                             swing)
+            self.assertEqual(obj.strModel, plain.strModel)
+            self.assertEqual(obj.objIndex,
+                             glmParser.parse(plain.strModel).objectIndex())
+
+        self.assertEqual(len(os.listdir(self.cacheDir)), 2)
+
+    def test_setupCacheHit(self):
+        """A warm start loads the cached files rather than redoing setup"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.setupModel(cacheDir=self.cacheDir, **SETUP)
+
+        # Tamper with the cached model.
+        glmFile = [f for f in os.listdir(self.cacheDir)
+                   if f.endswith('.glm')][0]
+        with open(os.path.join(self.cacheDir, glmFile), 'a') as f:
+            f.write('// from cache\n')
+
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.setupModel(cacheDir=self.cacheDir, **SETUP)
+        self.assertTrue(obj.strModel.endswith('// from cache\n'))
+
+        # Changing an input (or the model) is a miss.
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.setupModel(cacheDir=self.cacheDir,
+                       **dict(SETUP, timezone='EST+5EDT'))
+        self.assertFalse(obj.strModel.endswith('// from cache\n'))
+        obj = modGLM.modGLM(strModel=MODEL + '\n')
+        obj.setupModel(cacheDir=self.cacheDir, **SETUP)
+        self.assertFalse(obj.strModel.endswith('// from cache\n'))
+        self.assertEqual(len(os.listdir(self.cacheDir)), 6)
+
+    def test_objIndexOffsets(self):
+        """Index offsets line up with extractObject"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        idx = glmParser.parse(MODEL).objectIndex()
+        self.assertEqual(idx['cap_1_rec'][0], 'recorder')
+        for name, (objType, s, e) in idx.items():
+            with self.subTest(name=name):
+                d = obj.extractObject(startInd=s)
+                self.assertEqual((d['start'], d['end']), (s, e))
+
+    def test_objIndexCommands(self):
+        """Commanding devices with an index gives the same result as without,
+        and the index stays valid."""
+        plain = modGLM.modGLM(strModel=MODEL)
+        plain.commandRegulators(reg=REG)
+        plain.commandCapacitors(cap=CAP)
+
+        obj = modGLM.modGLM(strModel=MODEL,
+                            objIndex=glmParser.parse(MODEL).objectIndex())
+        obj.commandRegulators(reg=REG)
+        obj.commandCapacitors(cap=CAP)
+        self.assertEqual(obj.strModel, plain.strModel)
+
+        # The recorder nested in cap_1 is dropped, everything else is valid.
+        self.assertNotIn('cap_1_rec', obj.objIndex)
+        expected = glmParser.parse(obj.strModel).objectIndex()
+        for name in obj.objIndex:
+            self.assertEqual(obj.objIndex[name], expected[name])
+
+        # Other changes drop the index.
+        obj.addLine('#set profiler=1')
+        self.assertIsNone(obj.objIndex)
+
+    def test_applyZIP(self):
+        """Batched ZIP application matches modifying meters one at a time"""
+        zipFile = os.path.join(self.tmp.name, 'zip.csv')
+        with open(zipFile, 'w') as f:
+            f.write('# header junk\n# load, base_power, impedance_fraction\n'
+                    'tm_2, 1.5, 0.3\ntm_1, 2.5, 0.4\n')
+
+        zipDict = modGLM.modGLM.readZIP(file=zipFile)
+        self.assertEqual(zipDict['tm_1'], {'base_power_12': '2.5',
+                                           'impedance_fraction_12': '0.4'})
+
+        # Old approach: one object at a time.
+        expected = modGLM.modGLM(strModel=MODEL)
+        for name, propDict in zipDict.items():
+            tObj = expected.extractObjectByNameAndType(
+                name=name, objRegEx=modGLM.TRIPLEX_LOAD_OR_METER)
+            tObj['obj'] = modGLM.TRIPLEX_METER_REGEX.sub(
+                'object triplex_load', tObj['obj'])
+            tObj['obj'] = expected.modObjProps(objStr=tObj['obj'],
+                                               propDict=propDict)
+            expected.replaceObject(objDict=tObj)
+
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.applyZIP(zipDict=zipDict)
+        self.assertEqual(obj.strModel, expected.strModel)
+        self.assertNotIn('triplex_meter', obj.strModel)
+
+        # Meters missing from the model are an error.
+        with self.assertRaises(modGLM.ObjNotFoundError):
+            obj.applyZIP(zipDict={'tm_3': {'base_power_12': 1}})
+
+    def test_extractObject(self):
+        """Nested and unterminated objects are extracted correctly"""
+        obj = modGLM.modGLM(strModel=MODEL + 'object node { name n;')
+        m = modGLM.CAP_REGEX.search(obj.strModel)
+        d = obj.extractObject(objMatch=m)
+        self.assertTrue(d['obj'].endswith('property switchA;\n  };\n}'))
+        d = obj.extractObject(startInd=obj.strModel.rindex('object node'))
+        self.assertEqual(d['obj'], 'object node { name n;')
+
+    def test_addGroupToObjects(self):
+        """Only listed objects get a groupid, and only once per name"""
+        obj = modGLM.modGLM(strModel=MODEL + MODEL[MODEL.index('object tr'):])
+        obj.addGroupToObjects(objectRegex=modGLM.TRIPLEX_METER_REGEX,
+                              groupName='tpx', nameList=['tm_2', 'tm_9'])
+        self.assertEqual(obj.strModel.count('groupid tpx;'), 1)
+        self.assertIn('name tm_2;\n  phases BS;\n  groupid tpx;\n}',
+                      obj.strModel)
+
+        # Without a list, all objects are tagged.
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.addGroupToObjects(objectRegex=modGLM.CAP_REGEX, groupName='c')
+        self.assertEqual(obj.strModel.count('groupid c;'), 2)
+
+    def test_removeObjectsByType(self):
+        """Objects (with trailing semi-colons) are removed"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.removeObjectsByType(typeList=['recorder', 'triplex_meter',
+                                          'regulator'])
+        s = obj.strModel
+        self.assertNotIn('recorder', s)
+        self.assertNotIn('triplex_meter', s)
+        self.assertNotIn('object regulator {', s)
+        self.assertIn('object regulator_configuration', s)
+        self.assertIn('switchA OPEN;\n  \n}', s)
+
+    def test_setThreadCount(self):
+        """thread_count is added once and replaced after that"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.setThreadCount(8)
+        self.assertTrue(obj.strModel.startswith('#set thread_count=8\n'))
+        obj.setThreadCount(16)
+        self.assertEqual(obj.strModel, '#set thread_count=16\n' + MODEL)
+
+    def test_warmStart(self):
+        """Initial voltages come from a voltdump, and the swing is skipped"""
+        path = os.path.join(self.tmp.name, 'dump.csv')
+        with open(path, 'w') as f:
+            f.write('# filename=dump.csv,timestamp=2000-01-01 00:00:00\n'
+                    'node_name,voltA_real,voltA_imag,voltB_real,voltB_imag,'
+                    'voltC_real,voltC_imag\n'
+                    'src,7200,0,-3600,-6235.4,-3600,6235.4\n'
+                    'cap_1,7100.5,-20,0,0,0,0\n'
+                    'tm_1,120,1.5,119,-1,0,0\n')
+        v = modGLM.readVoltDump(path)
+        self.assertEqual(v['cap_1'], (7100.5-20j, 0j, 0j))
+
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.addVoltDump(filename='x.csv')
+        self.assertIn('filename "x.csv";', obj.strModel)
+
+        obj = modGLM.modGLM(strModel=MODEL)
+        self.assertEqual(obj.warmStart(v), 2)
+        s = obj.strModel
+        self.assertNotIn('voltage_A', s[:s.index('regulator')])
+        cap = obj.extractProperties(s[s.index('name cap_1'):],
+                                    ['voltage_A'])
+        self.assertEqual(cap['voltage_A']['prop'], '+7100.500000-20.000000j')
+        self.assertNotIn('voltage_B', s)
+        self.assertIn('voltage_1 +120.000000+1.500000j;', s)
+        self.assertIn('voltage_2 +119.000000-1.000000j;', s)
+        # Still parses.
+        glmParser.parse(s).objectIndex()
+
+        with open(path, 'w') as f:
+            f.write('node_name,voltA_mag,voltA_angle\n')
+        with self.assertRaises(UserWarning):
+            modGLM.readVoltDump(path)
+
+if __name__ == "__main__":
+    unittest.main()
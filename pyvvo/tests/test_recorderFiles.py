@@ -0,0 +1,204 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import datetime
+import dateutil.tz
+import recorderFiles
+import gld
+import modGLM
+from individual import individual
+
+HEADER = ('# file...... {}\n'
+          '# date...... Fri Jan 01 00:00:00 2016\n'
+          '# interval.. 60\n'
+          '# limit..... -1\n'
+          '# timestamp,{}\n')
+
+FILES = {
+    'energy.swing.csv': ('measured_real_energy',
+                         ['2016-01-01 00:00:00 PST,+0',
+                          '2016-01-01 01:00:00 PST,+1500.5']),
+    'power.swing.csv': ('measured_real_power,measured_reactive_power',
+                        ['2016-01-01 00:00:00 PST,+1000,+100',
+                         '2016-01-01 00:30:00 PST,+1000,-500',
+                         '2016-01-01 01:00:00 PST,+1000,+0']),
+    'triplexVoltage.measured_voltage_1_mag.csv': (
+        'tl_1,tl_2',
+        ['2016-01-01 00:00:00 PST,+110,+120',
+         '2016-01-01 00:30:00 PST,+121,+130',
+         '2016-01-01 01:00:00 PST,+120,+120']),
+    'triplexVoltage.measured_voltage_2_mag.csv': (
+        'tl_1,tl_2',
+        ['2016-01-01 00:00:00 PST,+113,+120',
+         '2016-01-01 00:30:00 PST,+121,+121',
+         '2016-01-01 01:00:00 PST,+120,+127']),
+    'reg.reg_1.csv': (','.join(gld.REG_PROPS),
+                      ['2016-01-01 00:00:00 PST,+0,+0,+0,+2,+2,+2',
+                       '2016-01-01 01:00:00 PST,+2,+1,+0,+4,+1,+2']),
+    'cap.cap_1.csv': (','.join(gld.CAP_PROPS),
+                      ['2016-01-01 00:00:00 PST,+0,+0,+0,OPEN,OPEN,OPEN',
+                       '2016-01-01 01:00:00 PST,+1,+0,+0,CLOSED,OPEN,OPEN']),
+}
+
+TZ = dateutil.tz.gettz('America/Los_Angeles')
+START = datetime.datetime(2016, 1, 1, 0, tzinfo=TZ)
+STOP = datetime.datetime(2016, 1, 1, 1, tzinfo=TZ)
+
+MODEL = """clock {
+  starttime '2016-01-01 00:00:00';
+  stoptime '2016-01-01 01:00:00';
+}
+module powerflow;
+object meter {
+  name swing;
+}
+"""
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = recorderFiles.fileDB(self.tmp.name)
+        for name, (cols, rows) in FILES.items():
+            table, part = name.split('.', 1)
+            path = self.db.recorderFile(table=table + '_3',
+                                        part=part[:-len('.csv')],
+                                        makeDir=True)
+            with open(path, 'w') as f:
+                f.write(HEADER.format(name, cols) + '\n'.join(rows) + '\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_readRecorder(self):
+        """Headers, times, and values are read"""
+        path = self.db.recorderFile('cap_3', 'cap_1')
+        cols, times, values = recorderFiles.readRecorder(path)
+        self.assertEqual(cols, gld.CAP_PROPS)
+        self.assertEqual(times.tolist(), ['2016-01-01 00:00:00',
+                                          '2016-01-01 01:00:00'])
+        # Switch statuses can't be floats.
+        self.assertEqual(values[1, 3], 'CLOSED')
+
+        cols, _, values = recorderFiles.readRecorder(
+            self.db.recorderFile('power_3', 'swing'))
+        self.assertEqual(values.shape, (3, 2))
+        self.assertEqual(values[1, 1], -500)
+
+    def test_costInputs(self):
+        """Cost inputs from files match what's been recorded"""
+        tables = {'energyTable': {'table': 'energy_3',
+                                  'columns': ['measured_real_energy']},
+                  'powerTable': {'table': 'power_3',
+                                 'columns': ['measured_real_power',
+                                             'measured_reactive_power']},
+                  'triplexTable': {'table': 'triplexVoltage_3',
+                                   'columns': ['measured_voltage_1_mag',
+                                               'measured_voltage_2_mag']}}
+        inputs = gld.costInputs(dbObj=self.db, lowerBound=114,
+                                upperBound=126, starttime=START,
+                                stoptime=STOP, **tables)
+        self.assertEqual(inputs['energy'], 1500.5)
+        self.assertEqual(inputs['power'], [1000+100j, 1000-500j, 1000+0j])
+        # tl_1 is low at 00:00 (both voltages, counted once). tl_2 is high
+        # at 00:30 and 01:00.
+        self.assertEqual(inputs['violations'], {'low': 1, 'high': 2})
+
+        # Only the last time.
+        v = self.db.voltViolationsFromRecorder(
+            table='triplexVoltage_3', lowerBound=114, upperBound=126,
+            voltageCols=tables['triplexTable']['columns'], starttime=STOP,
+            stoptime=STOP)
+        self.assertEqual(v, {'low': 0, 'high': 1})
+
+    def test_regCap(self):
+        """Change counts and states are read at the stoptime"""
+        self.assertEqual(self.db.sumMatrix(table='reg_3',
+                                           cols=gld.REG_CHANGE_PROPS,
+                                           starttime=STOP, stoptime=STOP), 3)
+        self.assertEqual(self.db.sumMatrix(table='cap_3',
+                                           cols=gld.CAP_CHANGE_PROPS,
+                                           starttime=STOP, stoptime=STOP), 1)
+
+        reg = {'reg_1': {'phases': {'A': {'newState': 0},
+                                    'B': {'newState': 0}}}}
+        self.db.updateStatus(inDict=reg, dictType='reg', table='reg_3',
+                             phaseCols=gld.REG_STATE_PROPS, t=STOP)
+        self.assertEqual(reg['reg_1']['phases'],
+                         {'A': {'newState': 4}, 'B': {'newState': 1}})
+        self.assertIsInstance(reg['reg_1']['phases']['A']['newState'], int)
+
+        cap = {'cap_1': {'phases': {'A': {'newState': 'OPEN'}}}}
+        self.db.updateStatus(inDict=cap, dictType='cap', table='cap_3',
+                             phaseCols=gld.CAP_STATE_PROPS, t=STOP)
+        self.assertEqual(cap['cap_1']['phases']['A']['newState'], 'CLOSED')
+
+    def test_truncate(self):
+        """An individual's files are removed"""
+        self.db.truncateTableBySuffix('_3')
+        self.assertEqual(self.db.tableFiles('power_3'), {})
+        with self.assertRaises(UserWarning):
+            self.db.fetchAll(table='energy_3',
+                             cols=['measured_real_energy'])
+
+    def test_individualRecorders(self):
+        """Individuals add tape recorders when using files"""
+        recorders = {
+            'energy': {'objType': 'recorder',
+                       'properties': {'parent': 'swing', 'table': 'energy',
+                                      'interval': 3600, 'limit': -1,
+                                      'propList': ['measured_real_energy'],
+                                      'mode': 'a'}},
+            'power': {'objType': 'recorder',
+                      'properties': {'parent': 'swing', 'table': 'power',
+                                     'interval': 60, 'limit': -1,
+                                     'propList': ['measured_real_power',
+                                                  'measured_reactive_power'],
+                                     'mode': 'a'}},
+            'triplexVoltage': {'objType': 'recorder',
+                               'properties': {'group': 'tpx',
+                                              'table': 'triplexVoltage',
+                                              'interval': 60, 'limit': -1,
+                                              'propList': [
+                                                  'measured_voltage_1.mag',
+                                                  'measured_voltage_2.mag'],
+                                              'mode': 'a'}}}
+        ind = individual(uid=5, starttime=START, stoptime=STOP,
+                         timezone='PST+8PDT', dbObj=self.db,
+                         recorders=recorders, reg={}, cap={}, regFlag=3,
+                         capFlag=3)
+        writeObj = ind.buildModel(strModel=MODEL, inPath='model.glm',
+                                  outDir=self.tmp.name)
+        s = writeObj.strModel
+        self.assertIsNotNone(writeObj.checkForModule('tape'))
+        self.assertNotIn('mysql', s)
+        self.assertEqual(s.count('object tape.recorder'), 2)
+        self.assertEqual(s.count('object tape.group_recorder'), 2)
+        self.assertIn('complex_part "MAG";', s)
+        self.assertIn(self.db.recorderFile('power_5', 'swing'), s)
+        self.assertIn(self.db.recorderFile('triplexVoltage_5',
+                                           'measured_voltage_2_mag'), s)
+        self.assertEqual(ind.triplexTable['columns'],
+                         ['measured_voltage_1_mag', 'measured_voltage_2_mag'])
+        # GridLAB-D doesn't make directories.
+        self.assertTrue(os.path.isdir(self.db.tableDir('power_5')))
+
+    def test_addTapeRecorder(self):
+        """modGLM writes tape recorders"""
+        obj = modGLM.modGLM(strModel=MODEL)
+        obj.addTapeRecorder(parent='swing', propList=['a', 'b'],
+                            interval=60, file='x.csv')
+        self.assertTrue(obj.strModel.endswith(
+            'object tape.recorder {\n  parent swing;\n  property "a,b";\n'
+            '  interval 60;\n  file "x.csv";\n  limit -1;\n}'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import datetime
+import simCache
+import gld
+import workDir
+import recorderFiles
+from individual import individual
+
+MODEL = """object regulator {
+  name reg_12;
+  tap_A 3;
+}
+object recorder {
+  parent swing;
+  table "power_12";
+  property measured_real_power;
+}
+object group_recorder {
+  group tpx;
+  table triplex_12;
+}
+"""
+
+FILE_MODEL = """clock {
+  starttime '2016-01-01 00:00:00';
+  stoptime '2016-01-01 01:00:00';
+}
+object meter {
+  name swing;
+}
+"""
+
+RECORDERS = {
+    'energy': {'objType': 'recorder',
+               'properties': {'parent': 'swing', 'table': 'energy',
+                              'interval': 3600, 'limit': -1,
+                              'propList': ['measured_real_energy']}},
+    'power': {'objType': 'recorder',
+              'properties': {'parent': 'swing', 'table': 'power',
+                             'interval': 60, 'limit': -1,
+                             'propList': ['measured_real_power']}},
+    'triplexVoltage': {'objType': 'recorder',
+                       'properties': {'group': 'tpx',
+                                      'table': 'triplexVoltage',
+                                      'interval': 60, 'limit': -1,
+                                      'propList': ['measured_voltage_1.mag']}}}
+
+ENTRY = {'inputs': {'energy': 1000.0, 'power': [1+1j, 2-0.5j],
+                    'violations': {'high': 1, 'low': 2}},
+         'update': None}
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache', 'sim.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_maskTables(self):
+        """Only table names are masked"""
+        s = simCache.maskTables(MODEL, '_12')
+        self.assertIn('name reg_12;', s)
+        self.assertIn('table "power_{uid}";', s)
+        self.assertIn('table triplex_{uid};', s)
+
+        # Identical models for different individuals have the same key.
+        c = simCache.simCache()
+        k = c.key(MODEL, '_12', 'a')
+        self.assertEqual(k, c.key(MODEL.replace('power_12', 'power_7')
+                                  .replace('triplex_12', 'triplex_7'),
+                                  '_7', 'a'))
+        self.assertNotEqual(k, c.key(MODEL.replace('tap_A 3', 'tap_A 4'),
+                                     '_12', 'a'))
+        self.assertNotEqual(k, c.key(MODEL, '_12', 'b'))
+
+        # Command keys.
+        k = c.commandKey(MODEL, [('reg_12', 'tap_A', 3)], 'a')
+        self.assertEqual(k, c.commandKey(MODEL, [('reg_12', 'tap_A', 3)], 'a'))
+        self.assertNotEqual(k, c.commandKey(MODEL, [('reg_12', 'tap_A', 4)],
+                                            'a'))
+
+    def test_maskPaths(self):
+        """Individuals' directories are masked"""
+        s = simCache.maskTables('file "/w/gen_3/ind_12/rec_12/x.csv";\n'
+                                'name ind_123;\n', '_12')
+        self.assertEqual(s, 'file "/w/gen_{gen}/ind_{uid}/rec_{uid}/x.csv";\n'
+                            'name ind_123;\n')
+
+        # Individuals recording to files from their work directories, in
+        # different generations, have the same key.
+        w = workDir.workDir(fallback=os.path.join(self.tmp.name, 'disk'),
+                            tmpfs=self.tmp.name, minFreeMB=0)
+        fileDB = recorderFiles.fileDB(root=w.base)
+        c = simCache.simCache()
+        keys = []
+        for uid in (5, 17):
+            w.newGeneration()
+            ind = individual(uid=uid, starttime=datetime.datetime(2016, 1, 1),
+                             stoptime=datetime.datetime(2016, 1, 1, 1),
+                             timezone='PST+8PDT', dbObj=fileDB,
+                             recorders=RECORDERS, reg={}, cap={}, regFlag=3,
+                             capFlag=3)
+            writeObj = ind.buildModel(strModel=FILE_MODEL, inPath='model.glm',
+                                      outDir=w.acquire(uid=uid))
+            self.assertIn('rec_{}/'.format(uid), writeObj.strModel)
+            keys.append(c.key(writeObj.strModel, ind.tableSuffix, 'a'))
+        self.assertEqual(keys[0], keys[1])
+        w.close()
+
+    def test_lru(self):
+        """Least recently used entries are dropped"""
+        c = simCache.simCache(maxEntries=2)
+        c.put('a', 1)
+        c.put('b', 2)
+        self.assertEqual(c.get('a'), 1)
+        c.put('c', 3)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual((c.get('a'), c.get('c')), (1, 3))
+        self.assertEqual((c.hits, c.misses), (3, 1))
+
+    def test_persist(self):
+        """Entries (and their order) survive a save and load"""
+        c = simCache.simCache(path=self.path, maxEntries=2)
+        c.put('a', ENTRY)
+        c.put('b', 2)
+        c.get('a')
+        c.save()
+        self.assertFalse(c.dirty)
+
+        c = simCache.simCache(path=self.path, maxEntries=2)
+        self.assertEqual(c.get('a'), ENTRY)
+        c.put('c', 3)
+        self.assertIsNone(c.get('b'))
+
+        # Files from another version are ignored.
+        simCache.VERSION += 1
+        try:
+            self.assertEqual(len(simCache.simCache(path=self.path)), 0)
+        finally:
+            simCache.VERSION -= 1
+
+    def test_costsFromInputs(self):
+        """Costs are computed from cached inputs"""
+        costs = {'realEnergy': 0.01,
+                 'powerFactorLead': {'limit': 0.99, 'cost': 0.1},
+                 'powerFactorLag': {'limit': 0.99, 'cost': 0.1},
+                 'tapChange': 0.5, 'capSwitch': 2,
+                 'undervoltage': {'limit': 114, 'cost': 5},
+                 'overvoltage': {'limit': 126, 'cost': 3}}
+        c = gld.costsFromInputs(inputs=ENTRY['inputs'], tapChangeCount=2,
+                                capSwitchCount=1, costs=costs)
+        self.assertAlmostEqual(c['realEnergy'], 10)
+        self.assertEqual(c['tapChange'], 1)
+        self.assertEqual(c['capSwitch'], 2)
+        self.assertEqual(c['overvoltage'], 3)
+        self.assertEqual(c['undervoltage'], 10)
+        self.assertGreater(c['powerFactorLag'], 0)
+        self.assertGreater(c['powerFactorLead'], 0)
+        self.assertAlmostEqual(c['total'],
+                               sum(v for k, v in c.items() if k != 'total'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import datetime
+import dateutil.tz
+import sqliteDB
+import gld
+from individual import individual
+from test_recorderFiles import FILES, HEADER, MODEL
+
+TZ = dateutil.tz.gettz('America/Los_Angeles')
+START = datetime.datetime(2016, 1, 1, 0, tzinfo=TZ)
+STOP = datetime.datetime(2016, 1, 1, 1, tzinfo=TZ)
+
+# Whether each table's recorder has a group.
+TABLES = {'energy_3': False, 'power_3': False, 'triplexVoltage_3': True,
+          'reg_3': False, 'cap_3': False}
+
+COST_TABLES = {'energyTable': {'table': 'energy_3',
+                               'columns': ['measured_real_energy']},
+               'powerTable': {'table': 'power_3',
+                              'columns': ['measured_real_power',
+                                          'measured_reactive_power']},
+               'triplexTable': {'table': 'triplexVoltage_3',
+                                'columns': ['measured_voltage_1_mag',
+                                            'measured_voltage_2_mag']}}
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def writeFiles(self, dbObj):
+        """Write the recorder files of test_recorderFiles for dbObj."""
+        for name, (cols, rows) in FILES.items():
+            table, part = name.split('.', 1)
+            path = dbObj.recorderFile(table=table + '_3',
+                                      part=part[:-len('.csv')],
+                                      makeDir=True)
+            with open(path, 'w') as f:
+                f.write(HEADER.format(name, cols) + '\n'.join(rows) + '\n')
+
+    def check(self, dbObj):
+        """Import the files, then read them back like a MySQL database."""
+        self.writeFiles(dbObj)
+        dbObj.importRecorders(TABLES)
+        # Imported files are removed.
+        self.assertEqual(dbObj.tableFiles('power_3'), {})
+        self.assertEqual(dbObj.registeredTables('_3'), sorted(TABLES))
+
+        self.assertEqual(dbObj.fetchAll(table='triplexVoltage_3',
+                                        cols=['name',
+                                              'measured_voltage_2_mag'],
+                                        starttime=START, stoptime=START),
+                         [('tl_1', 113), ('tl_2', 120)])
+
+        # Same as reading the files directly (see test_recorderFiles).
+        inputs = gld.costInputs(dbObj=dbObj, lowerBound=114, upperBound=126,
+                                starttime=START, stoptime=STOP,
+                                **COST_TABLES)
+        self.assertEqual(inputs['energy'], 1500.5)
+        self.assertEqual(inputs['power'], [1000+100j, 1000-500j, 1000+0j])
+        self.assertEqual(inputs['violations'], {'low': 1, 'high': 2})
+        # In one query.
+        inputs = gld.costInputs(dbObj=dbObj, lowerBound=114, upperBound=126,
+                                starttime=START, stoptime=STOP,
+                                leadLimit=0.99, lagLimit=0.99, **COST_TABLES)
+        self.assertEqual(inputs['violations'], {'low': 1, 'high': 2})
+        self.assertGreater(inputs['pfDeviation']['powerFactorLead'], 0)
+
+        self.assertEqual(dbObj.sumMatrix(table='reg_3',
+                                         cols=gld.REG_CHANGE_PROPS,
+                                         starttime=STOP, stoptime=STOP), 3)
+        reg = {'reg_1': {'phases': {'A': {'newState': 0}}}}
+        dbObj.updateStatus(inDict=reg, dictType='reg', table='reg_3',
+                           phaseCols=gld.REG_STATE_PROPS, t=STOP)
+        self.assertEqual(reg['reg_1']['phases']['A']['newState'], 4)
+        self.assertIsInstance(reg['reg_1']['phases']['A']['newState'], int)
+        cap = {'cap_1': {'phases': {'A': {'newState': 'OPEN'}}}}
+        dbObj.updateStatus(inDict=cap, dictType='cap', table='cap_3',
+                           phaseCols=gld.CAP_STATE_PROPS, t=STOP)
+        self.assertEqual(cap['cap_1']['phases']['A']['newState'], 'CLOSED')
+
+        # Tables are emptied for the next run, and reused.
+        dbObj.truncateTableBySuffix('_3')
+        self.assertEqual(dbObj.fetchAll(table='power_3',
+                                        cols=['measured_real_power'],
+                                        starttime=START, stoptime=STOP), [])
+        self.writeFiles(dbObj)
+        dbObj.importRecorders(TABLES)
+        self.assertEqual(len(dbObj.fetchAll(table='power_3',
+                                            cols=['measured_real_power'],
+                                            starttime=START, stoptime=STOP)),
+                         3)
+
+        self.assertEqual(dbObj.getColumnNames('energy_3', exceptList=['id']),
+                         ['t', 'name', 'measured_real_energy'])
+        self.assertEqual(dbObj.dropAllTables(tableSuffix='_4'), 0)
+        self.assertEqual(dbObj.dropAllTables(), len(TABLES))
+        self.assertIsNone(dbObj.registeredTables('_3'))
+
+    def test_file(self):
+        """A database file in WAL mode"""
+        dbObj = sqliteDB.sqliteDB(path=os.path.join(self.tmp.name, 'a.db'),
+                                  database='pyvvo', user='pyvvo')
+        self.assertEqual(dbObj.root, self.tmp.name)
+        cnxn, cursor = dbObj.getCnxnAndCursor()
+        cursor.execute('PRAGMA journal_mode')
+        self.assertEqual(cursor.fetchone()[0], 'wal')
+        dbObj.closeCnxnAndCursor(cnxn, cursor)
+        self.check(dbObj)
+
+    def test_memory(self):
+        """An in-memory database"""
+        self.check(sqliteDB.sqliteDB(root=self.tmp.name))
+
+    def test_individual(self):
+        """Individuals record to files, and import them after running"""
+        dbObj = sqliteDB.sqliteDB(root=self.tmp.name)
+        recorders = {
+            'energy': {'objType': 'recorder',
+                       'properties': {'parent': 'swing', 'table': 'energy',
+                                      'interval': 3600,
+                                      'propList': ['measured_real_energy']}},
+            'power': {'objType': 'recorder',
+                      'properties': {'parent': 'swing', 'table': 'power',
+                                     'interval': 60,
+                                     'propList': ['measured_real_power',
+                                                  'measured_reactive_power']}},
+            'triplexVoltage': {'objType': 'recorder',
+                               'properties': {'group': 'tpx',
+                                              'table': 'triplexVoltage',
+                                              'interval': 60,
+                                              'propList': [
+                                                  'measured_voltage_1.mag',
+                                                  'measured_voltage_2.mag']}}}
+        ind = individual(uid=3, starttime=START, stoptime=STOP,
+                         timezone='PST+8PDT', dbObj=dbObj,
+                         recorders=recorders, reg={}, cap={}, regFlag=3,
+                         capFlag=3)
+        self.assertTrue(ind.recordsToFiles())
+        writeObj = ind.buildModel(strModel=MODEL, inPath='model.glm',
+                                  outDir=self.tmp.name)
+        self.assertNotIn('mysql', writeObj.strModel)
+        self.assertEqual(ind.fileTables, {'energy_3': False,
+                                          'power_3': False,
+                                          'triplexVoltage_3': True})
+
+if __name__ == "__main__":
+    unittest.main()
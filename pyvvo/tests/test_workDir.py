@@ -0,0 +1,77 @@
+'''
+Created on Oct 18, 2026
+'''
+# Get the parent directory on the path:
+import os,sys,inspect
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0,parentdir)
+
+import unittest
+import tempfile
+import workDir
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # Stand-ins for the tmpfs and disk.
+        self.ram = os.path.join(self.tmp.name, 'ram')
+        self.disk = os.path.join(self.tmp.name, 'disk')
+        os.mkdir(self.ram)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_acquireRelease(self):
+        """Directories are per generation and removed on release"""
+        w = workDir.workDir(fallback=self.disk, tmpfs=self.ram, minFreeMB=0)
+        self.assertTrue(w.base.startswith(self.ram))
+
+        w.newGeneration()
+        a = w.acquire(uid=1)
+        b = w.acquire(uid=2)
+        self.assertEqual(os.path.basename(os.path.dirname(a)), 'gen_1')
+        self.assertTrue(a.startswith(w.base))
+        self.assertTrue(os.path.isdir(a))
+        self.assertNotEqual(a, b)
+
+        with open(os.path.join(a, 'model_1.glm'), 'w') as f:
+            f.write('x' * 1000)
+        w.release(a)
+        self.assertFalse(os.path.exists(a))
+        self.assertEqual(w.estimate, 1000)
+        # The generation's directory goes with its last individual.
+        w.release(b)
+        self.assertFalse(os.path.exists(os.path.dirname(b)))
+
+        w.close()
+        self.assertFalse(os.path.exists(w.base))
+
+    def test_fallback(self):
+        """Directories go to disk when the tmpfs is full or missing"""
+        # Room for one 1000 byte directory.
+        w = workDir.workDir(fallback=self.disk, tmpfs=self.ram,
+                            maxMB=1500 / workDir.MB, minFreeMB=0)
+        a = w.acquire(uid=1, size=1000)
+        b = w.acquire(uid=2, size=1000)
+        self.assertTrue(a.startswith(w.base))
+        self.assertTrue(b.startswith(self.disk))
+        self.assertEqual((w.tmpfsCount, w.fallbackCount), (1, 1))
+        w.release(a)
+        w.release(b)
+        self.assertTrue(w.acquire(uid=3, size=1000).startswith(w.base))
+
+        # Not enough free space.
+        w = workDir.workDir(fallback=self.disk, tmpfs=self.ram,
+                            minFreeMB=float('inf'))
+        self.assertTrue(w.acquire(uid=1).startswith(self.disk))
+
+        # No tmpfs.
+        w = workDir.workDir(fallback=self.disk,
+                            tmpfs=os.path.join(self.tmp.name, 'missing'))
+        self.assertIsNone(w.base)
+        self.assertTrue(w.acquire(uid=1).startswith(self.disk))
+
+if __name__ == "__main__":
+    unittest.main()